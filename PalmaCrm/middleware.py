@@ -3,11 +3,24 @@ import re
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
 from django.http import HttpResponseForbidden
+from models_logging.middleware import LoggingStackMiddleware
 
 from PalmaCrm import settings
+from src.core.audit import flush_changes
 from src.user.models import ViewPermissionRule
 
 
+class BufferedLoggingStackMiddleware(LoggingStackMiddleware):
+    """
+    Collects the request's model changes and writes them once, after commit,
+    through the configured audit writer.
+    """
+
+    def create_revision(self, _local):
+        flush_changes(_local.stack_changes.values())
+        _local.stack_changes = {}
+
+
 class PermissionControlMiddleware(object):
 
     def __init__(self, get_response):
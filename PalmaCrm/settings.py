@@ -99,7 +99,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'models_logging.middleware.LoggingStackMiddleware',
+    'PalmaCrm.middleware.BufferedLoggingStackMiddleware',
     # 'PalmaCrm.middleware.RequireLoginMiddleware',
     # 'PalmaCrm.middleware.PermissionControlMiddleware',
 ]
@@ -139,6 +139,16 @@ DATABASES = {
     }
 }
 
+# Cache shared by all processes (web workers, bots, scripts), the local memory default
+# is meant for development only (see check core.W001), e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
 # REST_FRAMEWORK
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
@@ -228,6 +238,12 @@ LOGGING_MODELS = (
     'src.payment',
     'src.factory'
 )
+# Writer for buffered request changes: DatabaseAuditWriter or BackgroundAuditWriter
+LOGGING_AUDIT_WRITER = os.getenv('LOGGING_AUDIT_WRITER', 'src.core.audit.DatabaseAuditWriter')
+# Only these fields are diffed; saves touching other fields are not logged
+LOGGING_ONLY_FIELDS = {
+    'warehouse.WarehouseProduct': ('product', 'self_price', 'sale_price', 'income_item'),
+}
 
 # TG bot
 BOT_TOKEN = os.getenv('BOT_TOKEN')
@@ -0,0 +1,31 @@
+import argparse
+import datetime
+import os
+
+import django
+
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE",
+    "PalmaCrm.settings"
+)
+
+django.setup()
+
+from django.utils import timezone
+
+from src.analytics.services import build_daily_facts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuilds the daily facts read by the analytics charts")
+    parser.add_argument('--date', type=datetime.date.fromisoformat, help="Last business day, defaults to yesterday")
+    parser.add_argument('--days', type=int, default=1, help="Number of days to rebuild ending with --date")
+    args = parser.parse_args()
+
+    end_day = args.date or timezone.localdate() - datetime.timedelta(days=1)
+    start_day = end_day - datetime.timedelta(days=args.days - 1)
+    build_daily_facts(start_day, end_day)
+    print(f"Daily facts from {start_day} to {end_day} are built")
+
+
+main()
@@ -0,0 +1,31 @@
+import argparse
+import datetime
+import os
+
+import django
+
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE",
+    "PalmaCrm.settings"
+)
+
+django.setup()
+
+from django.utils import timezone
+
+from src.report.services import build_daily_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds daily summaries used by the bot reports")
+    parser.add_argument('--date', type=datetime.date.fromisoformat, help="Business day, defaults to yesterday")
+    parser.add_argument('--days', type=int, default=1, help="Number of days to build ending with --date")
+    args = parser.parse_args()
+
+    date = args.date or timezone.localdate() - datetime.timedelta(days=1)
+    for i in range(args.days - 1, -1, -1):
+        summary = build_daily_summary(date - datetime.timedelta(days=i))
+        print(f"Daily summary for {summary.date} is built")
+
+
+main()
@@ -0,0 +1,34 @@
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE",
+    "PalmaCrm.settings"
+)
+
+django.setup()
+
+from src.analytics.services import refresh_dirty_days
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recomputes the analytics rollups of the days changed since the last run")
+    parser.add_argument('--interval', type=int, help="Keep running and refresh every N seconds")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            days = refresh_dirty_days()
+            if days:
+                print(f"Refreshed days: {', '.join(str(day) for day in days)}")
+        except Exception as e:
+            print(e)
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+main()
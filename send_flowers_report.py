@@ -18,17 +18,14 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from django.db.models import Sum, F, Q, Subquery, OuterRef, When, Case, DecimalField
+from django.db.models import Sum, F, Q, Subquery, OuterRef, DecimalField
 
-from src.user.enums import WorkerIncomeType, WorkerIncomeReason
-from src.order.enums import OrderStatus
-from src.order.models import OrderItem, OrderItemProductFactory, Order, Client
-from src.payment.models import Payment, Outlay
+from src.order.models import OrderItem, OrderItemProductFactory, Order
+from src.payment.models import Payment
 from src.payment.enums import PaymentType
-from src.user.models import WorkerIncomes
-from src.warehouse.models import WarehouseProductWriteOff
-from src.factory.enums import ProductFactoryStatus
-from src.factory.models import ProductFactory
+from src.report.services import (
+    get_daily_summary, get_month_to_date_summary, get_flowers_outlay_totals
+)
 
 User = get_user_model()
 
@@ -43,225 +40,31 @@ def separate_number(value):
 
 
 def get_summary_data():
-    now = timezone.localtime()
-    previous_day = now - datetime.timedelta(days=1)
+    previous_day = timezone.localdate() - datetime.timedelta(days=1)
+    summary = get_daily_summary(previous_day)
+    month_summary = get_month_to_date_summary(previous_day)
 
-    start_date = datetime.datetime.combine(previous_day.date(), datetime.time.min)
-    end_date = datetime.datetime.combine(previous_day.date(), datetime.time.max)
-    month_start_date = start_date.replace(day=1)
-
-    celebration_clients = Client.objects.filter(full_name__icontains='*')
-    flower_outlay_categories = Outlay.objects.filter(Q(industry__id=6) | Q(id=6))
-
-    order_items = OrderItem.objects.filter(
-        models.Q(order__created_at__gte=start_date)
-        & models.Q(order__created_at__lte=end_date)
-        & ~models.Q(order__status=OrderStatus.CANCELLED)
-        & models.Q(order__is_deleted=False)
-        & models.Q(product__category__industry_id=6)
-    ).with_total_self_price().with_total_profit().with_returned_total_sum()
-
-    order_items_product_factories = OrderItemProductFactory.objects.filter(
-        models.Q(order__created_at__gte=start_date)
-        & models.Q(order__created_at__lte=end_date)
-        & ~models.Q(order__status=OrderStatus.CANCELLED)
-        & models.Q(order__is_deleted=False)
-        & models.Q(is_returned=False)
-        & models.Q(product_factory__category__industry_id=6)
-    ).with_total_self_price().with_total_profit()
-
-    orders = Order.objects.filter(
-        models.Q(order_items__in=order_items)
-        | models.Q(order_item_product_factory_set__in=order_items_product_factories)
-        & models.Q(debt__gt=0)
-    ).distinct().annotate(
-        flowers_sum=Coalesce(
-            Coalesce(
-                Subquery(
-                    OrderItem.objects.filter(order_id=OuterRef('pk'), product__category__industry_id=6)
-                    .with_returned_total_sum()
-                    .values('order_id')
-                    .annotate(amount_sum=Sum(F('total') - F('returned_total_sum'), default=0))
-                    .values('amount_sum')[:1]
-                ), 0, output_field=DecimalField()
-            ) + Coalesce(
-                Subquery(
-                    OrderItemProductFactory.objects.filter(
-                        order_id=OuterRef('pk'),
-                        product_factory__category__industry_id=6,
-                        is_returned=False
-                    )
-                    .values('order_id')
-                    .annotate(amount_sum=Sum(F('price'), default=0))
-                    .values('amount_sum')[:1]
-                ), 0, output_field=DecimalField()
-            ), 0, output_field=DecimalField()
-        ),
-    )
-    worker_incomes = WorkerIncomes.objects.filter(
-        models.Q(created_at__gte=start_date)
-        & models.Q(created_at__lte=end_date)
-    )
-
-    order_items_aggs = order_items.aggregate(
-        total_sale_sum=Sum(F('total') - F('returned_total_sum'), default=0),
-        total_self_price_sum=Sum('total_self_price', default=0),
-        total_shop_sale_sum=Sum(
-            F('total') - F('returned_total_sum'),
-            default=0,
-            filter=~Q(order__client__in=celebration_clients)
-        ),
-        total_clients_sale_sum=Sum(
-            F('total') - F('returned_total_sum'),
-            default=0,
-            filter=Q(order__client__in=celebration_clients)
-        ),
-        total_shop_self_price_sum=Sum(
-            F('total_self_price'),
-            default=0,
-            filter=~Q(order__client__in=celebration_clients)
-        ),
-        total_clients_self_price_sum=Sum(
-            F('total_self_price'),
-            default=0,
-            filter=Q(order__client__in=celebration_clients)
-        )
-    )
-    order_items_factories_aggs = order_items_product_factories.aggregate(
-        total_sale_sum=Sum(F('price'), default=0),
-        total_self_price_sum=Sum('total_self_price', default=0),
-        total_shop_sale_sum=Sum(
-            F('price'),
-            default=0,
-            filter=~Q(order__client__in=celebration_clients)
-        ),
-        total_clients_sale_sum=Sum(
-            F('price'),
-            default=0,
-            filter=Q(order__client__in=celebration_clients)
-        ),
-        total_shop_self_price_sum=Sum(
-            F('total_self_price'),
-            default=0,
-            filter=~Q(order__client__in=celebration_clients)
-        ),
-        total_clients_self_price_sum=Sum(
-            F('total_self_price'),
-            default=0,
-            filter=Q(order__client__in=celebration_clients)
-        )
-    )
-    payments = Payment.objects.get_available().filter(
-        models.Q(created_at__gte=start_date)
-        & models.Q(created_at__lte=end_date)
-        & models.Q(payment_type=PaymentType.OUTCOME)
-        & models.Q(outlay__in=flower_outlay_categories)
-    )
-    outlays = (
-        Outlay.objects.filter(payments__in=payments).distinct()
-        .annotate(total_amount=Subquery(
-            payments.filter(outlay_id=OuterRef('pk'))
-            .values('outlay_id')
-            .annotate(total_amount=Sum('amount', default=0))
-            .values('total_amount')[:1]
-        ))
-    )
-    today_written_of_factories = (
-        ProductFactory.objects.get_available().filter(
-            status=ProductFactoryStatus.WRITTEN_OFF,
-            written_off_at__range=[start_date, end_date]
-        )
-    )
-    month_written_of_factories = (
-        ProductFactory.objects.get_available().filter(
-            status=ProductFactoryStatus.WRITTEN_OFF,
-            written_off_at__range=[month_start_date, end_date]
-        )
-    )
-    today_written_of_products = WarehouseProductWriteOff.objects.get_available().filter(
-        warehouse_product__product__category__industry=6,
-        created_at__range=[start_date, end_date]
-    ).distinct()
-    month_written_of_products = WarehouseProductWriteOff.objects.get_available().filter(
-        warehouse_product__product__category__industry=6,
-        created_at__range=[month_start_date, end_date]
-    ).distinct()
-
-    total_worker_income_sum = worker_incomes.aggregate(
-        total_sum=Sum(
-            Case(
-                When(income_type=WorkerIncomeType.OUTCOME, then=-F('total')),
-                default=F('total')
-            ), default=0
-        )
-    )['total_sum']
-    total_salesmen_income_sum = worker_incomes.filter(reason=WorkerIncomeReason.PRODUCT_SALE).aggregate(
-        total_sum=Sum(
-            Case(
-                When(income_type=WorkerIncomeType.OUTCOME, then=-F('total')),
-                default=F('total')
-            ), default=0
-        )
-    )['total_sum']
-    total_florist_income_sum = worker_incomes.filter(
-        reason__in=[WorkerIncomeReason.PRODUCT_FACTORY_SALE, WorkerIncomeReason.PRODUCT_FACTORY_CREATE]
-    ).aggregate(
-        total_sum=Sum(
-            Case(
-                When(income_type=WorkerIncomeType.OUTCOME, then=-F('total')),
-                default=F('total')
-            ), default=0
-        )
-    )['total_sum']
-
-    total_sale_sum = order_items_aggs['total_sale_sum'] + order_items_factories_aggs['total_sale_sum']
-    total_self_price_sum = order_items_aggs['total_self_price_sum'] \
-                           + order_items_factories_aggs['total_self_price_sum']
-
-    total_shop_sale_sum = order_items_aggs['total_shop_sale_sum'] + order_items_factories_aggs['total_shop_sale_sum']
-    total_shop_self_price_sum = order_items_aggs['total_shop_self_price_sum'] \
-                                + order_items_factories_aggs['total_shop_self_price_sum']
-
-    total_celebration_sale_sum = order_items_aggs['total_clients_sale_sum'] \
-                                 + order_items_factories_aggs['total_clients_sale_sum']
-    total_celebration_self_price_sum = order_items_aggs['total_clients_self_price_sum'] \
-                                       + order_items_factories_aggs['total_clients_self_price_sum']
-    total_today_write_off_sum = today_written_of_factories.aggregate(
-        self_price_sum=Sum('self_price', default=0)
-    )['self_price_sum'] + today_written_of_products.aggregate(
-        self_price_sum=Sum(F('count') * F('warehouse_product__self_price'), default=0)
-    )['self_price_sum']
-    total_month_write_off_sum = month_written_of_factories.aggregate(
-        self_price_sum=Sum('self_price', default=0)
-    )['self_price_sum'] + month_written_of_products.aggregate(
-        self_price_sum=Sum(F('count') * F('warehouse_product__self_price'), default=0)
-    )['self_price_sum']
-
-    outlay_sum = payments.aggregate(
-        total_sum=Sum('amount', default=0)
-    )['total_sum']
-
-    total_profit = total_sale_sum - total_self_price_sum - outlay_sum
+    outlays = get_flowers_outlay_totals(previous_day)
+    outlay_sum = sum((o['outcome'] for o in outlays), 0)
 
-    total_flowers_debt = 0
-    for order in orders:
-        total_flowers_debt += max(min(order.debt, order.flowers_sum), 0)
+    total_sale_sum = summary.flowers_shop_sale_sum + summary.flowers_celebration_sale_sum
+    total_self_price_sum = summary.flowers_shop_self_price_sum + summary.flowers_celebration_self_price_sum
 
     return {
         "total_sale_sum": total_sale_sum,
         "total_self_price_sum": total_self_price_sum,
-        "total_shop_sale_sum": total_shop_sale_sum,
-        "total_shop_self_price_sum": total_shop_self_price_sum,
-        "total_celebration_sale_sum": total_celebration_sale_sum,
-        "total_celebration_self_price_sum": total_celebration_self_price_sum,
-        "total_profit": total_profit,
-        "total_worker_income_sum": total_worker_income_sum,
-        "total_salesmen_income_sum": total_salesmen_income_sum,
-        "total_florist_income_sum": total_florist_income_sum,
-        "total_today_write_off_sum": total_today_write_off_sum,
-        "total_month_write_off_sum": total_month_write_off_sum,
+        "total_shop_sale_sum": summary.flowers_shop_sale_sum,
+        "total_shop_self_price_sum": summary.flowers_shop_self_price_sum,
+        "total_celebration_sale_sum": summary.flowers_celebration_sale_sum,
+        "total_celebration_self_price_sum": summary.flowers_celebration_self_price_sum,
+        "total_profit": total_sale_sum - total_self_price_sum - outlay_sum,
+        "total_worker_income_sum": summary.worker_income_sum,
+        "total_salesmen_income_sum": summary.salesmen_income_sum,
+        "total_florist_income_sum": summary.florist_income_sum,
+        "total_today_write_off_sum": summary.flowers_write_off_sum,
+        "total_month_write_off_sum": month_summary['flowers_write_off_sum'],
         "outlay_sum": outlay_sum,
-        "total_flowers_debt": total_flowers_debt,
+        "total_flowers_debt": summary.flowers_debt_sum,
         "outlays": outlays,
     }
 
@@ -388,7 +191,7 @@ def send_summary_notification():
         outlays = summary['outlays']
 
         outlays_by_category = "\n".join(
-            f"{i + 1}) {o.title}: {separate_number(o.total_amount)}" for i, o in enumerate(outlays))
+            f"{i + 1}) {o['title']}: {separate_number(o['outcome'])}" for i, o in enumerate(outlays))
 
         message = textwrap.dedent(f"""\
 🎯 <b>Отчет по Продажам (Цветы)</b>
@@ -1,8 +1,8 @@
-import datetime
+import argparse
+import asyncio
 import os
 
 import django
-import requests
 
 os.environ.setdefault(
     "DJANGO_SETTINGS_MODULE",
@@ -11,32 +11,26 @@ os.environ.setdefault(
 
 django.setup()
 
-from django.db import models
-from django.utils import timezone
-from django.contrib.auth import get_user_model
 from django.conf import settings
 
-from src.core.models import BotMessage
+from src.core.telegram import TelegramClient, BotMessageDispatcher
 
-User = get_user_model()
 
-
-def send_notifications():
-    notifications = BotMessage.objects.filter(is_sent=False).order_by('created_at')
-    for notification in notifications:
-        payload = {
-            'chat_id': settings.CHAT_ID,
-            'text': notification.text,
-            'parse_mode': 'Html'
-        }
-        requests.post(
-            url=f'{settings.TG_API_URL}{settings.BOT_TOKEN}/sendMessage', json=payload
-        )
-    notifications.update(is_sent=True)
+async def send_notifications(once=False):
+    async with TelegramClient(settings.BOT_TOKEN) as client:
+        dispatcher = BotMessageDispatcher(client)
+        if once:
+            while await dispatcher.dispatch_pending():
+                pass
+        else:
+            await dispatcher.run()
 
 
 def main():
-    send_notifications()
+    parser = argparse.ArgumentParser(description="Telegram notifications dispatcher")
+    parser.add_argument('--once', action='store_true', help="Send pending notifications and exit")
+    args = parser.parse_args()
+    asyncio.run(send_notifications(once=args.once))
 
 
 main()
@@ -1,7 +1,8 @@
+import asyncio
 import os
 
 import django
-import requests
+from asgiref.sync import sync_to_async
 
 os.environ.setdefault(
     "DJANGO_SETTINGS_MODULE",
@@ -15,6 +16,7 @@ from src.factory.models import FactoryTakeApartRequest
 
 from src.core.enums import ActionPermissionRequestType
 from src.core.models import ActionPermissionRequest, PermissionRequestTgMessage, Settings
+from src.core.telegram import TelegramClient
 from src.factory.enums import FactoryTakeApartRequestType
 from src.warehouse.models import WarehouseProductWriteOff
 
@@ -32,10 +34,28 @@ def get_factory_perm_message(notification):
     return message
 
 
-def send_factory_perm_notifications():
-    app_settings = Settings.load()
-
-    notifications = FactoryTakeApartRequest.objects.filter(is_sent=False).order_by('created_at')
+async def send_to_receivers(client, chat_ids, message, inline_keyboard):
+    """Sends the message to every receiver concurrently. Returns (chat_id, message_id) of delivered ones."""
+    results = await asyncio.gather(
+        *(
+            client.send_message(chat_id, message, reply_markup={'inline_keyboard': inline_keyboard})
+            for chat_id in chat_ids
+        ),
+        return_exceptions=True
+    )
+    return [
+        (chat_id, result['message_id'])
+        for chat_id, result in zip(chat_ids, results)
+        if isinstance(result, dict) and result.get('message_id')
+    ]
+
+
+async def send_factory_perm_notifications(client, chat_ids):
+    notifications = [
+        n async for n in FactoryTakeApartRequest.objects.select_related('created_user')
+        .filter(is_sent=False).order_by('created_at')
+    ]
+    tg_messages = []
     for notification in notifications:
         message = get_factory_perm_message(notification)
         inline_keyboard = [
@@ -44,29 +64,14 @@ def send_factory_perm_notifications():
                 {'text': 'Отклонить', 'callback_data': f'{notification.id}_no'}
             ]
         ]
-        chat_ids = app_settings.permission_notification_receivers
-
-        for chat_id in chat_ids:
-            payload = {
-                'chat_id': chat_id,
-                'text': message,
-                'reply_markup': {'inline_keyboard': inline_keyboard}
-            }
-            response = requests.post(
-                url=f'{settings.TG_API_URL}{settings.PERMISSION_BOT_TOKEN}/sendMessage', json=payload
-            )
-
-            if response.status_code == 200:
-                response_data = response.json()
-                message_id = response_data.get('result', {}).get('message_id')
-                if message_id:
-                    PermissionRequestTgMessage.objects.create(
-                        chat_id=chat_id,
-                        message_id=message_id,
-                        factory_permission_request=notification
-                    )
-                notification.is_sent = True
-    FactoryTakeApartRequest.objects.bulk_update(notifications, ['is_sent'])
+        delivered = await send_to_receivers(client, chat_ids, message, inline_keyboard)
+        tg_messages += [
+            PermissionRequestTgMessage(chat_id=chat_id, message_id=message_id, factory_permission_request=notification)
+            for chat_id, message_id in delivered
+        ]
+        notification.is_sent = bool(delivered)
+    await PermissionRequestTgMessage.objects.abulk_create(tg_messages)
+    await FactoryTakeApartRequest.objects.abulk_update(notifications, ['is_sent'])
 
 
 def get_perm_message(request):
@@ -82,45 +87,70 @@ def get_perm_message(request):
     return message
 
 
-def send_perm_notifications():
-    app_settings = Settings.load()
-    
-    notifications = ActionPermissionRequest.objects.filter(is_sent=False).order_by('created_at')
+def get_group_perm_message(requests):
+    write_offs = list(
+        WarehouseProductWriteOff.objects.select_related('warehouse_product__product', 'created_user')
+        .filter(id__in=[r.wh_product_write_off_id for r in requests]).order_by('id')
+    )
+    lines = "\n".join(
+        f"{i + 1}) {w.warehouse_product.product.name}: {w.count} "
+        f"(Сумма: {w.warehouse_product.self_price * w.count})"
+        for i, w in enumerate(write_offs)
+    )
+    comments = {w.comment for w in write_offs if w.comment}
+    return f"Списание Товаров ({len(write_offs)}).\n" \
+           f"Пользователь: {write_offs[0].created_user.first_name if write_offs else ''}\n" \
+           f"{lines}\n" \
+           f"Сумма списания: {sum(w.warehouse_product.self_price * w.count for w in write_offs)}\n" \
+           f"Коментарий: {'; '.join(sorted(comments)) or None}"
+
+
+async def send_perm_notifications(client, chat_ids):
+    notifications = [
+        n async for n in ActionPermissionRequest.objects.filter(is_sent=False).order_by('created_at', 'id')
+    ]
+    # Requests created together by a batch write-off share group_id and are answered with one message
+    batches = {}
     for notification in notifications:
-        message = get_perm_message(notification)
+        key = notification.group_id or notification.id
+        batches.setdefault(key, []).append(notification)
+
+    tg_messages = []
+    for requests in batches.values():
+        notification = requests[0]
+        if notification.group_id:
+            message = await sync_to_async(get_group_perm_message)(requests)
+            callback_id, callback_suffix = notification.group_id.hex, 'g'
+        else:
+            message = await sync_to_async(get_perm_message)(notification)
+            callback_id, callback_suffix = notification.id, '2'
         inline_keyboard = [
             [
-                {'text': 'Подтвердить', 'callback_data': f'{notification.id}_yes2'},
-                {'text': 'Отклонить', 'callback_data': f'{notification.id}_no2'}
+                {'text': 'Подтвердить', 'callback_data': f'{callback_id}_yes{callback_suffix}'},
+                {'text': 'Отклонить', 'callback_data': f'{callback_id}_no{callback_suffix}'}
             ]
         ]
-        chat_ids = app_settings.permission_notification_receivers
-
-        for chat_id in chat_ids:
-            payload = {
-                'chat_id': chat_id,
-                'text': message,
-                'reply_markup': {'inline_keyboard': inline_keyboard}
-            }
-            response = requests.post(
-                url=f'{settings.TG_API_URL}{settings.PERMISSION_BOT_TOKEN}/sendMessage', json=payload
-            )
-            if response.status_code == 200:
-                response_data = response.json()
-                message_id = response_data.get('result', {}).get('message_id')
-                if message_id:
-                    PermissionRequestTgMessage.objects.create(
-                        chat_id=chat_id,
-                        message_id=message_id,
-                        action_permission_request=notification
-                    )
-                notification.is_sent = True
-    ActionPermissionRequest.objects.bulk_update(notifications, ['is_sent'])
+        delivered = await send_to_receivers(client, chat_ids, message, inline_keyboard)
+        tg_messages += [
+            PermissionRequestTgMessage(chat_id=chat_id, message_id=message_id, action_permission_request=notification)
+            for chat_id, message_id in delivered
+        ]
+        for request in requests:
+            request.is_sent = bool(delivered)
+    await PermissionRequestTgMessage.objects.abulk_create(tg_messages)
+    await ActionPermissionRequest.objects.abulk_update(notifications, ['is_sent'])
+
+
+async def send_permission_notifications():
+    app_settings = await sync_to_async(Settings.load)()
+    chat_ids = app_settings.permission_notification_receivers or []
+    async with TelegramClient(settings.PERMISSION_BOT_TOKEN) as client:
+        await send_factory_perm_notifications(client, chat_ids)
+        await send_perm_notifications(client, chat_ids)
 
 
 def main():
-    send_factory_perm_notifications()
-    send_perm_notifications()
+    asyncio.run(send_permission_notifications())
 
 
 if __name__ == '__main__':
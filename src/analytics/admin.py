@@ -1,3 +1,39 @@
 from django.contrib import admin
 
-# Register your models here.
+from src.analytics.models import DailySales, DailyIndustrySales, DailyCashFlow, ClientMonthlyMetric, DirtyDay, \
+    DailyWorkerKPI
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ['day', 'orders_count', 'turnover', 'self_price', 'profit', 'updated_at']
+
+
+@admin.register(DailyIndustrySales)
+class DailyIndustrySalesAdmin(admin.ModelAdmin):
+    list_display = ['day', 'industry', 'turnover', 'self_price', 'discount', 'profit']
+    list_filter = ['industry']
+
+
+@admin.register(DailyCashFlow)
+class DailyCashFlowAdmin(admin.ModelAdmin):
+    list_display = ['day', 'payment_model_type', 'payment_method_category', 'outlay_type', 'industry', 'income', 'outcome']
+    list_filter = ['payment_model_type']
+
+
+@admin.register(ClientMonthlyMetric)
+class ClientMonthlyMetricAdmin(admin.ModelAdmin):
+    list_display = ['period', 'client', 'metric', 'value']
+    list_filter = ['metric', 'period']
+
+
+@admin.register(DirtyDay)
+class DirtyDayAdmin(admin.ModelAdmin):
+    list_display = ['day', 'industry', 'marked_at']
+    list_filter = ['industry']
+
+
+@admin.register(DailyWorkerKPI)
+class DailyWorkerKPIAdmin(admin.ModelAdmin):
+    list_display = ['day', 'worker', 'role', 'orders_count', 'sales_sum', 'profit', 'bouquets_finished', 'bouquets_sold']
+    list_filter = ['role']
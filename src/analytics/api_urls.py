@@ -5,6 +5,7 @@ from src.analytics import api_views
 app_name = 'analytics'
 
 urlpatterns = [
+    path('dashboard/', api_views.AnalyticsDashboardView.as_view()),
     path('profit/', api_views.ProfitAnalyticsView.as_view()),
     path('profit-by-industry/', api_views.IndustryProfitAnalyticsView.as_view()),
     path('cashier/', api_views.CashierIncomeAnalyticsView.as_view()),
@@ -1,19 +1,23 @@
 from datetime import datetime
 
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ViewSet
 
 from src.analytics.enums import ProductAnalyticsIndicator, FloristsAnalyticsIndicator, SalesmenAnalyticsIndicator, \
-    OutlaysAnalyticsIndicator, ClientsAnalyticsIndicator
+    OutlaysAnalyticsIndicator, ClientsAnalyticsIndicator, AnalyticsGranularity, AnalyticsComparison
 from src.analytics.serializers import ClientAnalyticClientSerializer
 from src.analytics.services import ProfitAnalyticsService, IndustryProfitAnalyticService, \
     CashierIncomeAnalyticsService, IndustrySalesAnalyticsService, OverallTurnoverShareAnalyticsService, \
     ProductAnalyticsService, ProductFactorySalesAnalyticsService, FloristsAnalyticsService, SalesmenAnalyticsService, \
-    OutlaysAnalyticService, WriteOffsAnalyticsService, ClientsAnalyticsService, ClientsTopAnalyticsService
+    OutlaysAnalyticService, WriteOffsAnalyticsService, ClientsAnalyticsService, ClientsTopAnalyticsService, \
+    AnalyticsDashboardService, get_fresh_as_of
 from src.base.api_views import AnalyticsTablePagination
 from src.product.models import Industry
 
@@ -39,6 +43,39 @@ class DateRangeFilterMixin:
 
         return start_date, end_date
 
+    def get_granularity(self):
+        granularity = self.request.query_params.get('granularity') or AnalyticsGranularity.DAY
+        if granularity not in AnalyticsGranularity.values:
+            raise ValidationError({'granularity': f"Допустимые значения: {', '.join(AnalyticsGranularity.values)}"})
+        return granularity
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # taken before the rollups are read, a write committed while they are read is not claimed as included
+        start_date, end_date = self.get_start_end_dates()
+        self.fresh_as_of = get_fresh_as_of(timezone.localdate(start_date), timezone.localdate(end_date))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['X-Analytics-Fresh-As-Of'] = timezone.localtime(self.fresh_as_of).isoformat()
+            if request.method in ('GET', 'HEAD'):
+                response = self.get_conditional_response(request, response)
+        return response
+
+    def get_conditional_response(self, request, response):
+        """Strong ETag of the rendered payload, a repeated request with the same payload gets 304 Not Modified."""
+        response.render()
+        set_response_etag(response)
+        patch_cache_control(response, private=True, no_cache=True)
+        return get_conditional_response(request, etag=response['ETag'], response=response)
+
+    def get_compare_to(self):
+        compare_to = self.request.query_params.get('compare_to') or None
+        if compare_to and compare_to not in AnalyticsComparison.values:
+            raise ValidationError({'compare_to': f"Допустимые значения: {', '.join(AnalyticsComparison.values)}"})
+        return compare_to
+
 
 class ProfitAnalyticsView(DateRangeFilterMixin, APIView):
     @swagger_auto_schema(
@@ -47,11 +84,17 @@ class ProfitAnalyticsView(DateRangeFilterMixin, APIView):
                               description="Start date in DD.MM.YYYY format"),
             openapi.Parameter('end_date', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
                               description="End date in DD.MM.YYYY format"),
+            openapi.Parameter('granularity', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=AnalyticsGranularity.values, default=AnalyticsGranularity.DAY),
+            openapi.Parameter('compare_to', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=AnalyticsComparison.values),
         ]
     )
     def get(self, request):
         start_date, end_date = self.get_start_end_dates()
-        result = ProfitAnalyticsService(start_date, end_date).get_final_result_data()
+        result = ProfitAnalyticsService(start_date, end_date, self.get_granularity()).get_final_result_data(
+            self.get_compare_to()
+        )
         return Response(data=result)
 
 
@@ -64,13 +107,19 @@ class IndustryProfitAnalyticsView(DateRangeFilterMixin, APIView):
             openapi.Parameter('end_date', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
                               description="End date in DD.MM.YYYY format"),
             openapi.Parameter('industry', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('granularity', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=AnalyticsGranularity.values, default=AnalyticsGranularity.DAY),
+            openapi.Parameter('compare_to', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=AnalyticsComparison.values),
         ]
     )
     def get(self, request):
         start_date, end_date = self.get_start_end_dates()
         industry_id = self.request.query_params.get('industry')
         industry = Industry.objects.get(pk=industry_id) if industry_id else None
-        result = IndustryProfitAnalyticService(start_date, end_date, industry).get_final_result_data()
+        result = IndustryProfitAnalyticService(
+            start_date, end_date, industry, self.get_granularity()
+        ).get_final_result_data(self.get_compare_to())
         return Response(data=result)
 
 
@@ -81,11 +130,13 @@ class CashierIncomeAnalyticsView(DateRangeFilterMixin, APIView):
                               description="Start date in DD.MM.YYYY format"),
             openapi.Parameter('end_date', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
                               description="End date in DD.MM.YYYY format"),
+            openapi.Parameter('granularity', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=AnalyticsGranularity.values, default=AnalyticsGranularity.DAY),
         ]
     )
     def get(self, request):
         start_date, end_date = self.get_start_end_dates()
-        result = CashierIncomeAnalyticsService(start_date, end_date).get_final_result_data()
+        result = CashierIncomeAnalyticsService(start_date, end_date, self.get_granularity()).get_final_result_data()
         return Response(data=result)
 
 
@@ -201,13 +252,17 @@ class FloristsAnalyticsView(DateRangeFilterMixin, APIView):
             openapi.Parameter('end_date', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
                               description="End date in DD.MM.YYYY format"),
             openapi.Parameter('indicator', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
-                              enum=FloristsAnalyticsIndicator.values)
+                              enum=FloristsAnalyticsIndicator.values),
+            openapi.Parameter('compare_to', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=AnalyticsComparison.values),
         ]
     )
     def get(self, request, *args, **kwargs):
         start_date, end_date = self.get_start_end_dates()
         indicator = self.request.query_params.get('indicator', FloristsAnalyticsIndicator.FINISHED_PRODUCTS)
-        result = FloristsAnalyticsService(indicator, start_date, end_date).get_final_result_data()
+        result = FloristsAnalyticsService(indicator, start_date, end_date).get_final_result_data(
+            self.get_compare_to()
+        )
         return Response(data=result)
 
 
@@ -219,13 +274,17 @@ class SalesmenAnalyticsView(DateRangeFilterMixin, APIView):
             openapi.Parameter('end_date', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
                               description="End date in DD.MM.YYYY format"),
             openapi.Parameter('indicator', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
-                              enum=SalesmenAnalyticsIndicator.values)
+                              enum=SalesmenAnalyticsIndicator.values),
+            openapi.Parameter('compare_to', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=AnalyticsComparison.values),
         ]
     )
     def get(self, request, *args, **kwargs):
         start_date, end_date = self.get_start_end_dates()
         indicator = self.request.query_params.get('indicator', SalesmenAnalyticsIndicator.SALES_COUNT)
-        result = SalesmenAnalyticsService(indicator, start_date, end_date).get_final_result_data()
+        result = SalesmenAnalyticsService(indicator, start_date, end_date).get_final_result_data(
+            self.get_compare_to()
+        )
         return Response(data=result)
 
 
@@ -365,6 +424,35 @@ class ClientsAnalyticsViewSet(DateRangeFilterMixin, ViewSet):
         return Response({"data": data, "indicator_options": indicator_choices})
 
 
+class AnalyticsDashboardView(DateRangeFilterMixin, APIView):
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('start_date', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Start date in DD.MM.YYYY format"),
+            openapi.Parameter('end_date', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="End date in DD.MM.YYYY format"),
+            openapi.Parameter('granularity', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=AnalyticsGranularity.values, default=AnalyticsGranularity.DAY),
+            openapi.Parameter('widgets', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                              description="Comma separated widgets, an indicator may follow a colon: "
+                                          "profit,products:PROFIT_SUM,outlays_chart,outlays_table. "
+                                          f"Widgets: {', '.join(AnalyticsDashboardService.widgets_map)}"),
+        ]
+    )
+    def get(self, request):
+        widgets = [widget for widget in self.request.query_params.get('widgets', '').split(',') if widget]
+        unknown_widgets = [
+            widget for widget in widgets if widget.partition(':')[0] not in AnalyticsDashboardService.widgets_map
+        ]
+        if not widgets or unknown_widgets:
+            raise ValidationError({'widgets': f"Неизвестные виджеты: {', '.join(unknown_widgets) or '-'}"})
+
+        start_date, end_date = self.get_start_end_dates()
+        service = AnalyticsDashboardService(widgets, start_date, end_date, self.get_granularity())
+        result = service.get_result_data()
+        return Response(data=result, headers={'Server-Timing': service.get_server_timing()})
+
+
 class FloristsIndicatorOptionsView(APIView):
     def get(self, request):
         indicator_choices = [{"value": choice[0], "label": choice[1]} for choice in FloristsAnalyticsIndicator.choices]
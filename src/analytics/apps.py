@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'src.analytics'
+
+    def ready(self):
+        import src.analytics.signals  # noqa: F401
@@ -34,3 +34,21 @@ class ClientsAnalyticsIndicator(models.TextChoices):
     DEBT = "debt", "Долг"
     TOTAL_ORDERS_SUM = "total_orders_sum", "Сумма покупок"
     ORDERS_COUNT = "orders_count", "Кол-во покупок"
+
+
+class AnalyticsGranularity(models.TextChoices):
+    HOUR = "hour", "По часам"
+    DAY = "day", "По дням"
+    WEEK = "week", "По неделям"
+    MONTH = "month", "По месяцам"
+
+
+class AnalyticsComparison(models.TextChoices):
+    PREVIOUS_PERIOD = "previous_period", "С предыдущим периодом"
+    PREVIOUS_YEAR = "previous_year", "С прошлым годом"
+
+
+class WorkerKPIRole(models.TextChoices):
+    SALESMAN = "SALESMAN", "Продавец"
+    FLORIST = "FLORIST", "Флорист"
+    EMPLOYEE = "EMPLOYEE", "Сотрудник"
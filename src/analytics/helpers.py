@@ -1,5 +1,3 @@
-import random
-
 COLORS = [
     '#FF6384',
     '#F4CA16',
@@ -17,20 +15,6 @@ COLORS = [
 ]
 
 
-def generate_random_rgb():
-    min = 0
-    max = 255
-    red = random.randint(min, max)
-    green = random.randint(min, max)
-    blue = random.randint(min, max)
-    return red, green, blue
-
-
-def get_random_background_color():
-    r, g, b = generate_random_rgb()
-    return f"rgba({r}, {g}, {b}, 0.2)"
-
-
-def get_random_border_color():
-    r, g, b = generate_random_rgb()
-    return f"rgba({r}, {g}, {b}, 1)"
+def get_entity_color(entity_id):
+    """Palette colour of an entity by its id, so the entity keeps its colour on every chart and request."""
+    return COLORS[int(entity_id) % len(COLORS)]
@@ -0,0 +1,71 @@
+# Generated by Django 5.0.2 on 2026-10-19 06:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('payment', '0022_paymentmethod_is_active'),
+        ('product', '0017_product_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='День')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Кол-во продаж')),
+                ('turnover', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Оборот')),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Скидка на заказ')),
+                ('self_price', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Себестоимость')),
+                ('profit', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Прибыль')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата расчета')),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи за день',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCashFlow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True, verbose_name='День')),
+                ('payment_model_type', models.CharField(choices=[('OUTLAY', 'Расходы'), ('ORDER', 'Заказ'), ('INCOME', 'Приход'), ('PROVIDER', 'Поставщик')], max_length=255, verbose_name='Тип оплаты')),
+                ('outlay_type', models.CharField(blank=True, choices=[('INVESTMENT', 'Инвестиция'), ('SPENDING', 'Затраты'), ('WORKERS', 'Сотрудники')], max_length=255, null=True, verbose_name='Тип расхода')),
+                ('income', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Приход')),
+                ('outcome', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Расход')),
+                ('industry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_cash_flows', to='product.industry', verbose_name='Отрасль расхода')),
+                ('payment_method_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_cash_flows', to='payment.paymentmethodcategory', verbose_name='Категория метода оплаты')),
+            ],
+            options={
+                'verbose_name': 'Движение денег за день',
+                'verbose_name_plural': 'Движение денег за день',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyIndustrySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True, verbose_name='День')),
+                ('turnover', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Оборот')),
+                ('self_price', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Себестоимость')),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Скидка')),
+                ('profit', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Прибыль')),
+                ('industry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='product.industry', verbose_name='Отрасль')),
+            ],
+            options={
+                'verbose_name': 'Продажи отрасли за день',
+                'verbose_name_plural': 'Продажи отраслей за день',
+                'ordering': ['-day'],
+                'unique_together': {('day', 'industry')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-19 06:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('order', '0035_remove_clientdiscountlevel_client'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientMonthlyMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(verbose_name='Месяц')),
+                ('metric', models.CharField(choices=[('debt', 'Долг'), ('total_orders_sum', 'Сумма покупок'), ('orders_count', 'Кол-во покупок')], max_length=255, verbose_name='Показатель')),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Значение')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_metrics', to='order.client', verbose_name='Клиент')),
+            ],
+            options={
+                'verbose_name': 'Показатель клиента за месяц',
+                'verbose_name_plural': 'Показатели клиентов за месяц',
+                'indexes': [models.Index(fields=['period', 'metric', '-value'], name='client_metric_period_idx')],
+                'unique_together': {('client', 'period', 'metric')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-19 06:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_client_monthly_metric'),
+        ('product', '0017_product_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True, verbose_name='День')),
+                ('marked_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+                ('industry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dirty_days', to='product.industry', verbose_name='Отрасль')),
+            ],
+            options={
+                'verbose_name': 'Измененный день',
+                'verbose_name_plural': 'Измененные дни',
+                'ordering': ['day'],
+            },
+        ),
+    ]
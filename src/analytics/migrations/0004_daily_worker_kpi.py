@@ -0,0 +1,40 @@
+# Generated by Django 5.0.2 on 2026-10-19 07:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_dirty_day'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyWorkerKPI',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True, verbose_name='День')),
+                ('role', models.CharField(choices=[('SALESMAN', 'Продавец'), ('FLORIST', 'Флорист'), ('EMPLOYEE', 'Сотрудник')], max_length=255, verbose_name='Роль')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Кол-во продаж')),
+                ('products_sold', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Кол-во проданных товаров')),
+                ('sales_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма продаж')),
+                ('profit', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Прибыль')),
+                ('bouquets_finished', models.PositiveIntegerField(default=0, verbose_name='Кол-во готовых букетов')),
+                ('bouquets_sold', models.PositiveIntegerField(default=0, verbose_name='Кол-во проданных букетов')),
+                ('written_off', models.PositiveIntegerField(default=0, verbose_name='Кол-во списанных букетов')),
+                ('incomes', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Начисления')),
+                ('payments', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Выплаты')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_kpis', to=settings.AUTH_USER_MODEL, verbose_name='Сотрудник')),
+            ],
+            options={
+                'verbose_name': 'Показатели сотрудника за день',
+                'verbose_name_plural': 'Показатели сотрудников за день',
+                'ordering': ['-day'],
+                'unique_together': {('day', 'worker', 'role')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_daily_worker_kpi'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            DELETE FROM analytics_dirtyday AS duplicate
+            USING analytics_dirtyday AS mark
+            WHERE duplicate.day = mark.day
+            AND duplicate.industry_id IS NOT DISTINCT FROM mark.industry_id
+            AND (duplicate.marked_at, duplicate.id) > (mark.marked_at, mark.id)
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='dirtyday',
+            constraint=models.UniqueConstraint(
+                fields=('day', 'industry'), name='unique_dirty_day', nulls_distinct=False
+            ),
+        ),
+    ]
@@ -1,3 +1,296 @@
 from django.db import models
 
-# Create your models here.
+from src.analytics.enums import ClientsAnalyticsIndicator, WorkerKPIRole
+from src.payment.enums import PaymentModelType, OutlayType
+
+
+class DailySales(models.Model):
+    day = models.DateField(
+        unique=True,
+        verbose_name="День"
+    )
+    orders_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Кол-во продаж"
+    )
+    turnover = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Оборот"
+    )
+    discount = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Скидка на заказ"
+    )
+    self_price = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Себестоимость"
+    )
+    profit = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Прибыль"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата расчета"
+    )
+
+    class Meta:
+        verbose_name = "Продажи за день"
+        verbose_name_plural = "Продажи за день"
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day}"
+
+
+class DailyIndustrySales(models.Model):
+    day = models.DateField(
+        db_index=True,
+        verbose_name="День"
+    )
+    industry = models.ForeignKey(
+        "product.Industry",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="daily_sales",
+        verbose_name="Отрасль"
+    )
+    turnover = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Оборот"
+    )
+    self_price = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Себестоимость"
+    )
+    discount = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Скидка"
+    )
+    profit = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Прибыль"
+    )
+
+    class Meta:
+        verbose_name = "Продажи отрасли за день"
+        verbose_name_plural = "Продажи отраслей за день"
+        ordering = ['-day']
+        unique_together = ['day', 'industry']
+
+    def __str__(self):
+        return f"{self.day} - {self.industry}"
+
+
+class DailyCashFlow(models.Model):
+    day = models.DateField(
+        db_index=True,
+        verbose_name="День"
+    )
+    payment_method_category = models.ForeignKey(
+        "payment.PaymentMethodCategory",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="daily_cash_flows",
+        verbose_name="Категория метода оплаты"
+    )
+    payment_model_type = models.CharField(
+        max_length=255,
+        choices=PaymentModelType.choices,
+        verbose_name="Тип оплаты"
+    )
+    outlay_type = models.CharField(
+        max_length=255,
+        choices=OutlayType.choices,
+        null=True,
+        blank=True,
+        verbose_name="Тип расхода"
+    )
+    industry = models.ForeignKey(
+        "product.Industry",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="daily_cash_flows",
+        verbose_name="Отрасль расхода"
+    )
+    income = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Приход"
+    )
+    outcome = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Расход"
+    )
+
+    class Meta:
+        verbose_name = "Движение денег за день"
+        verbose_name_plural = "Движение денег за день"
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day} - {self.payment_model_type}"
+
+
+class ClientMonthlyMetric(models.Model):
+    period = models.DateField(
+        verbose_name="Месяц"
+    )
+    client = models.ForeignKey(
+        "order.Client",
+        on_delete=models.CASCADE,
+        related_name="monthly_metrics",
+        verbose_name="Клиент"
+    )
+    metric = models.CharField(
+        max_length=255,
+        choices=ClientsAnalyticsIndicator.choices,
+        verbose_name="Показатель"
+    )
+    value = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Значение"
+    )
+
+    class Meta:
+        verbose_name = "Показатель клиента за месяц"
+        verbose_name_plural = "Показатели клиентов за месяц"
+        unique_together = ['client', 'period', 'metric']
+        indexes = [
+            models.Index(fields=['period', 'metric', '-value'], name='client_metric_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.period} - {self.client_id} - {self.metric}"
+
+
+class DirtyDay(models.Model):
+    day = models.DateField(
+        db_index=True,
+        verbose_name="День"
+    )
+    industry = models.ForeignKey(
+        "product.Industry",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="dirty_days",
+        verbose_name="Отрасль"
+    )
+    marked_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата изменения"
+    )
+
+    class Meta:
+        verbose_name = "Измененный день"
+        verbose_name_plural = "Измененные дни"
+        ordering = ['day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'industry'], nulls_distinct=False, name='unique_dirty_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.industry_id}"
+
+
+class DailyWorkerKPI(models.Model):
+    """
+    Worker indicators of a day. SALESMAN rows hold the completed orders of the salesman, FLORIST rows the
+    bouquets finished and sold by the florist, EMPLOYEE rows the bouquets by the day they were created
+    and the worker's incomes and payments.
+    """
+    day = models.DateField(
+        db_index=True,
+        verbose_name="День"
+    )
+    worker = models.ForeignKey(
+        "user.User",
+        on_delete=models.CASCADE,
+        related_name="daily_kpis",
+        verbose_name="Сотрудник"
+    )
+    role = models.CharField(
+        max_length=255,
+        choices=WorkerKPIRole.choices,
+        verbose_name="Роль"
+    )
+    orders_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Кол-во продаж"
+    )
+    products_sold = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Кол-во проданных товаров"
+    )
+    sales_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма продаж"
+    )
+    profit = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Прибыль"
+    )
+    bouquets_finished = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Кол-во готовых букетов"
+    )
+    bouquets_sold = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Кол-во проданных букетов"
+    )
+    written_off = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Кол-во списанных букетов"
+    )
+    incomes = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Начисления"
+    )
+    payments = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Выплаты"
+    )
+
+    class Meta:
+        verbose_name = "Показатели сотрудника за день"
+        verbose_name_plural = "Показатели сотрудников за день"
+        ordering = ['-day']
+        unique_together = ['day', 'worker', 'role']
+
+    def __str__(self):
+        return f"{self.day} - {self.worker_id} - {self.role}"
@@ -1,15 +1,27 @@
-from datetime import timedelta
+import copy
+import re
+import time
+import uuid
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from decimal import Decimal
 
-from django.db import models
-from django.db.models import Q, Sum, Case, When, F, ExpressionWrapper, Count, Exists, OuterRef
-from django.db.models.functions import TruncDay, Coalesce, Round
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.db import models, transaction, connection, connections, IntegrityError
+from django.db.models import Q, Sum, Case, When, F, Count, OuterRef
+from django.db.models.functions import Trunc, TruncDate, Coalesce
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.contrib.auth import get_user_model
 
 from src.analytics.enums import ProductAnalyticsIndicator, FloristsAnalyticsIndicator, SalesmenAnalyticsIndicator, \
-    OutlaysAnalyticsIndicator
-from src.analytics.helpers import get_random_background_color, get_random_border_color, COLORS
+    OutlaysAnalyticsIndicator, AnalyticsGranularity, ClientsAnalyticsIndicator, AnalyticsComparison, WorkerKPIRole
+from src.analytics.helpers import get_entity_color, COLORS
+from src.analytics.models import DailySales, DailyIndustrySales, DailyCashFlow, ClientMonthlyMetric, DirtyDay, \
+    DailyWorkerKPI
 from src.factory.enums import ProductFactoryStatus
 from src.factory.models import ProductFactoryCategory, ProductFactory, ProductFactoryItem
 from src.order.enums import OrderStatus
@@ -17,6 +29,7 @@ from src.order.models import OrderItem, OrderItemProductFactory, Order, Client
 from src.payment.enums import PaymentModelType, PaymentType, OutlayType
 from src.payment.models import Payment, Outlay
 from src.product.models import Industry, Product
+from src.report.models import DailySummary
 from src.user.enums import WorkerIncomeReason, WorkerIncomeType, UserType
 from src.user.models import WorkerIncomes
 from src.warehouse.models import WarehouseProductWriteOff
@@ -24,25 +37,689 @@ from src.warehouse.models import WarehouseProductWriteOff
 User = get_user_model()
 
 RESULT_DATE_FORMAT = '%d.%m'
+START_OF_DAY = datetime.min.time()
+END_OF_DAY = START_OF_DAY.replace(hour=23, minute=59, second=59)
+PERIOD_FREQUENCIES = {
+    AnalyticsGranularity.HOUR: 'h',
+    AnalyticsGranularity.DAY: 'D',
+    AnalyticsGranularity.WEEK: 'W-SUN',
+    AnalyticsGranularity.MONTH: 'M',
+}
+PERIOD_LABEL_FORMATS = {
+    AnalyticsGranularity.HOUR: '%d.%m %H:00',
+    AnalyticsGranularity.DAY: RESULT_DATE_FORMAT,
+    AnalyticsGranularity.WEEK: RESULT_DATE_FORMAT,
+    AnalyticsGranularity.MONTH: '%m.%Y',
+}
+CASH_FLOW_FIELDS = {
+    PaymentType.INCOME: 'income',
+    PaymentType.OUTCOME: 'outcome',
+}
+DASHBOARD_MAX_WORKERS = 4
+TURNOVER_COLOR = '255, 99, 132'
+PROFIT_COLOR = '53, 162, 235'
 DECIMAL_ROUND = Decimal("0.1")
+# Namespaces of the advisory locks taken while the rollups of a day are rebuilt
+DAILY_FACTS_LOCK = 1
+CLIENT_METRICS_LOCK = 2
+DAILY_SUMMARY_LOCK = 3
 
 
 class IncorrectIndicatorError(Exception):
     pass
 
 
+# =================== Daily facts =================== #
+def get_days_between(start_day, end_day):
+    return [start_day + timedelta(days=i) for i in range((end_day - start_day).days + 1)]
+
+
+def calculate_daily_sales(start_day, end_day):
+    orders = (
+        Order.objects.get_available()
+        .filter(status=OrderStatus.COMPLETED, created_at__date__range=[start_day, end_day])
+        .with_total_profit()
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(
+            orders_count=Count('id'),
+            turnover_sum=Sum('total_with_discount', default=0),
+            discount_sum=Sum('discount', default=0),
+            self_price_sum=Sum('total_self_price', default=0),
+            profit_sum=Sum('total_profit', default=0),
+        )
+        .order_by('day')
+    )
+    rows = {day: DailySales(day=day) for day in get_days_between(start_day, end_day)}
+    for entry in orders:
+        row = rows[entry['day']]
+        row.orders_count = entry['orders_count']
+        row.turnover = entry['turnover_sum']
+        row.discount = entry['discount_sum']
+        row.self_price = entry['self_price_sum']
+        row.profit = entry['profit_sum']
+    return list(rows.values())
+
+
+def calculate_daily_industry_sales(start_day, end_day):
+    order_filter = Q(
+        order__status=OrderStatus.COMPLETED,
+        order__is_deleted=False,
+        order__created_at__date__range=[start_day, end_day]
+    )
+    order_items = (
+        OrderItem.objects.filter(order_filter)
+        .with_total_profit().with_total_discount()
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', industry=F('product__category__industry_id'))
+        .annotate(
+            turnover_sum=Sum(F('total') - F('returned_total_sum'), default=0),
+            self_price_sum=Sum('total_self_price', default=0),
+            discount_sum=Sum('total_discount', default=0),
+            profit_sum=Sum('total_profit', default=0),
+        )
+        .order_by('day')
+    )
+    factory_order_items = (
+        OrderItemProductFactory.objects.filter(order_filter & Q(is_returned=False))
+        .with_total_self_price().with_total_discount().with_total_profit()
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', industry=F('product_factory__category__industry_id'))
+        .annotate(
+            turnover_sum=Sum('price', default=0),
+            self_price_sum=Sum('total_self_price', default=0),
+            discount_sum=Sum('total_discount', default=0),
+            profit_sum=Sum('total_profit', default=0),
+        )
+        .order_by('day')
+    )
+    rows = {}
+    for entry in [*order_items, *factory_order_items]:
+        key = (entry['day'], entry['industry'])
+        if key not in rows:
+            rows[key] = DailyIndustrySales(day=entry['day'], industry_id=entry['industry'])
+        row = rows[key]
+        row.turnover += entry['turnover_sum']
+        row.self_price += entry['self_price_sum']
+        row.discount += entry['discount_sum']
+        row.profit += entry['profit_sum']
+    return list(rows.values())
+
+
+def calculate_daily_cash_flows(start_day, end_day):
+    payments = (
+        Payment.objects.get_available()
+        .filter(created_at__date__range=[start_day, end_day])
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'payment_model_type', 'payment_method__category_id', 'outlay__outlay_type', 'outlay__industry_id')
+        .annotate(
+            income_sum=Sum('amount', default=0, filter=Q(payment_type=PaymentType.INCOME)),
+            outcome_sum=Sum('amount', default=0, filter=Q(payment_type=PaymentType.OUTCOME)),
+        )
+        .order_by('day')
+    )
+    return [
+        DailyCashFlow(
+            day=entry['day'],
+            payment_method_category_id=entry['payment_method__category_id'],
+            payment_model_type=entry['payment_model_type'],
+            outlay_type=entry['outlay__outlay_type'],
+            industry_id=entry['outlay__industry_id'],
+            income=entry['income_sum'],
+            outcome=entry['outcome_sum'],
+        ) for entry in payments
+    ]
+
+
+def get_worker_kpi_entries(start_day, end_day):
+    """(role, grouped rows) pairs, every row has day, kpi_worker and some of the DailyWorkerKPI values."""
+    completed_orders = Order.objects.get_available().filter(
+        status=OrderStatus.COMPLETED, created_at__date__range=[start_day, end_day], salesman__isnull=False
+    )
+    sold_order_items_filter = Q(
+        order__status=OrderStatus.COMPLETED,
+        order__is_deleted=False,
+        order__created_at__date__range=[start_day, end_day],
+    )
+    salesman_orders = (
+        completed_orders.with_total_profit()
+        .annotate(day=TruncDate('created_at'))
+        .values('day', kpi_worker=F('salesman_id'))
+        .annotate(
+            orders_count=Count('id'),
+            sales_sum=Sum('total_with_discount', default=0),
+            profit=Sum('total_profit', default=0),
+        )
+    )
+    salesman_order_items = (
+        OrderItem.objects.filter(sold_order_items_filter, order__salesman__isnull=False)
+        .with_returned_count()
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', kpi_worker=F('order__salesman_id'))
+        .annotate(products_sold=Sum(F('count') - F('returned_count'), default=0))
+    )
+    salesman_factory_order_items = (
+        OrderItemProductFactory.objects.filter(sold_order_items_filter, is_returned=False, order__salesman__isnull=False)
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', kpi_worker=F('order__salesman_id'))
+        .annotate(products_sold=Count('id'))
+    )
+    florist_finished_products = (
+        ProductFactory.objects.get_available()
+        .filter(finished_at__date__range=[start_day, end_day], florist__isnull=False)
+        .exclude(status__in=[ProductFactoryStatus.CREATED, ProductFactoryStatus.PENDING])
+        .annotate(day=TruncDate('finished_at'))
+        .values('day', kpi_worker=F('florist_id'))
+        .annotate(bouquets_finished=Count('id'))
+    )
+    florist_factory_order_items = (
+        OrderItemProductFactory.objects.filter(
+            sold_order_items_filter, is_returned=False, product_factory__florist__isnull=False
+        )
+        .with_total_profit()
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', kpi_worker=F('product_factory__florist_id'))
+        .annotate(
+            bouquets_sold=Count('id'),
+            sales_sum=Sum('price', default=0),
+            profit=Sum('total_profit', default=0),
+        )
+    )
+    worker_incomes = WorkerIncomes.objects.filter(created_at__date__range=[start_day, end_day]) \
+        .annotate(day=TruncDate('created_at'))
+    worker_income_sum = Sum(
+        Case(
+            When(income_type=WorkerIncomeType.INCOME, then=F('total')),
+            When(income_type=WorkerIncomeType.OUTCOME, then=-F('total')),
+            default=0, output_field=models.DecimalField()
+        ), default=0
+    )
+    florist_incomes = (
+        worker_incomes.filter(
+            reason__in=[WorkerIncomeReason.PRODUCT_FACTORY_SALE, WorkerIncomeReason.PRODUCT_FACTORY_CREATE]
+        )
+        .values('day', kpi_worker=F('worker_id'))
+        .annotate(incomes=worker_income_sum)
+    )
+    employee_products = (
+        ProductFactory.objects.get_available()
+        .filter(created_at__date__range=[start_day, end_day], florist__isnull=False)
+        .annotate(day=TruncDate('created_at'))
+        .values('day', kpi_worker=F('florist_id'))
+        .annotate(
+            bouquets_sold=Count('id', filter=Q(status=ProductFactoryStatus.SOLD)),
+            bouquets_finished=Count(
+                'id', filter=Q(status__in=[ProductFactoryStatus.FINISHED, ProductFactoryStatus.PENDING])
+            ),
+            written_off=Count('id', filter=Q(status=ProductFactoryStatus.WRITTEN_OFF)),
+        )
+    )
+    employee_incomes = worker_incomes.values('day', kpi_worker=F('worker_id')).annotate(incomes=worker_income_sum)
+    employee_payments = (
+        Payment.objects.get_available()
+        .filter(created_at__date__range=[start_day, end_day], worker__isnull=False)
+        .annotate(day=TruncDate('created_at'))
+        .values('day', kpi_worker=F('worker_id'))
+        .annotate(
+            payments=Sum(
+                Case(
+                    When(payment_type=PaymentType.OUTCOME, then=F('amount')),
+                    When(payment_type=PaymentType.INCOME, then=-F('amount')),
+                    default=0, output_field=models.DecimalField()
+                ), default=0
+            )
+        )
+    )
+    return [
+        (WorkerKPIRole.SALESMAN, salesman_orders),
+        (WorkerKPIRole.SALESMAN, salesman_order_items),
+        (WorkerKPIRole.SALESMAN, salesman_factory_order_items),
+        (WorkerKPIRole.FLORIST, florist_finished_products),
+        (WorkerKPIRole.FLORIST, florist_factory_order_items),
+        (WorkerKPIRole.FLORIST, florist_incomes),
+        (WorkerKPIRole.EMPLOYEE, employee_products),
+        (WorkerKPIRole.EMPLOYEE, employee_incomes),
+        (WorkerKPIRole.EMPLOYEE, employee_payments),
+    ]
+
+
+def calculate_daily_worker_kpis(start_day, end_day):
+    rows = {}
+    for role, entries in get_worker_kpi_entries(start_day, end_day):
+        for entry in entries.order_by():
+            key = (entry.pop('day'), entry.pop('kpi_worker'), role)
+            if key not in rows:
+                rows[key] = DailyWorkerKPI(day=key[0], worker_id=key[1], role=role)
+            for field_name, value in entry.items():
+                setattr(rows[key], field_name, getattr(rows[key], field_name) + value)
+    return list(rows.values())
+
+
+def lock_days(namespace, start_day, end_day):
+    """
+    Waits for the other transactions rebuilding these days of the namespace, the locks are held until
+    the current transaction ends. Otherwise two rebuilds of a day would both insert its rows, because
+    neither delete sees the rows the other has just committed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(%s, day) FROM generate_series(%s, %s) AS day",
+            [namespace, start_day.toordinal(), end_day.toordinal()]
+        )
+
+
+@transaction.atomic
+def build_daily_facts(start_day, end_day):
+    """Recomputes the analytics facts of every day in the range with a few grouped queries."""
+    lock_days(DAILY_FACTS_LOCK, start_day, end_day)
+    for model in [DailySales, DailyIndustrySales, DailyCashFlow, DailyWorkerKPI]:
+        model.objects.filter(day__range=[start_day, end_day]).delete()
+    DailySales.objects.bulk_create(calculate_daily_sales(start_day, end_day))
+    DailyIndustrySales.objects.bulk_create(calculate_daily_industry_sales(start_day, end_day))
+    DailyCashFlow.objects.bulk_create(calculate_daily_cash_flows(start_day, end_day))
+    DailyWorkerKPI.objects.bulk_create(calculate_daily_worker_kpis(start_day, end_day))
+
+
+def get_worker_kpi_value(kpis, role, expression):
+    """Sum of the worker's DailyWorkerKPI rows of the role, kpis is already limited to the days of the range."""
+    return Coalesce(
+        models.Subquery(
+            kpis.filter(worker_id=models.OuterRef('pk'), role=role)
+            .values('worker_id')
+            .annotate(total_sum=Sum(expression, default=0))
+            .values('total_sum')[:1]
+        ), models.Value(0), output_field=models.DecimalField()
+    )
+
+
+def get_day_spans(days):
+    """Groups sorted days into [first, last] spans of consecutive days."""
+    spans = []
+    for day in days:
+        if spans and spans[-1][1] + timedelta(days=1) == day:
+            spans[-1][1] = day
+        else:
+            spans.append([day, day])
+    return spans
+
+
+def split_by_whole_days(start_date, end_date):
+    """Splits a datetime range into the whole local days it covers, or None, and the partial edges around them."""
+    start_date, end_date = timezone.localtime(start_date), timezone.localtime(end_date)
+    first_day = start_date.date() if start_date.time() == START_OF_DAY else start_date.date() + timedelta(days=1)
+    last_day = end_date.date() if end_date.time() >= END_OF_DAY else end_date.date() - timedelta(days=1)
+    if first_day > last_day:
+        return None, [(start_date, end_date)]
+    edges = []
+    if start_date.date() < first_day:
+        first_day_start = timezone.make_aware(datetime.combine(first_day, START_OF_DAY))
+        edges.append((start_date, first_day_start - timedelta(microseconds=1)))
+    if end_date.date() > last_day:
+        edges.append((timezone.make_aware(datetime.combine(end_date.date(), START_OF_DAY)), end_date))
+    return (first_day, last_day), edges
+
+
+def ensure_daily_facts(start_day, end_day):
+    """Builds the days of the range that have no facts yet, dirty days are left to refresh_dirty_days()."""
+    existing_days = set(
+        DailySales.objects.filter(day__range=[start_day, end_day]).values_list('day', flat=True)
+    )
+    missing_days = [day for day in get_days_between(start_day, end_day) if day not in existing_days]
+    for span_start, span_end in get_day_spans(missing_days):
+        try:
+            build_daily_facts(span_start, span_end)
+        except IntegrityError:
+            # built concurrently by another request
+            pass
+
+
+# =================== Dirty days =================== #
+class DirtyDayMarks:
+    """Dirty marks collected during one transaction and inserted by a single on_commit callback."""
+
+    def __init__(self, marks, order_ids):
+        self.marks = set(marks)
+        self.order_ids = set(order_ids)
+
+    def flush(self):
+        if self.order_ids:
+            order_days = Order.objects.filter(pk__in=self.order_ids).values_list('created_at', flat=True)
+            self.marks.update((timezone.localdate(created_at), None) for created_at in order_days)
+        DirtyDay.objects.bulk_create(
+            [DirtyDay(day=day, industry_id=industry_id) for day, industry_id in self.marks], ignore_conflicts=True
+        )
+
+
+def add_dirty_day_marks(marks=(), order_ids=()):
+    connection = transaction.get_connection()
+    pending = getattr(connection, 'dirty_day_marks', None)
+    if pending is not None and any(func == pending.flush for _, func, _ in connection.run_on_commit):
+        pending.marks.update(marks)
+        pending.order_ids.update(order_ids)
+        return
+    connection.dirty_day_marks = DirtyDayMarks(marks, order_ids)
+    transaction.on_commit(connection.dirty_day_marks.flush)
+
+
+def mark_dirty_days(days, industry_ids=None):
+    """Marks the business days whose rollups are outdated once the write that changed them is committed."""
+    add_dirty_day_marks(marks={(day, industry_id) for day in days for industry_id in set(industry_ids or [None])})
+
+
+def mark_order_dirty_days(order_id):
+    """Marks the day of the order, the days of the orders of one transaction are read by one query on commit."""
+    add_dirty_day_marks(order_ids=[order_id])
+
+
+def refresh_dirty_days(marks=None):
+    """Rebuilds the rollups and the stored report summaries of the marked days and drops the marks it has seen.
+    The marks are dropped first in the same transaction, so a day marked again meanwhile gets a new mark once
+    the rebuild is committed. Returns the refreshed days."""
+    from src.report.services import build_daily_summary
+
+    with transaction.atomic():
+        marks = list((DirtyDay.objects.all() if marks is None else marks).values_list('pk', 'day'))
+        if not marks:
+            return []
+        DirtyDay.objects.filter(pk__in=[pk for pk, _ in marks]).delete()
+        days = sorted({day for _, day in marks})
+        for span_start, span_end in get_day_spans(days):
+            build_daily_facts(span_start, span_end)
+        built_periods = ClientMonthlyMetric.objects.filter(
+            period__in={day.replace(day=1) for day in days}
+        ).values_list('period', flat=True).distinct()
+        for period in built_periods:
+            build_client_monthly_metrics(period)
+        for date in DailySummary.objects.filter(date__in=days).values_list('date', flat=True):
+            build_daily_summary(date)
+    return days
+
+
+def get_fresh_as_of(start_day, end_day):
+    """Every write committed before the returned time is reflected in the rollups of the range."""
+    oldest_mark = DirtyDay.objects.filter(day__range=[start_day, end_day]).aggregate(
+        oldest_marked_at=models.Min('marked_at')
+    )['oldest_marked_at']
+    return oldest_mark or timezone.now()
+
+
+# =================== Client monthly metrics =================== #
+CLIENT_METRIC_AGGREGATES = {
+    ClientsAnalyticsIndicator.DEBT: Sum('debt', default=0),
+    ClientsAnalyticsIndicator.TOTAL_ORDERS_SUM: Sum('total_with_discount', default=0),
+    ClientsAnalyticsIndicator.ORDERS_COUNT: Count('id'),
+}
+
+
+def get_next_period(period):
+    return (period.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def get_client_metric_orders():
+    return Order.objects.get_available().exclude(status=OrderStatus.CANCELLED).with_total_with_discount()
+
+
+def calculate_client_monthly_metrics(period, client_id=None):
+    orders = get_client_metric_orders().filter(
+        client__isnull=False,
+        created_at__date__gte=period,
+        created_at__date__lt=get_next_period(period)
+    )
+    if client_id:
+        orders = orders.filter(client_id=client_id)
+    rows = orders.values('client_id').annotate(**{
+        f'value_{metric}': aggregate for metric, aggregate in CLIENT_METRIC_AGGREGATES.items()
+    }).order_by()
+    return [
+        ClientMonthlyMetric(period=period, client_id=row['client_id'], metric=metric, value=row[f'value_{metric}'])
+        for row in rows for metric in CLIENT_METRIC_AGGREGATES
+    ]
+
+
+@transaction.atomic
+def build_client_monthly_metrics(period, client_id=None):
+    lock_days(CLIENT_METRICS_LOCK, period, period)
+    metrics = ClientMonthlyMetric.objects.filter(period=period)
+    if client_id:
+        metrics = metrics.filter(client_id=client_id)
+    metrics.delete()
+    ClientMonthlyMetric.objects.bulk_create(calculate_client_monthly_metrics(period, client_id))
+
+
+def ensure_client_monthly_metrics(periods):
+    existing_periods = set(
+        ClientMonthlyMetric.objects.filter(period__in=periods).values_list('period', flat=True).distinct()
+    )
+    for period in periods:
+        if period not in existing_periods:
+            try:
+                build_client_monthly_metrics(period)
+            except IntegrityError:
+                # built concurrently by another request
+                pass
+
+
+# =================== Outlay totals =================== #
+OUTLAY_TOTALS_VERSION_KEY = 'analytics:outlay_totals:version'
+OUTLAY_TOTALS_CACHE_KEY = 'analytics:outlay_totals:{version}:{start_date}:{end_date}'
+# Short, so that processes the version bump does not reach (see check core.W001) serve old totals only briefly
+OUTLAY_TOTALS_CACHE_TIMEOUT = 60
+# Income and outcome of the outlays, of their industries and of all of them in one pass: ROLLUP adds a subtotal
+# row per industry and a grand total row, the window over the grand total row gives every row its share.
+OUTLAY_TOTALS_SQL = """
+WITH totals AS (
+    SELECT
+        industry_ref, industry_name, outlay_ref, outlay_title,
+        GROUPING(industry_ref, outlay_ref) AS grouping_level,
+        COALESCE(SUM(amount) FILTER (WHERE payment_type = %s), 0) AS income,
+        COALESCE(SUM(amount) FILTER (WHERE payment_type = %s), 0) AS outcome
+    FROM ({payments}) AS payments
+    GROUP BY ROLLUP ((industry_ref, industry_name), (outlay_ref, outlay_title))
+)
+SELECT
+    grouping_level, industry_ref, industry_name, outlay_ref, outlay_title, income, outcome,
+    ROUND(income * 100 / NULLIF(MAX(income) FILTER (WHERE grouping_level = 3) OVER (), 0), 1)::float,
+    ROUND(outcome * 100 / NULLIF(MAX(outcome) FILTER (WHERE grouping_level = 3) OVER (), 0), 1)::float
+FROM totals
+ORDER BY grouping_level DESC, industry_ref NULLS LAST, outlay_ref
+"""
+OUTLAY_TOTALS_FIELDS = (
+    'industry_id', 'industry_name', 'id', 'title', 'income', 'outcome', 'income_percentage', 'outcome_percentage'
+)
+
+
+def get_outlay_totals_version():
+    version = cache.get(OUTLAY_TOTALS_VERSION_KEY)
+    if version is None:
+        cache.add(OUTLAY_TOTALS_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(OUTLAY_TOTALS_VERSION_KEY)
+    return version
+
+
+def invalidate_outlay_totals():
+    cache.set(OUTLAY_TOTALS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def calculate_outlay_totals(start_date, end_date):
+    payments = Payment.objects.get_available().filter(
+        created_at__gte=start_date,
+        created_at__lte=end_date,
+        outlay__is_deleted=False,
+    ).order_by().values(
+        'payment_type',
+        'amount',
+        industry_ref=F('outlay__industry_id'),
+        industry_name=F('outlay__industry__name'),
+        outlay_ref=F('outlay_id'),
+        outlay_title=F('outlay__title'),
+    )
+    payments_sql, payments_params = payments.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            OUTLAY_TOTALS_SQL.format(payments=payments_sql),
+            [PaymentType.INCOME, PaymentType.OUTCOME, *payments_params]
+        )
+        rows = cursor.fetchall()
+
+    totals = {'income': Decimal(0), 'outcome': Decimal(0), 'industries': [], 'outlays': []}
+    for grouping_level, *values in rows:
+        row = dict(zip(OUTLAY_TOTALS_FIELDS, values))
+        if grouping_level == 3:
+            totals.update(income=row['income'], outcome=row['outcome'])
+        elif grouping_level == 1:
+            del row['id'], row['title']
+            totals['industries'].append(row)
+        else:
+            totals['outlays'].append(row)
+    return totals
+
+
+def get_outlay_totals(start_date, end_date):
+    """
+    Income and outcome per outlay and per outlay industry with their shares in the totals of the period.
+    Cached per period for a minute at most, or until a payment or an outlay changes.
+    """
+    # whole seconds, so that the default ranges of the views, which carry the microseconds of now(), share a key
+    start_date, end_date = start_date.replace(microsecond=0), end_date.replace(microsecond=999999)
+    return cache.get_or_set(
+        OUTLAY_TOTALS_CACHE_KEY.format(
+            version=get_outlay_totals_version(),
+            start_date=start_date.isoformat(),
+            end_date=end_date.isoformat()
+        ),
+        lambda: calculate_outlay_totals(start_date, end_date),
+        OUTLAY_TOTALS_CACHE_TIMEOUT
+    )
+
+
+# =================== Period comparison =================== #
+COMPARISON_DATE_FORMAT = '%d.%m.%Y'
+
+
+def shift_year_back(value):
+    try:
+        return value.replace(year=value.year - 1)
+    except ValueError:
+        # 29 February
+        return value.replace(year=value.year - 1, day=28)
+
+
+def get_comparison_range(start_date, end_date, compare_to):
+    if compare_to == AnalyticsComparison.PREVIOUS_YEAR:
+        return shift_year_back(start_date), shift_year_back(end_date)
+    period_length = timezone.localdate(end_date) - timezone.localdate(start_date) + timedelta(days=1)
+    return start_date - period_length, end_date - period_length
+
+
+def get_change_percentage(current, previous):
+    if not previous:
+        return None
+    return round(float((current - previous) / abs(previous) * 100), 1)
+
+
+def get_comparison_data(current, previous):
+    """Deltas and percentages of change of the current values against the previous ones, by value name."""
+    return dict(
+        previous=previous,
+        delta={name: current[name] - previous[name] for name in current},
+        percentage={name: get_change_percentage(current[name], previous[name]) for name in current},
+    )
+
+
 class BaseAnalyticsService:
-    def __init__(self, start_date, end_date):
+    def __init__(self, start_date, end_date, granularity=AnalyticsGranularity.DAY):
         self.start_date = start_date
         self.end_date = end_date
+        self.granularity = granularity
+        self.facts_ensured = False
+
+    def get_days_range(self):
+        return timezone.localdate(self.start_date), timezone.localdate(self.end_date)
+
+    def get_periods(self):
+        start_date = timezone.localtime(self.start_date).replace(tzinfo=None)
+        end_date = timezone.localtime(self.end_date).replace(tzinfo=None)
+        return pd.period_range(start_date, end_date, freq=PERIOD_FREQUENCIES[self.granularity]).to_timestamp()
+
+    def get_period_labels(self):
+        return self.get_periods().strftime(PERIOD_LABEL_FORMATS[self.granularity]).tolist()
+
+    def is_hourly(self):
+        return self.granularity == AnalyticsGranularity.HOUR
+
+    def to_series(self, rows):
+        """Puts (period, value) rows on the full period index of the range, missing periods are zeros."""
+        periods = self.get_periods()
+        if not rows:
+            return pd.Series(0.0, index=periods)
+        index, values = zip(*rows)
+        index = pd.DatetimeIndex(index)
+        if index.tz is not None:
+            index = index.tz_convert(timezone.get_current_timezone()).tz_localize(None)
+        series = pd.Series(np.array(values, dtype=float), index=index)
+        return series.groupby(level=0).sum().reindex(periods, fill_value=0.0)
+
+    def get_series(self, queryset, value, date_field='created_at'):
+        rows = (
+            queryset.annotate(period=Trunc(date_field, self.granularity, tzinfo=timezone.get_current_timezone()))
+            .values('period')
+            .annotate(total_sum=Sum(value, default=0))
+            .order_by('period')
+            .values_list('period', 'total_sum')
+        )
+        return self.to_series(list(rows))
+
+    def get_fact_series(self, queryset, value):
+        rows = (
+            queryset.annotate(period=Trunc('day', self.granularity, output_field=models.DateField()))
+            .values('period')
+            .annotate(total_sum=Sum(value, default=0))
+            .order_by('period')
+            .values_list('period', 'total_sum')
+        )
+        return self.to_series(list(rows))
+
+    def get_chart_dataset(self, label, series, color):
+        return dict(
+            label=label,
+            data=series.round(2).tolist(),
+            borderColor=f'rgb({color})',
+            backgroundColor=f'rgba({color}, 0.5)',
+        )
 
-    def get_all_days_list(self):
-        delta = self.end_date - self.start_date
-        return [
-            (self.start_date + timedelta(days=i)).replace(
-                hour=0, minute=0, second=0, microsecond=0, tzinfo=timezone.get_current_timezone()
-            ) for i in range(delta.days + 1)
-        ]
+    def get_series_chart_data(self, datasets, **extra):
+        """Chart.js payload for several (label, series, color) lines over the range periods."""
+        values = np.concatenate([series.to_numpy() for _, series, _ in datasets])
+        return dict(
+            labels=self.get_period_labels(),
+            datasets=[self.get_chart_dataset(label, series, color) for label, series, color in datasets],
+            **extra,
+            min=float(values.min()),
+            max=float(values.max()),
+        )
+
+    def annotate_share_of_total(self, queryset, field_name, share_field_name):
+        """
+        Rows of the queryset with the share of each row in the column total, largest share first.
+        The annotated rows are selected in a materialized CTE, so the correlated subqueries behind them run
+        once per row and SUM() OVER () in the outer query only reads their results.
+        """
+        sql, params = queryset.select_related(None).order_by().query.sql_with_params()
+        field, share_field = connection.ops.quote_name(field_name), connection.ops.quote_name(share_field_name)
+        pk_column = connection.ops.quote_name(queryset.model._meta.pk.column)
+        return queryset.model.objects.raw(
+            f"WITH annotated AS MATERIALIZED ({sql}) "
+            f"SELECT annotated.*, ROUND({field} * 100 / NULLIF(SUM({field}) OVER (), 0), 1)::float AS {share_field} "
+            f"FROM annotated ORDER BY {share_field} DESC NULLS LAST, {pk_column}",
+            params
+        )
+
+    def get_daily_facts(self, model):
+        start_day, end_day = self.get_days_range()
+        if not self.facts_ensured:
+            ensure_daily_facts(start_day, end_day)
+            self.facts_ensured = True
+        return model.objects.filter(day__range=[start_day, end_day])
 
     def filter_by_date_range(self, queryset, date_field='created_at'):
         return queryset.filter(
@@ -50,13 +727,59 @@ class BaseAnalyticsService:
             Q(**{f'{date_field}__lte': self.end_date})
         )
 
+    def get_comparison_service(self, compare_to):
+        """The same analytics over the window it is compared to, must be taken before any cached result."""
+        service = copy.copy(self)
+        service.start_date, service.end_date = get_comparison_range(self.start_date, self.end_date, compare_to)
+        service.facts_ensured = False
+        return service
+
+    def get_comparison_info(self, compare_to, service):
+        return dict(
+            compare_to=compare_to,
+            start_date=timezone.localtime(service.start_date).strftime(COMPARISON_DATE_FORMAT),
+            end_date=timezone.localtime(service.end_date).strftime(COMPARISON_DATE_FORMAT),
+        )
+
+    def get_series_comparison(self, compare_to, current_series):
+        """Compares the {name: series} of the range with the same series of the compared window, read from the
+        daily facts like the range itself."""
+        service = self.get_comparison_service(compare_to)
+        previous_series = service.get_totals_series()
+        current = {name: round(float(series.sum()), 2) for name, series in current_series.items()}
+        previous = {name: round(float(series.sum()), 2) for name, series in previous_series.items()}
+        return dict(
+            **self.get_comparison_info(compare_to, service),
+            labels=service.get_period_labels(),
+            data={name: series.round(2).tolist() for name, series in previous_series.items()},
+            total=current,
+            **get_comparison_data(current, previous),
+        )
+
+    def get_ranking_comparison(self, compare_to, rows, queryset):
+        """Previous values are computed for the ranked rows only, so a comparison costs one ranking page more."""
+        service = self.get_comparison_service(compare_to)
+        annotate_method, field_name = service.get_indicator_method_and_field()
+        previous_values = dict(
+            annotate_method(queryset.filter(pk__in=[row.pk for row in rows])).values_list('pk', field_name)
+        )
+        current = {row.pk: getattr(row, field_name) for row in rows}
+        previous = {row.pk: previous_values.get(row.pk, 0) for row in rows}
+        comparison = get_comparison_data(current, previous)
+        return dict(
+            **self.get_comparison_info(compare_to, service),
+            data=[previous[row.pk] for row in rows],
+            delta=[comparison['delta'][row.pk] for row in rows],
+            percentage=[comparison['percentage'][row.pk] for row in rows],
+        )
+
 
 class ProfitAnalyticsService(BaseAnalyticsService):
 
     def get_orders(self):
         orders = Order.objects.get_available().filter(
             Q(status=OrderStatus.COMPLETED),
-        ).with_total_with_discount().with_total_discount().with_total_self_price().with_total_profit()
+        ).with_total_profit()
         return self.filter_by_date_range(orders)
 
     def get_outlay_payments(self):
@@ -65,145 +788,45 @@ class ProfitAnalyticsService(BaseAnalyticsService):
         )
         return self.filter_by_date_range(payments)
 
-    def get_worker_incomes(self):
-        worker_incomes = WorkerIncomes.objects.filter(
-            Q(
-                reason__in=[
-                    WorkerIncomeReason.PRODUCT_SALE,
-                    WorkerIncomeReason.PRODUCT_FACTORY_CREATE,
-                    WorkerIncomeReason.PRODUCT_FACTORY_SALE
-                ]
-            ),
-        )
-        return self.filter_by_date_range(worker_incomes)
+    def get_sales_series(self, field_name):
+        if self.is_hourly():
+            order_fields = {'turnover': 'total_with_discount', 'profit': 'total_profit'}
+            return self.get_series(self.get_orders(), order_fields[field_name])
+        return self.get_fact_series(self.get_daily_facts(DailySales), field_name)
 
-    def get_total_profit_by_day(self, orders, worker_incomes, outlay_payments):
-        orders_by_day = (
-            orders.annotate(day=TruncDay('created_at'))
-            .values('day')
-            .annotate(total_profit_sum=Sum('total_profit', default=0))
-            .order_by('day')
-        )
-        # worker_incomes_difference_by_day = (
-        #     worker_incomes
-        #     .annotate(day=TruncDay('created_at'))
-        #     .values('day')
-        #     .annotate(
-        #         total_difference=Sum(
-        #             Case(
-        #                 When(income_type=WorkerIncomeType.INCOME, then=F('total')),
-        #                 When(income_type=WorkerIncomeType.OUTCOME, then=-F('total')),
-        #                 default=0,
-        #                 output_field=models.DecimalField()
-        #             ), default=0
-        #         )
-        #     )
-        #     .order_by('day')
-        # )
-        outlays_by_day = (
-            outlay_payments.annotate(day=TruncDay('created_at'))
-            .values('day')
-            .annotate(
-                amount_sum=Sum(
-                    Case(
-                        When(payment_type=PaymentType.OUTCOME, then=F('amount')),
-                        When(payment_type=PaymentType.INCOME, then=-F('amount')),
-                        default=0, output_field=models.DecimalField()
-                    ), default=0
-                )
-            )
-            .order_by('day')
-        )
-
-        all_days = self.get_all_days_list()
-        result_dict = {day: 0 for day in all_days}
-
-        for entry in orders_by_day:
-            result_dict[entry['day']] += entry['total_profit_sum']
-
-        # for entry in worker_incomes_difference_by_day:
-        #     result_dict[entry['day']] -= entry['total_difference']
+    def get_outlay_series(self, payment_type):
+        if self.is_hourly():
+            return self.get_series(self.get_outlay_payments().filter(payment_type=payment_type), 'amount')
+        outlay_cash_flows = self.get_daily_facts(DailyCashFlow).filter(payment_model_type=PaymentModelType.OUTLAY)
+        return self.get_fact_series(outlay_cash_flows, CASH_FLOW_FIELDS[payment_type])
 
-        for entry in outlays_by_day:
-            result_dict[entry['day']] -= entry['amount_sum']
-
-        final_totals_list = [
-            {'day': day.strftime(RESULT_DATE_FORMAT), 'total': total}
-            for day, total in result_dict.items()
-        ]
-        max_total_profit = max(result['total'] for result in final_totals_list)
-        min_total_profit = min(result['total'] for result in final_totals_list)
-        return final_totals_list, max_total_profit, min_total_profit
-
-    def get_total_turnover_by_day(self, orders, outlay_payments):
-        orders_by_day = (
-            orders.annotate(day=TruncDay('created_at'))
-            .values('day')
-            .annotate(total_with_discount_sum=Sum('total_with_discount', default=0))
-            .order_by('day')
+    def get_total_profit_series(self):
+        return (
+            self.get_sales_series('profit')
+            - self.get_outlay_series(PaymentType.OUTCOME)
+            + self.get_outlay_series(PaymentType.INCOME)
         )
-        outlays_by_day = (
-            outlay_payments.annotate(day=TruncDay('created_at'))
-            .values('day')
-            .annotate(
-                amount_sum=Sum(
-                    Case(
-                        When(payment_type=PaymentType.INCOME, then=F('amount')),
-                        default=0, output_field=models.DecimalField()
-                    ), default=0
-                )
-            )
-            .order_by('day')
-        )
-        all_days = self.get_all_days_list()
-        result_dict = {day: 0 for day in all_days}
-
-        for entry in orders_by_day:
-            result_dict[entry['day']] += entry['total_with_discount_sum']
 
-        for entry in outlays_by_day:
-            result_dict[entry['day']] += entry['amount_sum']
+    def get_total_turnover_series(self):
+        return self.get_sales_series('turnover') + self.get_outlay_series(PaymentType.INCOME)
 
-        final_totals_list = [
-            {'day': day.strftime(RESULT_DATE_FORMAT), 'total': total}
-            for day, total in result_dict.items()
-        ]
-        max_total_turnover = max(result['total'] for result in final_totals_list)
-        min_total_turnover = min(result['total'] for result in final_totals_list)
-        return final_totals_list, max_total_turnover, min_total_turnover
+    def get_totals_series(self):
+        return dict(turnover=self.get_total_turnover_series(), profit=self.get_total_profit_series())
 
-    def get_final_result_data(self):
-        orders = self.get_orders()
-        worker_incomes = self.get_worker_incomes()
-        outlays = self.get_outlay_payments()
-        total_profit_by_day, max_total_profit, min_total_profit = self.get_total_profit_by_day(
-            orders, worker_incomes, outlays
-        )
-        total_turnover_by_day, max_total_turnover, min_total_turnover = self.get_total_turnover_by_day(orders, outlays)
-        return dict(
-            labels=[day.strftime(RESULT_DATE_FORMAT) for day in self.get_all_days_list()],
-            datasets=[
-                dict(
-                    label='Оборот',
-                    data=[item['total'] for item in total_turnover_by_day],
-                    borderColor='rgb(255, 99, 132)',
-                    backgroundColor='rgba(255, 99, 132, 0.5)',
-                ),
-                dict(
-                    label='Прибыль',
-                    data=[item['total'] for item in total_profit_by_day],
-                    borderColor='rgb(53, 162, 235)',
-                    backgroundColor='rgba(53, 162, 235, 0.5)',
-                ),
-            ],
-            min=min(min_total_profit, min_total_turnover),
-            max=max(max_total_profit, max_total_turnover),
-        )
+    def get_final_result_data(self, compare_to=None):
+        totals_series = self.get_totals_series()
+        result = self.get_series_chart_data([
+            ('Оборот', totals_series['turnover'], TURNOVER_COLOR),
+            ('Прибыль', totals_series['profit'], PROFIT_COLOR),
+        ])
+        if compare_to:
+            result['comparison'] = self.get_series_comparison(compare_to, totals_series)
+        return result
 
 
 class IndustryProfitAnalyticService(BaseAnalyticsService):
-    def __init__(self, start_date, end_date, industry):
-        super().__init__(start_date, end_date)
+    def __init__(self, start_date, end_date, industry, granularity=AnalyticsGranularity.DAY):
+        super().__init__(start_date, end_date, granularity)
         self.industry = industry
 
     def get_order_items(self):
@@ -211,7 +834,7 @@ class IndustryProfitAnalyticService(BaseAnalyticsService):
             Q(product__category__industry=self.industry) &
             Q(order__status=OrderStatus.COMPLETED) &
             Q(order__is_deleted=False)
-        ).with_total_profit().with_returned_total_sum()
+        ).with_total_profit()
         return self.filter_by_date_range(order_items, 'order__created_at')
 
     def get_factory_order_items(self):
@@ -231,252 +854,89 @@ class IndustryProfitAnalyticService(BaseAnalyticsService):
         )
         return self.filter_by_date_range(outlay_payments, 'created_at')
 
-    def get_total_turnover_by_day(self, order_items, factory_order_items, outlay_payments):
-        order_items_by_day = (
-            order_items.annotate(day=TruncDay('order__created_at'))
-            .values('day')
-            .annotate(total_sum=Sum(F('total') - F('returned_total_sum'), default=0))
-            .order_by('day')
-        )
-        factory_order_items_by_day = (
-            factory_order_items.annotate(day=TruncDay('order__created_at'))
-            .values('day')
-            .annotate(total_sum=Sum('price', default=0))
-            .order_by('day')
-        )
-        outlay_payments_by_day = (
-            outlay_payments.annotate(day=TruncDay('created_at'))
-            .values('day')
-            .annotate(
-                amount_sum=Sum(
-                    Case(
-                        When(payment_type=PaymentType.INCOME, then=F('amount')),
-                        default=0, output_field=models.DecimalField()
-                    ), default=0
+    def get_sales_series(self, field_name):
+        if self.is_hourly():
+            order_item_values = {'turnover': F('total') - F('returned_total_sum'), 'profit': F('total_profit')}
+            factory_order_item_values = {'turnover': F('price'), 'profit': F('total_profit')}
+            return (
+                self.get_series(self.get_order_items(), order_item_values[field_name], 'order__created_at')
+                + self.get_series(
+                    self.get_factory_order_items(), factory_order_item_values[field_name], 'order__created_at'
                 )
             )
-            .order_by('day')
-        )
-
-        all_days = self.get_all_days_list()
-        result_dict = {day: 0 for day in all_days}
-
-        for entry in order_items_by_day:
-            result_dict[entry['day']] += entry['total_sum']
-        for entry in factory_order_items_by_day:
-            result_dict[entry['day']] += entry['total_sum']
-        for entry in outlay_payments_by_day:
-            result_dict[entry['day']] += entry['amount_sum']
-
-        final_result_list = [
-            {'day': day.strftime(RESULT_DATE_FORMAT), 'total': total}
-            for day, total in result_dict.items()
-        ]
+        industry_sales = self.get_daily_facts(DailyIndustrySales).filter(industry=self.industry)
+        return self.get_fact_series(industry_sales, field_name)
 
-        max_total_turnover = max(result['total'] for result in final_result_list)
-        min_total_turnover = min(result['total'] for result in final_result_list)
-        return final_result_list, max_total_turnover, min_total_turnover
-
-    def get_total_profit_by_day(self, order_items, factory_order_items, outlay_payments):
-        order_items_by_day = (
-            order_items.annotate(day=TruncDay('order__created_at'))
-            .values('day')
-            .annotate(total_sum=Sum(F('total_profit'), default=0))
-            .order_by('day')
-        )
-        factory_order_items_by_day = (
-            factory_order_items.annotate(day=TruncDay('order__created_at'))
-            .values('day')
-            .annotate(total_sum=Sum('total_profit', default=0))
-            .order_by('day')
-        )
-        outlay_payments_by_day = (
-            outlay_payments.annotate(day=TruncDay('created_at'))
-            .values('day')
-            .annotate(
-                amount_sum=Sum(
-                    Case(
-                        When(payment_type=PaymentType.INCOME, then=-F('amount')),
-                        When(payment_type=PaymentType.OUTCOME, then=F('amount')),
-                        default=0, output_field=models.DecimalField()
-                    ), default=0
-                )
-            )
-            .order_by('day')
+    def get_outlay_series(self, payment_type):
+        if self.is_hourly():
+            return self.get_series(self.get_outlay_payments().filter(payment_type=payment_type), 'amount')
+        outlay_cash_flows = self.get_daily_facts(DailyCashFlow).filter(
+            Q(payment_model_type=PaymentModelType.OUTLAY) &
+            Q(industry__isnull=False),
+            Q(industry=self.industry)
         )
+        return self.get_fact_series(outlay_cash_flows, CASH_FLOW_FIELDS[payment_type])
 
-        all_days = self.get_all_days_list()
-        result_dict = {day: 0 for day in all_days}
+    def get_total_turnover_series(self):
+        return self.get_sales_series('turnover') + self.get_outlay_series(PaymentType.INCOME)
 
-        for entry in order_items_by_day:
-            result_dict[entry['day']] += entry['total_sum']
-        for entry in factory_order_items_by_day:
-            result_dict[entry['day']] += entry['total_sum']
-        for entry in outlay_payments_by_day:
-            result_dict[entry['day']] -= entry['amount_sum']
+    def get_total_profit_series(self):
+        return (
+            self.get_sales_series('profit')
+            - self.get_outlay_series(PaymentType.OUTCOME)
+            + self.get_outlay_series(PaymentType.INCOME)
+        )
 
-        final_result_list = [
-            {'day': day.strftime(RESULT_DATE_FORMAT), 'total': total}
-            for day, total in result_dict.items()
-        ]
-        max_total_profit = max(result['total'] for result in final_result_list)
-        min_total_profit = min(result['total'] for result in final_result_list)
-        return final_result_list, max_total_profit, min_total_profit
+    def get_totals_series(self):
+        return dict(turnover=self.get_total_turnover_series(), profit=self.get_total_profit_series())
 
-    def get_final_result_data(self):
-        order_items = self.get_order_items()
-        factory_order_items = self.get_factory_order_items()
-        outlay_payments = self.get_outlay_payments()
-        total_profit_by_day, max_total_profit, min_total_profit = self.get_total_profit_by_day(
-            order_items, factory_order_items, outlay_payments
-        )
-        total_turnover_by_day, max_total_turnover, min_total_turnover = self.get_total_turnover_by_day(
-            order_items, factory_order_items, outlay_payments
-        )
-        return dict(
-            labels=[day.strftime(RESULT_DATE_FORMAT) for day in self.get_all_days_list()],
-            datasets=[
-                dict(
-                    label='Оборот',
-                    data=[item['total'] for item in total_turnover_by_day],
-                    borderColor='rgb(255, 99, 132)',
-                    backgroundColor='rgba(255, 99, 132, 0.5)',
-                ),
-                dict(
-                    label='Прибыль',
-                    data=[item['total'] for item in total_profit_by_day],
-                    borderColor='rgb(53, 162, 235)',
-                    backgroundColor='rgba(53, 162, 235, 0.5)',
-                ),
+    def get_final_result_data(self, compare_to=None):
+        totals_series = self.get_totals_series()
+        result = self.get_series_chart_data(
+            [
+                ('Оборот', totals_series['turnover'], TURNOVER_COLOR),
+                ('Прибыль', totals_series['profit'], PROFIT_COLOR),
             ],
             industry_name=self.industry.name if self.industry else None,
-            min=min(min_total_profit, min_total_turnover),
-            max=max(max_total_profit, max_total_turnover),
         )
+        if compare_to:
+            result['comparison'] = self.get_series_comparison(compare_to, totals_series)
+        return result
 
 
 class CashierIncomeAnalyticsService(BaseAnalyticsService):
-    def get_income_payments(self):
+    def get_payments(self, payment_type):
         payments = Payment.objects.get_available().filter(
-            payment_type=PaymentType.INCOME,
+            payment_type=payment_type,
         )
         return self.filter_by_date_range(payments)
 
-    def get_outcome_payments(self):
-        payments = Payment.objects.get_available().filter(
-            payment_type=PaymentType.OUTCOME,
-        )
-        return self.filter_by_date_range(payments)
-
-    def get_cashier_total_income_by_day(self, income_payments):
-        income_payments_by_day = (
-            income_payments.annotate(day=TruncDay('created_at'))
-            .values('day')
-            .annotate(total_sum=Sum('amount', default=0))
-            .order_by('day')
-        )
-
-        all_days = self.get_all_days_list()
-        result_dict = {day: 0 for day in all_days}
-
-        for entry in income_payments_by_day:
-            result_dict[entry['day']] += entry['total_sum']
-
-        final_result_list = [
-            {'day': day.strftime(RESULT_DATE_FORMAT), 'total': total}
-            for day, total in result_dict.items()
-        ]
-
-        max_total_sum = max(result['total'] for result in final_result_list)
-        min_total_sum = min(result['total'] for result in final_result_list)
-        return final_result_list, max_total_sum, min_total_sum
-
-    def get_cashier_total_outcome_by_day(self, outcome_payments):
-        outcome_payments_by_day = (
-            outcome_payments.annotate(day=TruncDay('created_at'))
-            .values('day')
-            .annotate(total_sum=Sum('amount', default=0))
-            .order_by('day')
-        )
-
-        all_days = self.get_all_days_list()
-        result_dict = {day: 0 for day in all_days}
-
-        for entry in outcome_payments_by_day:
-            result_dict[entry['day']] += entry['total_sum']
-
-        final_result_list = [
-            {'day': day.strftime(RESULT_DATE_FORMAT), 'total': total}
-            for day, total in result_dict.items()
-        ]
-
-        max_total_sum = max(result['total'] for result in final_result_list)
-        min_total_sum = min(result['total'] for result in final_result_list)
-        return final_result_list, max_total_sum, min_total_sum
+    def get_cashier_total_series(self, payment_type):
+        if self.is_hourly():
+            return self.get_series(self.get_payments(payment_type), 'amount')
+        return self.get_fact_series(self.get_daily_facts(DailyCashFlow), CASH_FLOW_FIELDS[payment_type])
 
     def get_final_result_data(self):
-        income_payments = self.get_income_payments()
-        outcome_payments = self.get_outcome_payments()
-        total_income_by_day, max_total_income, min_total_income = self.get_cashier_total_income_by_day(
-            income_payments,
-        )
-        total_outcome_by_day, max_total_outcome, min_total_outcome = self.get_cashier_total_outcome_by_day(
-            outcome_payments
-        )
-        return dict(
-            labels=[day.strftime(RESULT_DATE_FORMAT) for day in self.get_all_days_list()],
-            datasets=[
-                dict(
-                    label='Приход',
-                    data=[item['total'] for item in total_income_by_day],
-                    borderColor='rgb(255, 99, 132)',
-                    backgroundColor='rgba(255, 99, 132, 0.5)',
-                ),
-                dict(
-                    label='Расход',
-                    data=[item['total'] for item in total_outcome_by_day],
-                    borderColor='rgb(53, 162, 235)',
-                    backgroundColor='rgba(53, 162, 235, 0.5)',
-                ),
-            ],
-            min=min(min_total_income, min_total_outcome),
-            max=max(max_total_income, max_total_outcome),
-        )
+        return self.get_series_chart_data([
+            ('Приход', self.get_cashier_total_series(PaymentType.INCOME), TURNOVER_COLOR),
+            ('Расход', self.get_cashier_total_series(PaymentType.OUTCOME), PROFIT_COLOR),
+        ])
 
 
 class IndustrySalesAnalyticsService(BaseAnalyticsService):
     def get_industries(self):
         return Industry.objects.get_available()
 
-    def get_order_items(self):
-        order_items = OrderItem.objects.all().with_total_profit().with_returned_total_sum().filter(
-            order__is_deleted=False,
-            order__status=OrderStatus.COMPLETED
-        )
-        return self.filter_by_date_range(order_items, 'order__created_at')
-
-    def get_factory_order_items(self):
-        factory_order_items = OrderItemProductFactory.objects.filter(
-            Q(is_returned=False) &
-            Q(order__is_deleted=False) &
-            Q(order__status=OrderStatus.COMPLETED)
-        ).with_total_profit()
-        return self.filter_by_date_range(factory_order_items, 'order__created_at')
+    def get_industry_sales(self):
+        return self.get_daily_facts(DailyIndustrySales)
 
-    def annotate_total_turnover_sum(self, industries, order_items, factory_order_items):
+    def annotate_total_turnover_sum(self, industries, industry_sales):
         industries = industries.annotate(
             total_turnover_sum=Coalesce(
                 models.Subquery(
-                    order_items.filter(product__category__industry_id=models.OuterRef('pk'))
-                    .values('product__category__industry_id')
-                    .annotate(total_sum=Sum(F('total') - F('returned_total_sum'), default=0))
-                    .values('total_sum')[:1]
-                ), models.Value(0), output_field=models.DecimalField()
-            ) + Coalesce(
-                models.Subquery(
-                    factory_order_items.filter(product_factory__category__industry_id=models.OuterRef('pk'))
-                    .values('product_factory__category__industry_id')
-                    .annotate(total_sum=Sum(F('price'), default=0))
+                    industry_sales.filter(industry_id=models.OuterRef('pk'))
+                    .values('industry_id')
+                    .annotate(total_sum=Sum('turnover', default=0))
                     .values('total_sum')[:1]
                 ), models.Value(0), output_field=models.DecimalField()
             )
@@ -484,32 +944,16 @@ class IndustrySalesAnalyticsService(BaseAnalyticsService):
 
         return industries
 
-    def get_total_turnover_sum_all(self, industries):
-        return industries.aggregate(total_sum_all=Sum('total_turnover_sum', default=0))['total_sum_all']
-
-    def annotate_share_percentage(self, industries, total_turnover_sum_all):
-        return industries.annotate(
-            share_percentage=Round(
-                ExpressionWrapper(
-                    (F('total_turnover_sum') / total_turnover_sum_all) * 100,
-                    output_field=models.FloatField()
-                ),
-                1
-            )
-        )
+    def annotate_share_percentage(self, industries):
+        return self.annotate_share_of_total(industries, 'total_turnover_sum', 'share_percentage')
 
-    def annotate_with_colors(self, industries):
-        return industries.annotate(
-            background=models.Value(get_random_background_color()),
-            border=models.Value(get_random_border_color())
-        )
+    @cached_property
+    def annotated_industries(self):
+        industries = self.annotate_total_turnover_sum(self.get_industries(), self.get_industry_sales())
+        return list(self.annotate_share_percentage(industries))
 
     def get_final_result_data(self):
-        order_items = self.get_order_items()
-        factory_order_items = self.get_factory_order_items()
-        industries = self.annotate_total_turnover_sum(self.get_industries(), order_items, factory_order_items)
-        industries = self.annotate_share_percentage(industries, self.get_total_turnover_sum_all(industries))
-        industries = self.annotate_with_colors(industries)
+        industries = self.annotated_industries
 
         result_data_list = []
         for i in range(0, len(industries)):
@@ -518,7 +962,7 @@ class IndustrySalesAnalyticsService(BaseAnalyticsService):
                     'name': industries[i].name,
                     'total_turnover_sum': industries[i].total_turnover_sum,
                     'share_percentage': industries[i].share_percentage,
-                    'color': COLORS[i],
+                    'color': get_entity_color(industries[i].pk),
                 }
             )
 
@@ -536,12 +980,9 @@ class IndustrySalesAnalyticsService(BaseAnalyticsService):
         )
 
     def get_table_data(self):
-        order_items = self.get_order_items()
-        factory_order_items = self.get_factory_order_items()
-        industries = self.annotate_total_turnover_sum(self.get_industries(), order_items, factory_order_items)
-        industries = self.annotate_share_percentage(industries, self.get_total_turnover_sum_all(industries))
-        industries = self.annotate_with_colors(industries)
-        industries = industries.order_by('-share_percentage')
+        industries = sorted(
+            self.annotated_industries, key=lambda industry: industry.share_percentage or 0, reverse=True
+        )
 
         result_data_list = []
         for i in range(0, len(industries)):
@@ -550,7 +991,7 @@ class IndustrySalesAnalyticsService(BaseAnalyticsService):
                     'name': industries[i].name,
                     'total_turnover_sum': industries[i].total_turnover_sum,
                     'share_percentage': industries[i].share_percentage,
-                    'color': COLORS[i],
+                    'color': get_entity_color(industries[i].pk),
                 }
             )
         return result_data_list
@@ -558,13 +999,8 @@ class IndustrySalesAnalyticsService(BaseAnalyticsService):
 
 class OverallTurnoverShareAnalyticsService(BaseAnalyticsService):
 
-    def get_orders(self):
-        orders = (
-            Order.objects.get_available()
-            .filter(status=OrderStatus.COMPLETED)
-            .with_total_with_discount().with_total_self_price().with_total_profit()
-        )
-        return self.filter_by_date_range(orders)
+    def get_sales(self):
+        return self.get_daily_facts(DailySales)
 
     def get_worker_incomes(self):
         worker_incomes = WorkerIncomes.objects.filter(
@@ -579,38 +1015,36 @@ class OverallTurnoverShareAnalyticsService(BaseAnalyticsService):
         return self.filter_by_date_range(worker_incomes)
 
     def get_outlay_payments(self):
-        payments = Payment.objects.get_available().filter(
+        return self.get_daily_facts(DailyCashFlow).filter(
             Q(payment_model_type=PaymentModelType.OUTLAY) &
-            ~Q(outlay__outlay_type=OutlayType.WORKERS)
+            ~Q(outlay_type=OutlayType.WORKERS)
         )
-        return self.filter_by_date_range(payments)
 
     def get_worker_payments(self):
-        payments = Payment.objects.get_available().filter(
+        return self.get_daily_facts(DailyCashFlow).filter(
             payment_model_type=PaymentModelType.OUTLAY,
-            outlay__outlay_type=OutlayType.WORKERS
+            outlay_type=OutlayType.WORKERS
         )
-        return self.filter_by_date_range(payments)
 
-    def calculate_total_turnover(self, orders, outlay_payments, worker_payments):
-        orders_total = orders.aggregate(total_turnover=models.Sum('total_with_discount', default=0))['total_turnover']
+    def calculate_total_turnover(self, sales, outlay_payments, worker_payments):
+        orders_total = sales.aggregate(total_turnover=models.Sum('turnover', default=0))['total_turnover']
         outlay_payments_total = self.calculate_income_outlay_payments_sum(outlay_payments)
         worker_payments_total = self.calculate_income_outlay_payments_sum(worker_payments)
         return orders_total + outlay_payments_total + worker_payments_total
 
-    def calculate_total_self_price_sum(self, orders):
-        total_self_price_sum = orders.aggregate(
-            total_self_price_sum=models.Sum('total_self_price', default=0)
+    def calculate_total_self_price_sum(self, sales):
+        total_self_price_sum = sales.aggregate(
+            total_self_price_sum=models.Sum('self_price', default=0)
         )['total_self_price_sum']
         return total_self_price_sum
 
-    def calculate_total_profit_sum(self, orders, outlay_payments, worker_payments):
+    def calculate_total_profit_sum(self, sales, outlay_payments, worker_payments):
         outlay_payments_total_outcome = self.calculate_outcome_outlay_payments_sum(outlay_payments)
         outlay_payments_total_income = self.calculate_income_outlay_payments_sum(outlay_payments)
         worker_payments_total_outcome = self.calculate_outcome_outlay_payments_sum(worker_payments)
         worker_payments_total_income = self.calculate_income_outlay_payments_sum(worker_payments)
-        orders_profit_sum = orders.aggregate(
-            total_profit_sum=Sum('total_profit', default=0)
+        orders_profit_sum = sales.aggregate(
+            total_profit_sum=Sum('profit', default=0)
         )['total_profit_sum']
         total_profit = orders_profit_sum \
                        - outlay_payments_total_outcome \
@@ -631,23 +1065,17 @@ class OverallTurnoverShareAnalyticsService(BaseAnalyticsService):
 
     def calculate_total_worker_payments_diff(self, worker_payments):
         return worker_payments.aggregate(
-            amount_diff=Sum(
-                Case(
-                    When(payment_type=PaymentType.INCOME, then=F('amount')),
-                    When(payment_type=PaymentType.OUTCOME, then=-F('amount')),
-                    default=0, output_field=models.DecimalField()
-                ), default=0
-            )
+            amount_diff=Sum(F('income') - F('outcome'), default=0)
         )['amount_diff']
 
     def calculate_income_outlay_payments_sum(self, outlay_payments):
-        total_outlay_payments_income = outlay_payments.filter(payment_type=PaymentType.INCOME).aggregate(
-            total_sum=Sum('amount', default=0))['total_sum']
+        total_outlay_payments_income = outlay_payments.aggregate(
+            total_sum=Sum('income', default=0))['total_sum']
         return total_outlay_payments_income
 
     def calculate_outcome_outlay_payments_sum(self, outlay_payments):
-        total_outlay_payments_outcome = outlay_payments.filter(payment_type=PaymentType.OUTCOME).aggregate(
-            total_sum=Sum('amount', default=0))['total_sum']
+        total_outlay_payments_outcome = outlay_payments.aggregate(
+            total_sum=Sum('outcome', default=0))['total_sum']
         return total_outlay_payments_outcome
 
     def calculate_share_percentage(self, total_turnover, total_sum):
@@ -655,12 +1083,11 @@ class OverallTurnoverShareAnalyticsService(BaseAnalyticsService):
         return share_percentage
 
     def get_final_result_data(self):
-        orders = self.get_orders()
-        worker_incomes = self.get_worker_incomes()
+        sales = self.get_sales()
         outlay_payments = self.get_outlay_payments()
         worker_payments = self.get_worker_payments()
-        total_turnover = self.calculate_total_turnover(orders, outlay_payments, worker_payments)
-        total_self_price_sum = self.calculate_total_self_price_sum(orders)
+        total_turnover = self.calculate_total_turnover(sales, outlay_payments, worker_payments)
+        total_self_price_sum = self.calculate_total_self_price_sum(sales)
         total_self_price_percentage = self.calculate_share_percentage(total_turnover, total_self_price_sum)
         # total_worker_incomes_sum = self.calculate_total_worker_incomes_sum(
         #     orders, worker_incomes,
@@ -668,7 +1095,7 @@ class OverallTurnoverShareAnalyticsService(BaseAnalyticsService):
         # total_worker_incomes_percentage = self.calculate_share_percentage(total_turnover, total_worker_incomes_sum)
 
         total_profit_sum = self.calculate_total_profit_sum(
-            orders,
+            sales,
             outlay_payments,
             worker_payments,
         )
@@ -719,8 +1146,12 @@ class OverallTurnoverShareAnalyticsService(BaseAnalyticsService):
         )
         return result_data_list
 
+    @cached_property
+    def result_data(self):
+        return self.get_final_result_data()
+
     def get_chart_data(self):
-        result_data_list = self.get_final_result_data()
+        result_data_list = self.result_data
 
         return dict(
             labels=[item['label'] for item in result_data_list],
@@ -736,7 +1167,7 @@ class OverallTurnoverShareAnalyticsService(BaseAnalyticsService):
         )
 
     def get_table_data(self):
-        return self.get_final_result_data()
+        return self.result_data
 
 
 class ProductAnalyticsService(BaseAnalyticsService):
@@ -768,17 +1199,7 @@ class ProductAnalyticsService(BaseAnalyticsService):
 
     def annotate_turnover_percentage(self, products):
         products = self.annotate_turnover_sum(products)
-        total_turnover_sum = products.aggregate(
-            total_turnover_sum=Sum('total_turnover', default=0))['total_turnover_sum']
-        products = products.annotate(
-            turnover_percentage=Round(
-                ExpressionWrapper(
-                    (F('total_turnover') / total_turnover_sum) * 100,
-                    output_field=models.FloatField()
-                ), 1
-            )
-        )
-        return products
+        return self.annotate_share_of_total(products, 'total_turnover', 'turnover_percentage')
 
     def annotate_total_profit_sum(self, products):
         products = products.annotate(
@@ -800,17 +1221,7 @@ class ProductAnalyticsService(BaseAnalyticsService):
 
     def annotate_total_profit_percentage(self, products):
         products = self.annotate_total_profit_sum(products)
-        total_profit_sum = products.aggregate(
-            total_profit_sum=Sum('total_profit', default=0))['total_profit_sum']
-        products = products.annotate(
-            profit_percentage=Round(
-                ExpressionWrapper(
-                    (F('total_profit') / total_profit_sum) * 100,
-                    output_field=models.FloatField()
-                ), 1
-            )
-        )
-        return products
+        return self.annotate_share_of_total(products, 'total_profit', 'profit_percentage')
 
     def annotate_total_sale_count(self, products):
         products = products.annotate(
@@ -909,7 +1320,11 @@ class ProductAnalyticsService(BaseAnalyticsService):
     def get_final_result_data(self):
         products = self.get_products()
         annotate_method, field_name = self.get_indicator_method_and_field()
-        products = annotate_method(products).order_by(f"-{field_name}")[:10]
+        products = annotate_method(products)
+        if isinstance(products, models.QuerySet):
+            # Share indicators are raw rows already ordered by the share.
+            products = products.order_by(f"-{field_name}", 'pk')
+        products = products[:10]
 
         return {
             'labels': [product.name for product in products],
@@ -1022,8 +1437,12 @@ class ProductFactorySalesAnalyticsService(BaseAnalyticsService):
         categories = categories.filter(total_turnover__gt=0)
         return categories
 
+    @cached_property
+    def annotated_categories(self):
+        return list(self.get_annotated_categories())
+
     def get_final_result_data(self):
-        categories = self.get_annotated_categories()
+        categories = self.annotated_categories
 
         return {
             'labels': [category.name for category in categories],
@@ -1050,7 +1469,7 @@ class ProductFactorySalesAnalyticsService(BaseAnalyticsService):
         }
 
     def get_table_data(self):
-        categories = self.get_annotated_categories()
+        categories = self.annotated_categories
         return [
             {
                 'name': category.name,
@@ -1087,99 +1506,21 @@ class FloristsAnalyticsService(BaseAnalyticsService):
             type__in=[UserType.FLORIST, UserType.FLORIST_PERCENT, UserType.FLORIST_ASSISTANT, UserType.CRAFTER]
         )
 
+    def get_florist_kpi_value(self, expression):
+        return get_worker_kpi_value(self.get_daily_facts(DailyWorkerKPI), WorkerKPIRole.FLORIST, expression)
+
     def annotate_finished_products_count(self, florists):
-        return florists.annotate(
-            finished_products_count=Coalesce(
-                models.Subquery(
-                    self.filter_by_date_range(ProductFactory.objects.get_available(), 'finished_at')
-                    .filter(
-                        ~Q(status__in=[ProductFactoryStatus.CREATED, ProductFactoryStatus.PENDING]) &
-                        Q(florist_id=models.OuterRef('pk'))
-                    )
-                    .values('florist_id')
-                    .annotate(count_sum=Count('id'))
-                    .values('count_sum')[:1]
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        )
+        return florists.annotate(finished_products_count=self.get_florist_kpi_value('bouquets_finished'))
 
     def annotate_sold_products_count(self, florists):
-        return florists.annotate(
-            sold_products_count=Coalesce(
-                models.Subquery(
-                    self.filter_by_date_range(OrderItemProductFactory.objects.all(), 'order__created_at')
-                    .filter(
-                        Q(order__status=OrderStatus.COMPLETED) &
-                        Q(order__is_deleted=False) &
-                        Q(is_returned=False) &
-                        Q(product_factory__florist_id=models.OuterRef('pk'))
-                    )
-                    .values('product_factory__florist_id')
-                    .annotate(count_sum=Count('id'))
-                    .values('count_sum')[:1]
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        )
+        return florists.annotate(sold_products_count=self.get_florist_kpi_value('bouquets_sold'))
 
     def annotate_sales_amount(self, florists):
-        return florists.annotate(
-            sales_amount=Coalesce(
-                models.Subquery(
-                    self.filter_by_date_range(OrderItemProductFactory.objects.all(), 'order__created_at')
-                    .filter(
-                        Q(order__status=OrderStatus.COMPLETED) &
-                        Q(order__is_deleted=False) &
-                        Q(is_returned=False) &
-                        Q(product_factory__florist_id=models.OuterRef('pk'))
-                    )
-                    .values('product_factory__florist_id')
-                    .annotate(price_sum=Sum('price', default=0))
-                    .values('price_sum')[:1]
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        )
+        return florists.annotate(sales_amount=self.get_florist_kpi_value('sales_sum'))
 
     def annotate_sales_profit_amount(self, florists):
         # TODO: subtract worker incomes
-        return florists.annotate(
-            sales_profit_amount=Coalesce(
-                Coalesce(
-                    models.Subquery(
-                        self.filter_by_date_range(OrderItemProductFactory.objects.all(), 'order__created_at')
-                        .filter(
-                            Q(order__status=OrderStatus.COMPLETED) &
-                            Q(order__is_deleted=False) &
-                            Q(is_returned=False) &
-                            Q(product_factory__florist_id=models.OuterRef('pk'))
-                        ).with_total_profit()
-                        .values('product_factory__florist_id')
-                        .annotate(price_sum=Sum('total_profit', default=0))
-                        .values('price_sum')[:1]
-                    ), models.Value(0), output_field=models.DecimalField()
-                ) - Coalesce(
-                    models.Subquery(
-                        self.filter_by_date_range(WorkerIncomes.objects.all(), 'created_at')
-                        .filter(
-                            worker_id=models.OuterRef('pk'),
-                            reason__in=[
-                                WorkerIncomeReason.PRODUCT_FACTORY_SALE,
-                                WorkerIncomeReason.PRODUCT_FACTORY_CREATE
-                            ]
-                        )
-                        .values('worker_id')
-                        .annotate(
-                            total_sum=Sum(
-                                Case(
-                                    When(income_type=WorkerIncomeType.INCOME, then=F('total')),
-                                    When(income_type=WorkerIncomeType.OUTCOME, then=-F('total')),
-                                ), default=0
-                            )
-                        )
-                        .values('total_sum')[:1]
-                    ), models.Value(0), output_field=models.DecimalField()
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        )
+        return florists.annotate(sales_profit_amount=self.get_florist_kpi_value(F('profit') - F('incomes')))
 
     def get_indicator_method_and_field(self):
         indicator_map = {
@@ -1195,12 +1536,12 @@ class FloristsAnalyticsService(BaseAnalyticsService):
 
         return indicator_map[self.indicator]
 
-    def get_final_result_data(self):
+    def get_final_result_data(self, compare_to=None):
         florists = self.get_florists()
         annotate_method, field_name = self.get_indicator_method_and_field()
-        florists = annotate_method(florists).order_by(f"-{field_name}")[:10]
+        florists = list(annotate_method(florists).order_by(f"-{field_name}", 'pk')[:10])
 
-        return {
+        result = {
             'labels': [florist.get_full_name() for florist in florists],
             'datasets': [
                 {
@@ -1212,6 +1553,9 @@ class FloristsAnalyticsService(BaseAnalyticsService):
                 }
             ],
         }
+        if compare_to:
+            result['comparison'] = self.get_ranking_comparison(compare_to, florists, self.get_florists())
+        return result
 
 
 class SalesmenAnalyticsService(BaseAnalyticsService):
@@ -1222,83 +1566,21 @@ class SalesmenAnalyticsService(BaseAnalyticsService):
     def get_salesmen(self):
         return User.objects.all().get_workers().filter(orders__isnull=False).distinct()
 
+    def get_salesman_kpi_value(self, expression):
+        return get_worker_kpi_value(self.get_daily_facts(DailyWorkerKPI), WorkerKPIRole.SALESMAN, expression)
+
     def annotate_sales_count(self, salesmen):
-        return salesmen.annotate(
-            sales_count=Coalesce(
-                models.Subquery(
-                    self.filter_by_date_range(Order.objects.get_available(), 'created_at')
-                    .filter(status=OrderStatus.COMPLETED, salesman_id=models.OuterRef('pk'))
-                    .values('salesman_id')
-                    .annotate(total_count=Count('id'))
-                    .values('total_count')[:1]
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        )
+        return salesmen.annotate(sales_count=self.get_salesman_kpi_value('orders_count'))
 
     def annotate_product_sales_count(self, salesmen):
-        return salesmen.annotate(
-            product_sales_count=Coalesce(
-                Coalesce(
-                    models.Subquery(
-                        self.filter_by_date_range(OrderItem.objects.all(), 'order__created_at')
-                        .filter(
-                            order__salesman_id=models.OuterRef('pk'),
-                            order__status=OrderStatus.COMPLETED,
-                            order__is_deleted=False
-                        ).with_returned_count()
-                        .values('order__salesman_id')
-                        .annotate(count_sum=Sum(F('count') - F('returned_count'), default=0))
-                        .values('count_sum')[:1]
-                    ), models.Value(0), output_field=models.DecimalField()
-                ) + Coalesce(
-                    models.Subquery(
-                        self.filter_by_date_range(OrderItemProductFactory.objects.all(), 'order__created_at')
-                        .filter(
-                            order__salesman_id=models.OuterRef('pk'),
-                            order__status=OrderStatus.COMPLETED,
-                            order__is_deleted=False,
-                            is_returned=False
-                        )
-                        .values('order__salesman_id')
-                        .annotate(count_sum=Count('id'))
-                        .values('count_sum')[:1]
-                    ), models.Value(0), output_field=models.DecimalField()
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        )
+        return salesmen.annotate(product_sales_count=self.get_salesman_kpi_value('products_sold'))
 
     def annotate_total_sales_sum(self, salesmen):
-        return salesmen.annotate(
-            sales_amount=Coalesce(
-                models.Subquery(
-                    self.filter_by_date_range(Order.objects.get_available(), 'created_at')
-                    .filter(
-                        status=OrderStatus.COMPLETED,
-                        salesman_id=models.OuterRef('pk')
-                    ).with_total_with_discount()
-                    .values('salesman_id')
-                    .annotate(total_sum=Sum('total_with_discount', default=0))
-                    .values('total_sum')[:1]
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        )
+        return salesmen.annotate(sales_amount=self.get_salesman_kpi_value('sales_sum'))
 
     def annotate_total_profit_sum(self, salesmen):
         # TODO: subtract worker incomes
-        return salesmen.annotate(
-            sales_profit_amount=Coalesce(
-                models.Subquery(
-                    self.filter_by_date_range(Order.objects.get_available(), 'created_at')
-                    .filter(
-                        status=OrderStatus.COMPLETED,
-                        salesman_id=models.OuterRef('pk')
-                    ).with_total_profit()
-                    .values('salesman_id')
-                    .annotate(total_sum=Sum('total_profit', default=0))
-                    .values('total_sum')[:1]
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        )
+        return salesmen.annotate(sales_profit_amount=self.get_salesman_kpi_value('profit'))
 
     def get_indicator_method_and_field(self):
         indicator_map = {
@@ -1314,12 +1596,12 @@ class SalesmenAnalyticsService(BaseAnalyticsService):
 
         return indicator_map[self.indicator]
 
-    def get_final_result_data(self):
+    def get_final_result_data(self, compare_to=None):
         salesmen = self.get_salesmen()
         annotate_method, field_name = self.get_indicator_method_and_field()
-        salesmen = annotate_method(salesmen).order_by(f"-{field_name}")[:10]
+        salesmen = list(annotate_method(salesmen).order_by(f"-{field_name}", 'pk')[:10])
 
-        return {
+        result = {
             'labels': [salesman.get_full_name() for salesman in salesmen],
             'datasets': [
                 {
@@ -1330,6 +1612,9 @@ class SalesmenAnalyticsService(BaseAnalyticsService):
                 }
             ],
         }
+        if compare_to:
+            result['comparison'] = self.get_ranking_comparison(compare_to, salesmen, self.get_salesmen())
+        return result
 
 
 class OutlaysAnalyticService(BaseAnalyticsService):
@@ -1337,100 +1622,61 @@ class OutlaysAnalyticService(BaseAnalyticsService):
         super().__init__(start_date, end_date)
         self.indicator = indicator
 
-    def get_outlays(self):
-        from src.payment.models import Payment
+    def get_amount_fields(self):
+        if self.indicator == OutlaysAnalyticsIndicator.OUTCOME:
+            return 'outcome', 'outcome_percentage'
+        return 'income', 'income_percentage'
 
-        return Outlay.objects.get_available().annotate(
-            has_payments=Exists(Payment.objects.filter(outlay=OuterRef('pk')))
-        ).filter(has_payments=True)
+    @cached_property
+    def outlay_totals(self):
+        return get_outlay_totals(self.start_date, self.end_date)
 
-    def get_total_payments_amount(self, outlays):
-        total_payments_amount = outlays.aggregate(
-            total_payments_amount=Sum('payments_amount', default=0)
-        )['total_payments_amount']
-        return total_payments_amount
+    def get_rows(self, rows):
+        amount_field, percentage_field = self.get_amount_fields()
+        return [
+            {**row, 'payments_amount': row[amount_field], 'payments_percentage': row[percentage_field]}
+            for row in rows if row[amount_field]
+        ]
 
-    def annotate_income_payments_amount(self, outlays):
-        return outlays.annotate(
-            payments_amount=Coalesce(
-                models.Subquery(
-                    self.filter_by_date_range(Payment.objects.get_available())
-                    .filter(
-                        outlay_id=models.OuterRef('pk'),
-                        payment_type=PaymentType.INCOME
-                    )
-                    .values('outlay_id')
-                    .annotate(amount_sum=Sum('amount', default=0))
-                    .values('amount_sum')[:1]
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        ).exclude(payments_amount=0)
-
-    def annotate_outcome_payments_amount(self, outlays):
-        return outlays.annotate(
-            payments_amount=Coalesce(
-                models.Subquery(
-                    self.filter_by_date_range(Payment.objects.get_available())
-                    .filter(
-                        outlay_id=models.OuterRef('pk'),
-                        payment_type=PaymentType.OUTCOME
-                    )
-                    .values('outlay_id')
-                    .annotate(amount_sum=Sum('amount', default=0))
-                    .values('amount_sum')[:1]
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        ).exclude(payments_amount=0)
-
-    def annotate_payments_percentage(self, outlays):
-        total_payments_amount = self.get_total_payments_amount(outlays)
-        outlays = outlays.annotate(
-            payments_percentage=Round(
-                ExpressionWrapper(
-                    (F('payments_amount') / total_payments_amount) * 100,
-                    output_field=models.FloatField()
-                ), 1
-            )
-        )
-        return outlays
-
-    def get_annotated_outlays(self):
-        outlays = self.get_outlays()
-        if self.indicator == OutlaysAnalyticsIndicator.OUTCOME:
-            outlays = self.annotate_outcome_payments_amount(outlays)
-        else:
-            outlays = self.annotate_income_payments_amount(outlays)
-        outlays = self.annotate_payments_percentage(outlays)
-        return outlays
+    @cached_property
+    def annotated_outlays(self):
+        return self.get_rows(self.outlay_totals['outlays'])
 
     def get_chart_data(self):
-        outlays = self.get_annotated_outlays()
+        outlays = self.annotated_outlays
 
         return {
-            'labels': [outlay.title for outlay in outlays],
+            'labels': [outlay['title'] for outlay in outlays],
             'datasets': [
                 {
                     'label': "Доля от расходов",
-                    'data': [outlay.payments_percentage for outlay in outlays],
-                    'borderColor': [COLORS[i] for i in range(0, len(outlays))],
-                    'backgroundColor': [COLORS[i] for i in range(0, len(outlays))],
+                    'data': [outlay['payments_percentage'] for outlay in outlays],
+                    'borderColor': [get_entity_color(outlay['id']) for outlay in outlays],
+                    'backgroundColor': [get_entity_color(outlay['id']) for outlay in outlays],
                 }
             ],
         }
 
     def get_table_data(self):
-        outlays = self.get_annotated_outlays()
-        total_payments_amount = self.get_total_payments_amount(outlays)
+        amount_field, _ = self.get_amount_fields()
 
         return {
-            'total_payments_amount': total_payments_amount,
+            'total_payments_amount': self.outlay_totals[amount_field],
             'outlays': [
                 {
-                    'title': outlay.title,
-                    'payments_amount': outlay.payments_amount,
-                    'payments_percentage': outlay.payments_percentage,
-                } for outlay in outlays
-            ]
+                    'title': outlay['title'],
+                    'industry': outlay['industry_name'],
+                    'payments_amount': outlay['payments_amount'],
+                    'payments_percentage': outlay['payments_percentage'],
+                } for outlay in self.annotated_outlays
+            ],
+            'industries': [
+                {
+                    'title': industry['industry_name'],
+                    'payments_amount': industry['payments_amount'],
+                    'payments_percentage': industry['payments_percentage'],
+                } for industry in self.get_rows(self.outlay_totals['industries'])
+            ],
         }
 
 
@@ -1438,10 +1684,6 @@ class WriteOffsAnalyticsService(BaseAnalyticsService):
     def get_products(self):
         return Product.objects.get_available()
 
-    def get_total_self_price_sum(self, products):
-        return products.aggregate(
-            total_self_price_sum=Sum('write_off_self_price_sum', default=0))['total_self_price_sum']
-
     def annotate_write_off_count(self, products):
         return products.annotate(
             write_off_count=Coalesce(
@@ -1497,26 +1739,21 @@ class WriteOffsAnalyticsService(BaseAnalyticsService):
         )
 
     def annotate_write_off_percentage(self, products):
-        total_write_off_self_price = self.get_total_self_price_sum(products)
-        return products.annotate(
-            self_price_sum_percentage=Round(
-                ExpressionWrapper(
-                    (F('write_off_self_price_sum') / total_write_off_self_price) * 100,
-                    output_field=models.FloatField()
-                ), 1
-            )
-        )
+        return self.annotate_share_of_total(products, 'write_off_self_price_sum', 'self_price_sum_percentage')
 
     def get_annotated_products(self):
         products = self.get_products()
         products = self.annotate_write_off_count(products)
         products = self.annotate_write_off_self_price_sum(products)
-        products = self.annotate_write_off_percentage(products)
         products = products.exclude(write_off_count=0)
-        return products
+        return self.annotate_write_off_percentage(products)
+
+    @cached_property
+    def annotated_products(self):
+        return list(self.get_annotated_products())
 
     def get_chart_data(self):
-        products = self.get_annotated_products().order_by('-write_off_self_price_sum')[:10]
+        products = self.annotated_products[:10]
 
         return {
             'labels': [product.name for product in products],
@@ -1524,16 +1761,16 @@ class WriteOffsAnalyticsService(BaseAnalyticsService):
                 {
                     'label': [product.name for product in products],
                     'data': [product.self_price_sum_percentage for product in products],
-                    'borderColor': [COLORS[i] for i in range(0, len(products))],
-                    'backgroundColor': [COLORS[i] for i in range(0, len(products))],
+                    'borderColor': [get_entity_color(product.pk) for product in products],
+                    'backgroundColor': [get_entity_color(product.pk) for product in products],
                 }
             ],
         }
 
     def get_tables_data(self):
-        products = self.get_annotated_products()
-        products_by_count = products.order_by('-write_off_count')[:10]
-        products_by_sum = products.order_by('-write_off_self_price_sum')[:10]
+        products = self.annotated_products
+        products_by_count = sorted(products, key=lambda product: product.write_off_count, reverse=True)[:10]
+        products_by_sum = products[:10]
         return {
             "main_table": [
                 {
@@ -1695,43 +1932,56 @@ class ClientsTopAnalyticsService(BaseAnalyticsService):
             return Client.objects.get_available().filter(id__in=self.client_id)
         return Client.objects.get_available()
 
-    def annotate_total_debt(self, clients):
-        return clients.annotate(aggregated_value=Coalesce(
+    def get_metric_periods(self):
+        """Whole months of the range are read from ClientMonthlyMetric, the partial edges from the orders."""
+        start_day, end_day = self.get_days_range()
+        period = start_day if start_day.day == 1 else get_next_period(start_day)
+        periods = []
+        while get_next_period(period) - timedelta(days=1) <= end_day:
+            periods.append(period)
+            period = get_next_period(period)
+        if not periods:
+            return periods, [(start_day, end_day)]
+        edges = []
+        if start_day < periods[0]:
+            edges.append((start_day, periods[0] - timedelta(days=1)))
+        if get_next_period(periods[-1]) <= end_day:
+            edges.append((get_next_period(periods[-1]), end_day))
+        return periods, edges
+
+    def annotate_metric(self, clients, metric):
+        periods, edges = self.get_metric_periods()
+        ensure_client_monthly_metrics(periods)
+        value = Coalesce(
             models.Subquery(
-                self.filter_by_date_range(Order.objects.get_available())
-                .filter(models.Q(client_id=models.OuterRef('pk')) & ~models.Q(status=OrderStatus.CANCELLED))
+                ClientMonthlyMetric.objects.filter(client_id=models.OuterRef('pk'), metric=metric, period__in=periods)
                 .values('client_id')
-                .annotate(debt=models.Sum('debt', default=0))
-                .values('debt')[:1]
-            ), models.Value(0), output_field=models.DecimalField())
-        )
-
-    def annotate_orders_count(self, clients):
-        return clients.annotate(
-            aggregated_value=Coalesce(
+                .annotate(total_sum=Sum('value', default=0))
+                .values('total_sum')[:1]
+            ), models.Value(0), output_field=models.DecimalField()
+        )
+        if edges:
+            edges_filter = Q()
+            for edge_start, edge_end in edges:
+                edges_filter |= Q(created_at__date__range=[edge_start, edge_end])
+            value = value + Coalesce(
                 models.Subquery(
-                    self.filter_by_date_range(Order.objects.get_available())
-                    .filter(models.Q(client_id=models.OuterRef('pk')) & ~models.Q(status=OrderStatus.CANCELLED))
+                    get_client_metric_orders().filter(edges_filter, client_id=models.OuterRef('pk'))
                     .values('client_id')
-                    .annotate(total_count=models.Count('id'))
-                    .values('total_count')[:1]
+                    .annotate(total_sum=CLIENT_METRIC_AGGREGATES[metric])
+                    .values('total_sum')[:1]
                 ), models.Value(0), output_field=models.DecimalField()
             )
-        )
+        return clients.annotate(aggregated_value=value)
+
+    def annotate_total_debt(self, clients):
+        return self.annotate_metric(clients, ClientsAnalyticsIndicator.DEBT)
+
+    def annotate_orders_count(self, clients):
+        return self.annotate_metric(clients, ClientsAnalyticsIndicator.ORDERS_COUNT)
 
     def annotate_orders_sum(self, clients):
-        return clients.annotate(
-            aggregated_value=Coalesce(
-                models.Subquery(
-                    self.filter_by_date_range(Order.objects.get_available())
-                    .with_total_with_discount()
-                    .filter(models.Q(client_id=models.OuterRef('pk')) & ~models.Q(status=OrderStatus.CANCELLED))
-                    .values('client_id')
-                    .annotate(total_sum=models.Sum('total_with_discount', default=0))
-                    .values('total_sum')[:1]
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        )
+        return self.annotate_metric(clients, ClientsAnalyticsIndicator.TOTAL_ORDERS_SUM)
 
     def annotate_orders_discount_sum(self, clients):
         return clients.annotate(
@@ -1751,7 +2001,7 @@ class ClientsTopAnalyticsService(BaseAnalyticsService):
         clients = self.get_clients()
         clients = self.order_field_method_map[self.order_field](clients)
         if self.order_field:
-            clients = clients.order_by(f"-aggregated_value")
+            clients = clients.order_by(f"-aggregated_value", 'pk')
         return clients
 
     def get_final_result_data(self):
@@ -1769,3 +2019,104 @@ class ClientsTopAnalyticsService(BaseAnalyticsService):
                 }
             ],
         }
+
+
+class AnalyticsDashboardService(BaseAnalyticsService):
+    """Evaluates several analytics widgets for one date range in one call.
+
+    Widgets of the same service and option share one service instance, so a chart and its table
+    evaluate the annotated queryset once. The groups run concurrently on a thread pool.
+    """
+    widgets_map = {
+        'profit': (ProfitAnalyticsService, 'get_final_result_data'),
+        'cashier': (CashierIncomeAnalyticsService, 'get_final_result_data'),
+        'industry_share_chart': (IndustrySalesAnalyticsService, 'get_final_result_data'),
+        'industry_share_table': (IndustrySalesAnalyticsService, 'get_table_data'),
+        'turnover_share_chart': (OverallTurnoverShareAnalyticsService, 'get_chart_data'),
+        'turnover_share_table': (OverallTurnoverShareAnalyticsService, 'get_table_data'),
+        'products': (ProductAnalyticsService, 'get_final_result_data'),
+        'product_factory_sales_chart': (ProductFactorySalesAnalyticsService, 'get_final_result_data'),
+        'product_factory_sales_table': (ProductFactorySalesAnalyticsService, 'get_table_data'),
+        'florists': (FloristsAnalyticsService, 'get_final_result_data'),
+        'salesmen': (SalesmenAnalyticsService, 'get_final_result_data'),
+        'outlays_chart': (OutlaysAnalyticService, 'get_chart_data'),
+        'outlays_table': (OutlaysAnalyticService, 'get_table_data'),
+        'write_offs_chart': (WriteOffsAnalyticsService, 'get_chart_data'),
+        'write_offs_tables': (WriteOffsAnalyticsService, 'get_tables_data'),
+    }
+    indicator_defaults = {
+        ProductAnalyticsService: ProductAnalyticsIndicator.TURNOVER_SUM,
+        FloristsAnalyticsService: FloristsAnalyticsIndicator.FINISHED_PRODUCTS,
+        SalesmenAnalyticsService: SalesmenAnalyticsIndicator.SALES_COUNT,
+        OutlaysAnalyticService: OutlaysAnalyticsIndicator.OUTCOME,
+    }
+
+    def __init__(self, widgets, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.widgets = widgets
+        # widget -> duration in ms, kept out of the payload so identical data gets the same ETag
+        self.durations = {}
+
+    def get_widget_service(self, service_class, indicator):
+        if service_class in self.indicator_defaults:
+            service = service_class(indicator or self.indicator_defaults[service_class], self.start_date, self.end_date)
+        elif service_class in [ProfitAnalyticsService, CashierIncomeAnalyticsService]:
+            service = service_class(self.start_date, self.end_date, self.granularity)
+        else:
+            service = service_class(self.start_date, self.end_date)
+        service.facts_ensured = self.facts_ensured
+        return service
+
+    def get_widget_groups(self):
+        groups = {}
+        for widget in self.widgets:
+            name, _, indicator = widget.partition(':')
+            service_class, method_name = self.widgets_map[name]
+            groups.setdefault((service_class, indicator), []).append((widget, method_name))
+        return groups
+
+    def evaluate_widget_group(self, service, widgets):
+        results = {}
+        try:
+            for widget, method_name in widgets:
+                started_at = time.perf_counter()
+                try:
+                    data, error = getattr(service, method_name)(), None
+                except IncorrectIndicatorError as e:
+                    data, error = None, str(e)
+                results[widget] = {
+                    'data': data,
+                    'error': error,
+                }
+                self.durations[widget] = round((time.perf_counter() - started_at) * 1000, 1)
+        finally:
+            connections.close_all()
+        return results
+
+    def get_result_data(self):
+        started_at = time.perf_counter()
+        start_day, end_day = self.get_days_range()
+        ensure_daily_facts(start_day, end_day)
+        self.facts_ensured = True
+
+        groups = self.get_widget_groups()
+        results = {}
+        with ThreadPoolExecutor(max_workers=DASHBOARD_MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(self.evaluate_widget_group, self.get_widget_service(*key), widgets)
+                for key, widgets in groups.items()
+            ]
+            for future in futures:
+                results.update(future.result())
+        self.durations['total'] = round((time.perf_counter() - started_at) * 1000, 1)
+        return {
+            'widgets': {widget: results[widget] for widget in self.widgets},
+        }
+
+    def get_server_timing(self):
+        """Durations as a Server-Timing header value, metric names may not contain the indicator colon."""
+        metrics = []
+        for widget, duration in self.durations.items():
+            name = re.sub(r'[^\w-]', '_', widget)
+            metrics.append(f'{name};desc="{widget}";dur={duration}')
+        return ', '.join(metrics)
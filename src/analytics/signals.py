@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from src.analytics.services import mark_dirty_days, mark_order_dirty_days, invalidate_outlay_totals
+from src.factory.models import ProductFactory, ProductFactoryCategory
+from src.order.models import Order, OrderItem, OrderItemProductFactory, OrderItemProductReturn
+from src.payment.models import Payment, Outlay
+from src.user.models import WorkerIncomes
+from src.warehouse.models import WarehouseProduct, WarehouseProductWriteOff
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def mark_order_days(sender, instance, **kwargs):
+    mark_dirty_days([timezone.localdate(instance.created_at)])
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_save, sender=OrderItemProductFactory)
+@receiver(post_delete, sender=OrderItemProductFactory)
+@receiver(post_save, sender=OrderItemProductReturn)
+@receiver(post_delete, sender=OrderItemProductReturn)
+def mark_order_item_days(sender, instance, **kwargs):
+    mark_order_dirty_days(instance.order_id)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def mark_payment_days(sender, instance, **kwargs):
+    industry_id = None
+    if instance.outlay_id:
+        industry_id = Outlay.objects.filter(pk=instance.outlay_id).values_list('industry_id', flat=True).first()
+    mark_dirty_days([timezone.localdate(instance.created_at)], [industry_id])
+    if instance.order_id:
+        mark_order_dirty_days(instance.order_id)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=Outlay)
+@receiver(post_delete, sender=Outlay)
+def invalidate_outlay_totals_cache(sender, **kwargs):
+    transaction.on_commit(invalidate_outlay_totals)
+
+
+@receiver(post_save, sender=WarehouseProductWriteOff)
+@receiver(post_delete, sender=WarehouseProductWriteOff)
+def mark_write_off_days(sender, instance, **kwargs):
+    industry_id = WarehouseProduct.objects.filter(pk=instance.warehouse_product_id) \
+        .values_list('product__category__industry_id', flat=True).first()
+    mark_dirty_days([timezone.localdate(instance.created_at)], [industry_id])
+
+
+@receiver(post_save, sender=ProductFactory)
+@receiver(post_delete, sender=ProductFactory)
+def mark_product_factory_days(sender, instance, **kwargs):
+    industry_id = ProductFactoryCategory.objects.filter(pk=instance.category_id) \
+        .values_list('industry_id', flat=True).first()
+    days = [timezone.localdate(date) for date in [instance.created_at, instance.finished_at] if date]
+    mark_dirty_days(days, [industry_id])
+
+
+@receiver(post_save, sender=WorkerIncomes)
+@receiver(post_delete, sender=WorkerIncomes)
+def mark_worker_income_days(sender, instance, **kwargs):
+    mark_dirty_days([timezone.localdate(instance.created_at)])
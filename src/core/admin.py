@@ -29,7 +29,8 @@ class SettingsAdmin(admin.ModelAdmin):
 
 @admin.register(BotMessage)
 class BotMessageAdmin(admin.ModelAdmin):
-    list_display = ('id', 'created_at', 'is_sent')
+    list_display = ('id', 'created_at', 'is_sent', 'attempts', 'sent_at')
+    list_filter = ('is_sent',)
 
 
 @admin.register(ActionPermissionRequest)
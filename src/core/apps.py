@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'src.core'
+
+    def ready(self):
+        # models_logging scans MIDDLEWARE when first imported and imports our subclass of its
+        # middleware, so it has to be loaded before PalmaCrm.middleware to avoid a circular import.
+        import models_logging.middleware  # noqa: F401
+        from src.core.audit import apply_logging_field_lists
+        apply_logging_field_lists()
+        import src.core.signals  # noqa: F401
+        import src.core.checks  # noqa: F401
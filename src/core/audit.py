@@ -0,0 +1,89 @@
+import logging
+import queue
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from models_logging import _local, settings as logging_settings
+from models_logging.helpers import create_revision_with_changes, init_change
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseAuditWriter:
+    """Writes a batch of changes as one revision with a single bulk insert."""
+
+    def write(self, changes):
+        create_revision_with_changes(changes)
+
+
+class BackgroundAuditWriter(DatabaseAuditWriter):
+    """
+    Hands batches to a daemon thread so the request does not wait for the
+    audit insert. Batches still queued when the process exits are lost.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, changes):
+        self._queue.put(changes)
+
+    def _run(self):
+        while True:
+            changes = self._queue.get()
+            try:
+                super().write(changes)
+            except Exception:
+                logger.exception("Failed to write %s audit changes", len(changes))
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+
+_writer = None
+
+
+def get_audit_writer():
+    global _writer
+    if _writer is None:
+        _writer = import_string(settings.LOGGING_AUDIT_WRITER)()
+    return _writer
+
+
+def flush_changes(changes):
+    """Writes buffered changes once the surrounding transaction commits."""
+    changes = list(changes)
+    if not changes:
+        return
+    transaction.on_commit(lambda: get_audit_writer().write(changes))
+
+
+def apply_logging_field_lists():
+    """
+    Copies ``settings.LOGGING_ONLY_FIELDS`` onto the models so that
+    models_logging diffs only the allowed fields. A save that touches only
+    other fields (e.g. a stock counter) produces no change record.
+    """
+    for model_label, fields in getattr(settings, 'LOGGING_ONLY_FIELDS', {}).items():
+        model = apps.get_model(model_label)
+        model.LOGGING_ONLY_FIELDS = tuple(fields)
+
+
+def record_changes(instance, changed_data, action=logging_settings.CHANGED):
+    """
+    Adds an audit change for a write that bypasses the model signals (QuerySet.update(),
+    bulk_create(), bulk_update()). ``changed_data`` maps field names to {'old': ..., 'new': ...}.
+    """
+    if _local.ignore(instance.__class__, instance):
+        return
+    change = init_change(instance, changed_data, action, ContentType.objects.get_for_model(instance._meta.model))
+    if logging_settings.MERGE_CHANGES and _local.merge_changes_allowed:
+        _local.put_change_to_stack(change)
+    else:
+        change.save(using=logging_settings.LOGGING_DATABASE)
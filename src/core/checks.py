@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Warning, register, Tags
+
+LOCAL_MEMORY_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    # Cached data is invalidated by bumping a version key in the cache,
+    # which other processes only see with a shared backend.
+    if settings.CACHES['default']['BACKEND'] != LOCAL_MEMORY_CACHE_BACKEND:
+        return []
+    return [
+        Warning(
+            "The default cache is local to each process, so invalidating cached data (settings, "
+            "outlay totals, product scan codes) does not reach other web workers, bots and scripts.",
+            hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as Redis.",
+            id='core.W001',
+        )
+    ]
@@ -3,3 +3,9 @@ from django.db import models
 
 class ActionPermissionRequestType(models.TextChoices):
     PRODUCT_WRITE_OFF = "PRODUCT_WRITE_OFF", "Списание товара"
+
+
+class BotMessageType(models.TextChoices):
+    TEXT = "TEXT", "Текст"
+    ORDER_CREATED = "ORDER_CREATED", "Создан заказ"
+    ORDER_CANCELLED = "ORDER_CANCELLED", "Отменен заказ"
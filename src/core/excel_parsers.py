@@ -1,5 +1,4 @@
 from decimal import Decimal
-from typing import List
 
 import pandas as pd
 from django.db import transaction
@@ -7,9 +6,9 @@ from django.contrib.auth import get_user_model
 
 from src.income.enums import IncomeStatus
 from src.income.models import Income, IncomeItem, ProviderProduct, Provider
-from src.income.services import income_update_total, income_update_total_sale_price
+from src.income.services import incomes_update_totals
 from src.product.enums import ProductUnitType
-from src.product.helpers import generate_product_code
+from src.product.helpers import generate_product_code, reserve_ids
 from src.product.models import Category, Product, Industry
 
 User = get_user_model()
@@ -24,198 +23,448 @@ def get_halfs(n):
         return half + 1, half
 
 
+def to_decimal(value):
+    return None if pd.isna(value) else Decimal(str(value))
+
+
 class BaseExcelParser:
+    """
+    Reads the sheet once and normalises whole columns with pandas: text is
+    stripped, numbers are parsed, prices are converted from ``currency_rate``
+    and empty cells become ``None``. Importers then work with plain tuples.
+    """
+    batch_size = 1000
+    # attribute name -> column position in the sheet
+    columns = {}
+    text_columns = ()
+    currency_columns = ()
+    currency_rate = 1
+    required_columns = ()
+
     def __init__(self, file_obj):
         self.file_obj = file_obj
-        self.products_row: List[List[str]] = self.read_file()
-
-    def read_file(self) -> List[List[str]]:
-        excel_pd = pd.read_excel(self.file_obj)
-        products_row = [list(row[1]) for row in excel_pd.iterrows()]
-        return products_row
+        self.products = self.read_file()
+
+    def read_file(self) -> pd.DataFrame:
+        sheet = pd.read_excel(self.file_obj, dtype=object)
+        data = pd.DataFrame(index=sheet.index)
+        for name, position in self.columns.items():
+            column = sheet.iloc[:, position] if position < sheet.shape[1] else pd.Series(None, index=sheet.index)
+            if name in self.text_columns:
+                column = column.astype('string').str.strip().replace('', pd.NA)
+            else:
+                column = pd.to_numeric(column, errors='coerce')
+                if name in self.currency_columns:
+                    column = column * self.currency_rate
+                column = column.round(2).map(to_decimal)
+            data[name] = column.astype(object).where(column.notna(), None)
+        data['row_number'] = sheet.index + 2
+        return data
+
+    def get_rows(self, data=None):
+        data = self.products if data is None else data
+        return list(data.itertuples(index=False))
+
+    def get_errors(self, data=None, required_columns=None):
+        data = self.products if data is None else data
+        errors = []
+        for name in required_columns or self.required_columns:
+            for row_number in data.loc[data[name].isna(), 'row_number']:
+                errors.append(f"Строка {row_number}: не заполнено поле '{name}'")
+        return errors
+
+    def validate(self, data=None, required_columns=None):
+        errors = self.get_errors(data, required_columns)
+        if errors:
+            raise ValueError("\n".join(errors))
+
+    def get_or_create_providers(self, names, created_user=None):
+        """Returns providers by name, creating the missing ones with one bulk insert."""
+        providers_by_name = self.get_providers(names, created_user)
+        new_providers = [
+            Provider(full_name=name, created_user=created_user or self.user)
+            for name in names if name not in providers_by_name
+        ]
+        Provider.objects.bulk_create(new_providers, batch_size=self.batch_size)
+        providers_by_name.update({provider.full_name: provider for provider in new_providers})
+        return providers_by_name
+
+    def get_providers(self, names, created_user=None):
+        providers = Provider.objects.filter(full_name__in=names).order_by('id')
+        if created_user:
+            providers = providers.filter(created_user=created_user)
+        providers_by_name = {}
+        for provider in providers:
+            providers_by_name.setdefault(provider.full_name, provider)
+        return providers_by_name
+
+    def plan_products(self, items, categories, providers_created_user=None):
+        """
+        Matches ``(product_name, category_name, price, provider_names)`` items
+        against the catalog by name and category. ``categories`` maps a name
+        to a saved or not yet saved category. Nothing is written.
+        """
+        products = {}
+        for product in Product.objects.filter(
+                category__in=[category for category in categories.values() if category.pk],
+                name__in={item[0] for item in items}
+        ).order_by('id'):
+            products.setdefault((product.name, product.category_id), product)
+
+        providers = self.get_providers(
+            {name for item in items for name in item[3]}, created_user=providers_created_user
+        )
+        linked = set(
+            ProviderProduct.objects.filter(product__in=products.values()).values_list('product_id', 'provider_id')
+        )
+
+        plan = {}
+        for product_name, category_name, price, provider_names in items:
+            category = categories[category_name]
+            entry = plan.get((product_name, category_name))
+            if entry is None:
+                product = products.get((product_name, category.pk)) if category.pk else None
+                entry = plan[(product_name, category_name)] = {
+                    'product': product,
+                    'name': product_name,
+                    'category': category,
+                    'price': price,
+                    'new_providers': [],
+                }
+            for provider_name in provider_names:
+                provider = providers.get(provider_name)
+                is_linked = provider and entry['product'] and (entry['product'].pk, provider.pk) in linked
+                if not is_linked and provider_name not in entry['new_providers']:
+                    entry['new_providers'].append(provider_name)
+        return {
+            'products': list(plan.values()),
+            'new_categories': sorted(name for name, category in categories.items() if not category.pk),
+            'new_providers': sorted({name for item in items for name in item[3]} - providers.keys()),
+        }
+
+    @staticmethod
+    def get_products_diff(plan):
+        diff = {
+            'new': [],
+            'changed': [],
+            'unchanged': [],
+            'price_changes': [],
+            'new_categories': plan['new_categories'],
+            'new_providers': plan['new_providers'],
+        }
+        for entry in plan['products']:
+            product = entry['product']
+            data = {
+                'id': product.pk if product else None,
+                'name': entry['name'],
+                'category': entry['category'].name,
+                'price': entry['price'],
+                'new_providers': entry['new_providers'],
+            }
+            if product is None:
+                diff['new'].append(data)
+                continue
+            data['old_price'] = product.price
+            if product.price != entry['price']:
+                diff['price_changes'].append(data)
+            if product.price != entry['price'] or entry['new_providers']:
+                diff['changed'].append(data)
+            else:
+                diff['unchanged'].append(data)
+        return diff
+
+    def apply_products_plan(self, plan, providers_created_user=None):
+        new_categories = {
+            entry['category'].name: entry['category'] for entry in plan['products'] if not entry['category'].pk
+        }
+        Category.objects.bulk_create(list(new_categories.values()), batch_size=self.batch_size)
+        providers = self.get_or_create_providers(
+            {name for entry in plan['products'] for name in entry['new_providers']},
+            created_user=providers_created_user
+        )
+
+        new_products = []
+        changed_products = []
+        provider_products = []
+        for entry in plan['products']:
+            product = entry['product']
+            if product is None:
+                product = Product(
+                    name=entry['name'],
+                    category=entry['category'],
+                    price=entry['price'],
+                    unit_type=ProductUnitType.PIECE
+                )
+                new_products.append(product)
+            elif product.price != entry['price']:
+                product.price = entry['price']
+                changed_products.append(product)
+            provider_products.extend((product, providers[name]) for name in entry['new_providers'])
+
+        self.create_products(new_products)
+        Product.objects.bulk_update(changed_products, ['price'], batch_size=self.batch_size)
+        self.create_provider_products(provider_products)
+
+    def create_products(self, products):
+        """Inserts products with EAN13 codes generated from ids reserved beforehand."""
+        for product, product_id in zip(products, reserve_ids(Product, len(products))):
+            product.id = product_id
+            product.code = generate_product_code(product)
+        Product.objects.bulk_create(products, batch_size=self.batch_size)
+
+    def create_provider_products(self, pairs):
+        ProviderProduct.objects.bulk_create(
+            [ProviderProduct(product=product, provider=provider) for product, provider in pairs],
+            batch_size=self.batch_size,
+            ignore_conflicts=True
+        )
+
+    def create_income_items(self, income_items):
+        IncomeItem.objects.bulk_create(income_items, batch_size=self.batch_size)
+        incomes_update_totals({income_item.income_id for income_item in income_items})
 
 
 class ProductImporter(BaseExcelParser):
+    columns = {
+        'product_name': 0,
+        'category_name': 1,
+        'count': 2,
+        'self_price': 3,
+        'price': 4,
+        'provider_name': 5,
+    }
+    text_columns = ('product_name', 'category_name', 'provider_name')
+    currency_columns = ('self_price', 'price')
+    currency_rate = 12750
+    required_columns = ('product_name', 'category_name')
+
     def __init__(self, user, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.user = user
 
-    def process_products(self, industry):
-        with transaction.atomic():
-            for row in self.products_row:
-                product_name = row[0].strip()
-                category = row[1].strip()
-                price = row[4]
-                provider_name = row[5].strip()
-                category, created = Category.objects.get_or_create(name=category, industry=industry)
-                product, created = Product.objects.get_or_create(
-                    name=product_name,
-                    category=category,
-                    price=price * 12750 if not pd.isna(price) else 0,
-                    unit_type=ProductUnitType.PIECE,
-                )
-                if created:
-                    product.code = generate_product_code(product)
-                    product.save()
+    def get_categories(self, names, industry):
+        categories = {}
+        for category in Category.objects.filter(name__in=names, industry=industry).order_by('id'):
+            categories.setdefault(category.name, category)
+        categories.update({name: Category(name=name, industry=industry) for name in names if name not in categories})
+        return categories
+
+    def process_products(self, industry, dry_run=False):
+        """
+        Creates missing products and provider links and updates changed prices.
+        With ``dry_run`` only the diff against the catalog is returned.
+        """
+        if dry_run:
+            errors = self.get_errors()
+            if errors:
+                return {'errors': errors}
+        else:
+            self.validate()
+
+        items = [
+            (
+                row.product_name,
+                row.category_name,
+                row.price or Decimal(0),
+                [row.provider_name] if row.provider_name else [],
+            )
+            for row in self.get_rows()
+        ]
 
-                if not pd.isna(provider_name):
-                    provider, created = Provider.objects.get_or_create(full_name=provider_name, created_user=self.user)
-                    ProviderProduct.objects.create(product=product, provider=provider)
+        with transaction.atomic():
+            categories = self.get_categories({item[1] for item in items}, industry)
+            plan = self.plan_products(items, categories, providers_created_user=self.user)
+            if dry_run:
+                return self.get_products_diff(plan)
+            self.apply_products_plan(plan, providers_created_user=self.user)
 
     def create_income(self, industry, created_user):
-        with transaction.atomic():
+        data = self.products[self.products['count'].notna()]
+        self.validate(data, self.required_columns + ('provider_name',))
+        rows = self.get_rows(data)
 
-            for row in filter(lambda x: not pd.isna(x[2]), self.products_row):
-                product_name = row[0].strip()
-                category_name = row[1].strip()
-                count = Decimal(row[2] if not pd.isna(row[2]) else 0)
-                self_price = Decimal(row[3] if not pd.isna(row[3]) else 0)
-                price = Decimal(row[4] if not pd.isna(row[4]) else 0)
-                provider_name = row[5].strip()
-
-                provider = Provider.objects.filter(full_name=provider_name).first()
-                income, is_created = Income.objects.get_or_create(
-                    provider=provider,
-                    created_user=created_user
+        with transaction.atomic():
+            providers = self.get_providers({row.provider_name for row in rows})
+            missing_providers = {row.provider_name for row in rows} - providers.keys()
+            if missing_providers:
+                raise Provider.DoesNotExist(f"Поставщики не найдены: {', '.join(sorted(missing_providers))}")
+
+            incomes = {}
+            for income in Income.objects.filter(
+                    provider__in=providers.values(), created_user=created_user
+            ).order_by('id'):
+                incomes.setdefault(income.provider_id, income)
+            new_incomes = [
+                Income(provider=provider, created_user=created_user)
+                for provider in providers.values() if provider.pk not in incomes
+            ]
+            Income.objects.bulk_create(new_incomes)
+            incomes.update({income.provider_id: income for income in new_incomes})
+
+            products = {}
+            for product in Product.objects.filter(
+                    category__industry=industry,
+                    category__name__in={row.category_name for row in rows},
+                    name__in={row.product_name for row in rows}
+            ).select_related('category').order_by('category_id', 'id'):
+                products.setdefault((product.name, product.category.name), product)
+            missing_products = {(row.product_name, row.category_name) for row in rows if row.count} - products.keys()
+            if missing_products:
+                raise Product.DoesNotExist(
+                    f"Товары не найдены: {', '.join(sorted(name for name, _ in missing_products))}"
                 )
 
-                category = Category.objects.filter(name=category_name, industry=industry).first()
-                product = Product.objects.filter(
-                    name=product_name,
-                    category=category,
-                ).first()
-
-                if count != 0:
-                    IncomeItem.objects.get_or_create(
-                        income=income,
-                        product=product,
-                        count=count,
-                        price=self_price * 12750,
-                        sale_price=price * 12750,
-                        total=self_price * 12750 * count,
-                        total_sale_price=price * 12750 * count,
-                    )
-
-                income_update_total(income)
-                income_update_total_sale_price(income.pk)
+            income_items = {}
+            for row in rows:
+                if not row.count:
+                    continue
+                self_price = row.self_price or Decimal(0)
+                price = row.price or Decimal(0)
+                income_item = IncomeItem(
+                    income=incomes[providers[row.provider_name].pk],
+                    product=products[(row.product_name, row.category_name)],
+                    count=row.count,
+                    price=self_price,
+                    sale_price=price,
+                    total=self_price * row.count,
+                    total_sale_price=price * row.count,
+                )
+                income_items.setdefault(self.get_income_item_key(income_item), income_item)
+
+            existing_keys = {
+                self.get_income_item_key(income_item)
+                for income_item in IncomeItem.objects.filter(income__in=incomes.values())
+            }
+            self.create_income_items([
+                income_item for key, income_item in income_items.items() if key not in existing_keys
+            ])
+
+    @staticmethod
+    def get_income_item_key(income_item):
+        return (
+            income_item.income_id,
+            income_item.product_id,
+            *(Decimal(getattr(income_item, field)).quantize(Decimal('0.01')) for field in (
+                'count', 'price', 'sale_price', 'total', 'total_sale_price'
+            ))
+        )
 
     def delete_products(self, industry):
-        for row in self.products_row:
-            product_name = row[0].strip()
-            category_name = row[1].strip()
-
-            category = Category.objects.filter(name=category_name, industry=industry).first()
+        for row in self.get_rows():
+            category = Category.objects.filter(name=row.category_name, industry=industry).first()
             if not category:
                 continue
             product = Product.objects.filter(
-                name=product_name,
+                name=row.product_name,
                 category=category,
             ).first()
             if product:
-                product.delete()
+                # soft delete stamps a new catalog version, so POS tills get the id in ``removed``
+                product.is_deleted = True
+                product.save()
 
 
 class FlowerProductsImporter(BaseExcelParser):
+    columns = {
+        'product_name': 1,
+        'count': 2,
+        'self_price': 3,
+        'price': 4,
+        'provider_name1': 5,
+        'provider_name2': 6,
+        'category_name': 7,
+    }
+    text_columns = ('product_name', 'provider_name1', 'provider_name2', 'category_name')
+    required_columns = ('product_name', 'category_name', 'price')
+
     def __init__(self, user, category, **kwargs):
         super().__init__(**kwargs)
         self.user = user
         self.category = category
 
-    def process_products(self):
-        with transaction.atomic():
-            for row in self.products_row:
-                product_name = row[1].strip()
-                price = row[4]
-                providers = row[5:7]
-                category_name = row[7].strip()
-
-                category = Category.objects.get(
-                    name=category_name
-                )
-
-                product = Product.objects.create(
-                    category=category,
-                    unit_type=ProductUnitType.PIECE,
-                    name=product_name,
-                    price=price
-                )
-                product.code = generate_product_code(product)
-                product.save()
+    def get_categories(self, names):
+        categories = {}
+        for category in Category.objects.filter(name__in=names):
+            categories.setdefault(category.name, []).append(category)
+        for category_name in names:
+            if category_name not in categories:
+                raise Category.DoesNotExist(f"Категория '{category_name}' не найдена.")
+            if len(categories[category_name]) > 1:
+                raise Category.MultipleObjectsReturned(f"Найдено несколько категорий '{category_name}'.")
+        return {name: found[0] for name, found in categories.items()}
+
+    def process_products(self, dry_run=False):
+        """
+        Creates missing products and provider links and updates changed prices.
+        With ``dry_run`` only the diff against the catalog is returned.
+        """
+        if dry_run:
+            errors = self.get_errors()
+            if errors:
+                return {'errors': errors}
+        else:
+            self.validate()
+
+        items = [
+            (
+                row.product_name,
+                row.category_name,
+                row.price,
+                [name for name in (row.provider_name1, row.provider_name2) if name],
+            )
+            for row in self.get_rows()
+        ]
 
-                for provider in providers:
-                    if not pd.isna(provider):
-                        name = provider.strip()
-                        provider, created = Provider.objects.get_or_create(full_name=name, created_user=self.user)
-                        ProviderProduct.objects.create(product=product, provider=provider)
+        with transaction.atomic():
+            categories = self.get_categories({item[1] for item in items})
+            plan = self.plan_products(items, categories, providers_created_user=self.user)
+            if dry_run:
+                return self.get_products_diff(plan)
+            self.apply_products_plan(plan, providers_created_user=self.user)
 
     def create_incomes(self):
-        with transaction.atomic():
-            products_row = list(filter(lambda r: not (r[2] == 0 or pd.isna(r[2])), self.products_row))
-            products_with_single_providers = list(filter(lambda r: pd.isna(r[6]), products_row))
-            products_with_two_providers = list(filter(lambda r: not pd.isna(r[6]), products_row))
-            for row in products_with_single_providers:
-                product_name = row[1].strip()
-                count = Decimal(row[2])
-                self_price = Decimal(row[3])
-                price = Decimal(row[4])
-                provider_name = row[5].strip()
-
-                product, _ = Product.objects.get_or_create(name=product_name)
-                provider, _ = Provider.objects.get_or_create(full_name=provider_name)
-
-                income, _ = Income.objects.get_or_create(
-                    provider=provider,
-                    status=IncomeStatus.CREATED,
-                    created_user=self.user
-                )
-                IncomeItem.objects.create(
-                    income=income,
-                    product=product,
-                    count=count,
-                    price=self_price,
-                    sale_price=price,
-                    total=count * self_price,
-                    total_sale_price=count * price,
-                )
+        data = self.products[self.products['count'].fillna(0) != 0]
+        self.validate(data, ('product_name', 'self_price', 'price', 'provider_name1'))
+        rows = self.get_rows(data)
 
-            for row in products_with_two_providers:
-                product_name = row[1].strip()
-                count = Decimal(row[2])
-                self_price = Decimal(row[3])
-                price = Decimal(row[4])
-                provider_name1 = row[5].strip()
-                provider_name2 = row[6].strip()
-                count1, count2 = get_halfs(count)
-
-                product, _ = Product.objects.get_or_create(name=product_name)
-                provider1, _ = Provider.objects.get_or_create(full_name=provider_name1)
-                provider2, _ = Provider.objects.get_or_create(full_name=provider_name2)
-
-                income1, _ = Income.objects.get_or_create(
-                    provider=provider1,
-                    status=IncomeStatus.CREATED,
-                    created_user=self.user
-                )
-                income2, _ = Income.objects.get_or_create(
-                    provider=provider2,
+        with transaction.atomic():
+            products = {}
+            for product in Product.objects.filter(name__in={row.product_name for row in rows}).order_by('id'):
+                products.setdefault(product.name, product)
+            missing_products = {row.product_name for row in rows} - products.keys()
+            if missing_products:
+                raise Product.DoesNotExist(f"Товары не найдены: {', '.join(sorted(missing_products))}")
+
+            providers = self.get_or_create_providers(
+                {name for row in rows for name in (row.provider_name1, row.provider_name2) if name}
+            )
+
+            incomes = {}
+            for income in Income.objects.filter(
+                    provider__in=providers.values(),
                     status=IncomeStatus.CREATED,
                     created_user=self.user
-                )
-                IncomeItem.objects.create(
-                    income=income1,
-                    product=product,
-                    count=count1,
-                    price=self_price,
-                    sale_price=price,
-                    total=count1 * self_price,
-                    total_sale_price=count1 * price,
-                )
-                IncomeItem.objects.create(
-                    income=income2,
-                    product=product,
-                    count=count2,
-                    price=self_price,
-                    sale_price=price,
-                    total=count2 * self_price,
-                    total_sale_price=count2 * price,
-                )
+            ).order_by('id'):
+                incomes.setdefault(income.provider_id, income)
+            new_incomes = [
+                Income(provider=provider, status=IncomeStatus.CREATED, created_user=self.user)
+                for provider in providers.values() if provider.pk not in incomes
+            ]
+            Income.objects.bulk_create(new_incomes)
+            incomes.update({income.provider_id: income for income in new_incomes})
+
+            income_items = []
+            for row in rows:
+                provider_names = [name for name in (row.provider_name1, row.provider_name2) if name]
+                counts = get_halfs(row.count) if len(provider_names) == 2 else (row.count,)
+                for provider_name, count in zip(provider_names, counts):
+                    income_items.append(IncomeItem(
+                        income=incomes[providers[provider_name].pk],
+                        product=products[row.product_name],
+                        count=count,
+                        price=row.self_price,
+                        sale_price=row.price,
+                        total=count * row.self_price,
+                        total_sale_price=count * row.price,
+                    ))
+            self.create_income_items(income_items)
@@ -1,12 +1,10 @@
 import datetime
 import textwrap
 
-import requests
-
-from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from src.core.enums import BotMessageType
 from src.core.models import BotMessage
 from src.payment.enums import PaymentType
 from src.payment.models import Payment, PaymentMethod
@@ -66,9 +64,24 @@ def create_action_notification(obj_name: str, action: str, user: str, details: s
 
 
 def create_order_create_notification(order):
+    BotMessage.objects.create(message_type=BotMessageType.ORDER_CREATED, object_id=order.pk)
+
+
+def create_order_cancel_notification(order):
+    BotMessage.objects.create(message_type=BotMessageType.ORDER_CANCELLED, object_id=order.pk)
+
+
+def send_order_notification(order, created=True):
+    if created:
+        create_order_create_notification(order)
+    else:
+        create_order_cancel_notification(order)
+
+
+def render_order_create_message(order):
     payment_methods = PaymentMethod.objects.filter(payments__in=order.payments.filter(is_deleted=False)).distinct()
     payment_method_names = ", ".join([p.name for p in payment_methods]) if payment_methods else "-"
-    message = textwrap.dedent(f"""
+    return textwrap.dedent(f"""
             📦 <b>Создан новый заказ №{order.pk}</b>
 
             🙋‍♂️ <i>Клиент</i>: {order.client.full_name}
@@ -80,11 +93,10 @@ def create_order_create_notification(order):
             📉 <i>Общий долг клиента</i>: {my_number_separator(order.client.get_debt())} Сум
             💵 <i>Вид оплаты</i>: {payment_method_names}
         """)
-    BotMessage.objects.create(text=message)
 
 
-def create_order_cancel_notification(order):
-    message = textwrap.dedent(f"""
+def render_order_cancel_message(order):
+    return textwrap.dedent(f"""
                 ❌ <b>Отменен заказ №{order.pk}</b>
 
                 🙋‍♂️ <i>Клиент:</i> {order.client.full_name}
@@ -94,42 +106,21 @@ def create_order_cancel_notification(order):
                 💰 <i>Сумма заказа:</i> {my_number_separator(order.get_total_with_discount())} Сум
                 ✅ <i>Оплачено:</i> {my_number_separator(order.get_amount_paid())} Сум
             """)
-    BotMessage.objects.create(text=message)
 
 
-def send_order_notification(order, created=True):
-    payment_methods = PaymentMethod.objects.filter(payments__in=order.payments.filter(is_deleted=False)).distinct()
-    payment_method_names = ", ".join([p.name for p in payment_methods]) if payment_methods else "-"
-    message = textwrap.dedent(f"""
-        📦 <b>Создан новый заказ №{order.pk}</b>
-        
-        🙋‍♂️ <i>Клиент</i>: {order.client.full_name}
-        📞 <i>Номер клиента</i>: {order.client.phone_number}
-        🛠️ <i>Создал</i>: {order.created_user.get_full_name()}
-        🧑‍ <i>Продавец</i>: {order.salesman.get_full_name() if order.salesman else '-'}
-        💰 <i>Сумма заказа</i>: {my_number_separator(order.get_total_with_discount())} Сум
-        💳 <i>Долг</i>: {my_number_separator(order.debt)} Сум
-        📉 <i>Общий долг клиента</i>: {my_number_separator(order.client.get_debt())} Сум
-        💵 <i>Вид оплаты</i>: {payment_method_names}
-    """)
-    if not created:
-        message = textwrap.dedent(f"""
-            ❌ <b>Отменен заказ №{order.pk}</b>
-            
-            🙋‍♂️ <i>Клиент:</i> {order.client.full_name}
-            📞 <i>Номер клиента:</i> {order.client.phone_number}
-            🛠️ <i>Создал:</i> {order.created_user.get_full_name()}
-            🧑‍ <i>Продавец:</i> {order.salesman.get_full_name() if order.salesman else '-'}
-            💰 <i>Сумма заказа:</i> {my_number_separator(order.get_total_with_discount())} Сум
-            ✅ <i>Оплачено:</i> {my_number_separator(order.get_amount_paid())} Сум
-        """)
-    payload = {
-        'chat_id': settings.CHAT_ID,
-        'text': message,
-        'parse_mode': 'Html'
+def render_bot_message(bot_message: BotMessage):
+    """Builds the text of a queued notification from the current state of its object."""
+    from src.order.models import Order
+
+    renderers = {
+        BotMessageType.ORDER_CREATED: render_order_create_message,
+        BotMessageType.ORDER_CANCELLED: render_order_cancel_message,
     }
-    url = f"{settings.TG_API_URL}{settings.BOT_TOKEN}/sendMessage"
-    requests.post(url, data=payload)
+    renderer = renderers.get(bot_message.message_type)
+    if renderer is None:
+        return bot_message.text
+    order = Order.objects.select_related('client', 'created_user', 'salesman').get(pk=bot_message.object_id)
+    return renderer(order)
 
 
 def create_daily_report_notification():
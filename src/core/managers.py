@@ -0,0 +1,11 @@
+from django.db import models
+from django.utils import timezone
+
+
+class BotMessageQuerySet(models.QuerySet):
+    def pending(self, max_attempts):
+        return self.filter(
+            models.Q(next_attempt_at__isnull=True) | models.Q(next_attempt_at__lte=timezone.now()),
+            is_sent=False,
+            attempts__lt=max_attempts,
+        ).order_by('created_at')
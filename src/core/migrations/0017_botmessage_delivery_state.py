@@ -0,0 +1,37 @@
+# Generated by Django 5.0.2 on 2026-10-19 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_settings_permission_notification_receivers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='botmessage',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Попыток отправки'),
+        ),
+        migrations.AddField(
+            model_name='botmessage',
+            name='last_error',
+            field=models.TextField(blank=True, null=True, verbose_name='Последняя ошибка'),
+        ),
+        migrations.AddField(
+            model_name='botmessage',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Следующая попытка'),
+        ),
+        migrations.AddField(
+            model_name='botmessage',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата отправки'),
+        ),
+        migrations.AddIndex(
+            model_name='botmessage',
+            index=models.Index(condition=models.Q(('is_sent', False)), fields=['created_at'], name='core_botmessage_pending_idx'),
+        ),
+    ]
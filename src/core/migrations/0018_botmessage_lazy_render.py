@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-19 06:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_botmessage_delivery_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='botmessage',
+            name='message_type',
+            field=models.CharField(choices=[('TEXT', 'Текст'), ('ORDER_CREATED', 'Создан заказ'), ('ORDER_CANCELLED', 'Отменен заказ')], default='TEXT', max_length=50, verbose_name='Тип уведомления'),
+        ),
+        migrations.AddField(
+            model_name='botmessage',
+            name='object_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True, verbose_name='ID объекта'),
+        ),
+        migrations.AlterField(
+            model_name='botmessage',
+            name='text',
+            field=models.TextField(blank=True, default='', verbose_name='Текст'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_botmessage_lazy_render'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actionpermissionrequest',
+            name='group_id',
+            field=models.UUIDField(blank=True, db_index=True, null=True, verbose_name='Группа запросов'),
+        ),
+    ]
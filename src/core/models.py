@@ -1,9 +1,14 @@
+import time
+import uuid
+
 from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
 from django.core.validators import MaxValueValidator
 from django.db import models, ProgrammingError
 from django.contrib.auth import get_user_model
 
-from src.core.enums import ActionPermissionRequestType
+from src.core.enums import ActionPermissionRequestType, BotMessageType
+from src.core.managers import BotMessageQuerySet
 
 User = get_user_model()
 
@@ -90,33 +95,104 @@ class Settings(models.Model):
     def __str__(self):
         return "Настройки"
 
+    CACHE_KEY = 'core:settings'
+    CACHE_VERSION_KEY = 'core:settings:version'
+    # Bounds how long a process may serve an old row when the version bump does not reach it,
+    # e.g. with a cache backend that is not shared between processes
+    CACHE_TIMEOUT = 60
+    # (version, instance, expires_at) kept by this process
+    _cached = None
+
     @classmethod
     def load(cls):
-        try:
-            if not cls.objects.exists():
-                return cls.objects.create()
-            return cls.objects.first()
-        except ProgrammingError:
-            return None
+        """
+        Returns the settings row without hitting the database on repeated calls.
+        The row is kept in the process and in the shared cache together with the
+        version stamp it was read at; saving settings bumps the stamp. Both copies
+        also expire after ``CACHE_TIMEOUT`` seconds.
+        """
+        version = cache.get(cls.CACHE_VERSION_KEY)
+        if version is None:
+            cache.add(cls.CACHE_VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(cls.CACHE_VERSION_KEY)
+
+        if cls._cached and cls._cached[0] == version and cls._cached[2] > time.monotonic():
+            return cls._cached[1]
+
+        cached = cache.get(cls.CACHE_KEY)
+        if cached and cached[0] == version:
+            instance = cached[1]
+        else:
+            try:
+                instance = cls.objects.first() or cls.objects.create()
+            except ProgrammingError:
+                return None
+            cache.set(cls.CACHE_KEY, (version, instance), cls.CACHE_TIMEOUT)
+
+        cls._cached = (version, instance, time.monotonic() + cls.CACHE_TIMEOUT)
+        return instance
+
+    @classmethod
+    def invalidate_cache(cls):
+        cache.set(cls.CACHE_VERSION_KEY, uuid.uuid4().hex, None)
+        cache.delete(cls.CACHE_KEY)
+        cls._cached = None
 
 
 class BotMessage(models.Model):
     text = models.TextField(
+        blank=True,
+        default="",
         verbose_name="Текст"
     )
+    message_type = models.CharField(
+        max_length=50,
+        choices=BotMessageType.choices,
+        default=BotMessageType.TEXT,
+        verbose_name="Тип уведомления"
+    )
+    object_id = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="ID объекта"
+    )
     is_sent = models.BooleanField(
         default=False,
         verbose_name="Отправлен"
     )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Попыток отправки"
+    )
+    last_error = models.TextField(
+        null=True,
+        blank=True,
+        verbose_name="Последняя ошибка"
+    )
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Следующая попытка"
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Дата отправки"
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name="Дата создания"
     )
 
+    objects = BotMessageQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Уведомление'
         verbose_name_plural = 'Уведомления'
+        indexes = [
+            models.Index(fields=['created_at'], condition=models.Q(is_sent=False), name='core_botmessage_pending_idx'),
+        ]
 
     def __str__(self):
         return f"Уведомление | {self.created_at.strftime('%d/%m/%Y %H:%M')}"
@@ -148,6 +224,12 @@ class ActionPermissionRequest(models.Model):
         default=False,
         verbose_name="Разрешение дано"
     )
+    group_id = models.UUIDField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name="Группа запросов"
+    )
     created_user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from src.core.enums import ActionPermissionRequestType
+from src.core.models import ActionPermissionRequest
+from src.warehouse.models import WarehouseProductWriteOff
+from src.warehouse.services import delete_warehouse_product_write_off
+
+User = get_user_model()
+
+
+def answer_action_permission_request(permission_request_id, is_accepted, user: User):
+    """Saves the decision on a permission request and reverts the write-off if it was rejected."""
+    with transaction.atomic():
+        permission_request = ActionPermissionRequest.objects.select_for_update().get(pk=permission_request_id)
+        permission_request.is_accepted = is_accepted
+        permission_request.is_answered = True
+
+        if permission_request.request_type == ActionPermissionRequestType.PRODUCT_WRITE_OFF:
+            write_off_obj = WarehouseProductWriteOff.objects.get(pk=permission_request.wh_product_write_off_id)
+            if not write_off_obj.is_deleted and not is_accepted:
+                delete_warehouse_product_write_off(write_off_obj.pk, user=user)
+
+        permission_request.save()
+    return permission_request
+
+
+def answer_action_permission_request_group(group_id, is_accepted, user: User):
+    """Answers every request of a batch write-off at once."""
+    with transaction.atomic():
+        permission_requests = list(
+            ActionPermissionRequest.objects.select_for_update().filter(group_id=group_id).order_by('id')
+        )
+        if not permission_requests:
+            raise ActionPermissionRequest.DoesNotExist
+        for permission_request in permission_requests:
+            answer_action_permission_request(permission_request.pk, is_accepted, user)
+    return permission_requests
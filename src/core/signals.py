@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from src.core.models import Settings
+
+
+@receiver(post_save, sender=Settings)
+@receiver(post_delete, sender=Settings)
+def invalidate_settings_cache(sender, **kwargs):
+    # Bumped after commit so no process can cache the old row under the new version
+    transaction.on_commit(Settings.invalidate_cache)
@@ -0,0 +1,161 @@
+import asyncio
+import datetime
+import logging
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from django.utils import timezone
+
+from src.core.helpers import render_bot_message
+from src.core.models import BotMessage
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramError(Exception):
+    def __init__(self, message="Ошибка Telegram API.", retryable=False):
+        self.message = message
+        self.retryable = retryable
+        super().__init__(self.message)
+
+
+class TelegramClient:
+    """
+    Telegram Bot API client over one pooled aiohttp session.
+
+    Transient failures (network errors, 5xx) are retried with exponential
+    backoff. A 429 response pauses every request made through the client
+    for the ``retry_after`` seconds Telegram asks for.
+    """
+
+    def __init__(self, token, api_url=None, max_connections=10, timeout=10, max_retries=3, backoff=1):
+        self.base_url = f"{api_url or settings.TG_API_URL}{token}"
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._session = None
+        self._paused_until = 0
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+
+    async def _wait_rate_limit(self):
+        delay = self._paused_until - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def call(self, method, payload):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            await self._wait_rate_limit()
+            try:
+                async with self._session.post(f"{self.base_url}/{method}", json=payload) as response:
+                    data = await response.json(content_type=None)
+                    status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error = TelegramError(f"{type(e).__name__}: {e}", retryable=True)
+            else:
+                if data.get('ok'):
+                    return data.get('result')
+                error = TelegramError(
+                    data.get('description', f"HTTP {status}"),
+                    retryable=status == 429 or status >= 500
+                )
+                if status == 429:
+                    retry_after = data.get('parameters', {}).get('retry_after', 1)
+                    self._paused_until = asyncio.get_running_loop().time() + retry_after
+                    continue
+            if not error.retryable:
+                break
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        raise error
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return await self.call('sendMessage', {'chat_id': chat_id, 'text': text, **kwargs})
+
+
+class BotMessageDispatcher:
+    """
+    Delivers queued ``BotMessage`` rows with bounded concurrency.
+
+    Message text is rendered right before sending, so building it never
+    happens inside the API request that queued the message.
+    Each message is marked sent only after Telegram accepted it. Failed
+    messages keep ``is_sent=False``, record the error and are retried after
+    an exponentially growing delay until ``max_attempts`` is reached.
+    A batch is claimed before sending by moving its ``next_attempt_at`` by
+    ``claim_timeout`` seconds, so dispatchers running side by side never send
+    the same message, and a message left by a crashed dispatcher is retried.
+    """
+
+    def __init__(self, client, chat_id=None, concurrency=5, batch_size=100, max_attempts=5, retry_delay=30,
+                 claim_timeout=300):
+        self.client = client
+        self.chat_id = chat_id or settings.CHAT_ID
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.claim_timeout = claim_timeout
+
+    @transaction.atomic
+    def claim_pending(self):
+        messages = list(
+            BotMessage.objects.pending(self.max_attempts).select_for_update(skip_locked=True)[:self.batch_size]
+        )
+        BotMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+            next_attempt_at=timezone.now() + datetime.timedelta(seconds=self.claim_timeout)
+        )
+        return messages
+
+    async def deliver(self, message: BotMessage):
+        async with self.semaphore:
+            try:
+                text = await sync_to_async(render_bot_message)(message)
+                await self.client.send_message(self.chat_id, text, parse_mode='Html')
+            except Exception as e:
+                attempts = message.attempts + 1
+                await BotMessage.objects.filter(pk=message.pk).aupdate(
+                    attempts=attempts,
+                    last_error=str(e),
+                    next_attempt_at=timezone.now() + datetime.timedelta(
+                        seconds=self.retry_delay * 2 ** (attempts - 1)
+                    ),
+                )
+                return False
+            await BotMessage.objects.filter(pk=message.pk).aupdate(
+                text=text,
+                is_sent=True,
+                sent_at=timezone.now(),
+                attempts=models.F('attempts') + 1,
+                last_error=None,
+                next_attempt_at=None,
+            )
+            return True
+
+    async def dispatch_pending(self):
+        """Sends one batch of due messages. Returns the number of messages picked up."""
+        messages = await sync_to_async(self.claim_pending)()
+        results = await asyncio.gather(*(self.deliver(message) for message in messages), return_exceptions=True)
+        for message, result in zip(messages, results):
+            if isinstance(result, Exception):
+                logger.error("Failed to deliver bot message %s", message.pk, exc_info=result)
+        return len(messages)
+
+    async def run(self, poll_interval=2):
+        while True:
+            await sync_to_async(close_old_connections)()
+            if not await self.dispatch_pending():
+                await asyncio.sleep(poll_interval)
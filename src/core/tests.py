@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+from aiohttp import web
+from django.test import TransactionTestCase
+
+from src.core.enums import BotMessageType
+from src.core.models import BotMessage
+from src.core.telegram import TelegramClient, BotMessageDispatcher
+
+
+class FakeTelegram:
+    """Local Bot API server answering sendMessage with the queued responses, then with success."""
+
+    def __init__(self, responses=()):
+        self.responses = list(responses)
+        self.sent_texts = []
+
+    async def handle(self, request):
+        payload = await request.json()
+        if self.responses:
+            status, data = self.responses.pop(0)
+            return web.json_response(data, status=status)
+        self.sent_texts.append(payload['text'])
+        return web.json_response({'ok': True, 'result': {'message_id': len(self.sent_texts)}})
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.api_url = f"http://{host}:{port}/bot"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.runner.cleanup()
+
+
+def rate_limited(retry_after):
+    return 429, {'ok': False, 'description': "Too Many Requests", 'parameters': {'retry_after': retry_after}}
+
+
+def failed(status, description):
+    return status, {'ok': False, 'description': description}
+
+
+class BotMessageDispatcherTest(TransactionTestCase):
+
+    def dispatch(self, fake, dispatchers_count=1):
+        async def run():
+            async with fake, TelegramClient('token', api_url=fake.api_url, max_retries=2, backoff=0) as client:
+                dispatchers = [
+                    BotMessageDispatcher(client, chat_id=1, retry_delay=60) for _ in range(dispatchers_count)
+                ]
+                return await asyncio.gather(*(dispatcher.dispatch_pending() for dispatcher in dispatchers))
+
+        return asyncio.run(run())
+
+    def create_message(self, text="Тест"):
+        return BotMessage.objects.create(text=text, message_type=BotMessageType.TEXT)
+
+    def test_waits_retry_after_and_sends(self):
+        message = self.create_message()
+        fake = FakeTelegram([rate_limited(1)])
+
+        started_at = time.monotonic()
+        self.dispatch(fake)
+
+        message.refresh_from_db()
+        self.assertTrue(message.is_sent)
+        self.assertEqual(message.attempts, 1)
+        self.assertIsNone(message.last_error)
+        self.assertIsNotNone(message.sent_at)
+        self.assertIsNone(message.next_attempt_at)
+        self.assertEqual(fake.sent_texts, ["Тест"])
+        self.assertGreaterEqual(time.monotonic() - started_at, 1)
+
+    def test_retries_server_errors(self):
+        message = self.create_message()
+        fake = FakeTelegram([failed(502, "Bad Gateway"), failed(502, "Bad Gateway")])
+
+        self.dispatch(fake)
+
+        message.refresh_from_db()
+        self.assertTrue(message.is_sent)
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(fake.sent_texts, ["Тест"])
+
+    def test_records_failed_attempt(self):
+        message = self.create_message()
+        fake = FakeTelegram([failed(400, "Bad Request: chat not found")])
+
+        self.dispatch(fake)
+
+        message.refresh_from_db()
+        self.assertFalse(message.is_sent)
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(message.last_error, "Bad Request: chat not found")
+        self.assertIsNone(message.sent_at)
+        self.assertIsNotNone(message.next_attempt_at)
+        self.assertFalse(BotMessage.objects.pending(5).exists())
+
+    def test_concurrent_dispatchers_send_each_message_once(self):
+        for i in range(10):
+            self.create_message(f"Тест {i}")
+        fake = FakeTelegram()
+
+        picked_up = self.dispatch(fake, dispatchers_count=2)
+
+        self.assertEqual(sum(picked_up), 10)
+        self.assertEqual(sorted(fake.sent_texts), sorted(f"Тест {i}" for i in range(10)))
+        self.assertEqual(BotMessage.objects.filter(is_sent=True).count(), 10)
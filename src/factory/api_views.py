@@ -1,10 +1,7 @@
 import datetime
 
-import requests
-from django.conf import settings
 from django.db import transaction, models
-from django.db.models import Sum, Count, Subquery, OuterRef, Q, DecimalField, Case, When, F
-from django.db.models.functions import Coalesce
+from django.db.models import Sum, Count, Q, Case, When, F
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
@@ -42,48 +39,25 @@ from src.factory.serializers import (
     ProductFactoryCategorySerializer, ProductFactoryListSerializer, ProductFactoryFinishedListSerializer,
     ProductFactoryItemReturnSerializer, ProductFactoryItemReturnCreateSerializer, ProductFactoryItemWriteOffSerializer,
     ProductFactoryCategoryCreateSerializer, ProductFactoryWrittenOffSummarySerializer, ProductFactorySummarySerializer,
+    ProductFactoryItemComposeSerializer,
 )
 from src.factory.services import (
-    update_product_factory_self_price,
     delete_product_factory_item,
     create_factory_item,
-    update_factory_item, delete_product_factory_category, update_product_factory_total_price,
+    update_factory_item, delete_product_factory_category, compose_product_factory_items,
     assign_product_factory_create_compensation_to_florist, cancel_product_factory_create_compensation_to_florist,
     return_products_from_factory_item, cancel_products_return_from_factory_item, delete_factory_returns,
     write_off_product_from_factory_item, add_charge_to_product_factory, remove_charge_from_product_factory,
     write_off_product_factory, return_to_create
 )
-from src.order.enums import OrderStatus
-from src.order.models import OrderItemProductFactory
 from src.user.enums import UserType
 from src.warehouse.exceptions import NotEnoughProductInWarehouseError
+from src.warehouse.models import WarehouseProduct
 from src.warehouse.services import reload_product_from_product_factory_to_warehouse
 
 User = get_user_model()
 
 
-def send_notifications():
-    notifications = FactoryTakeApartRequest.objects.filter(is_sent=False).order_by('created_at')
-    for notification in notifications:
-        message = f"Пользователь: {notification.created_user.first_name}\n" \
-                  f"Букет #{notification.product_factory_id}"
-        inline_keyboard = [
-            [
-                {'text': 'Yes', 'callback_data': f'{notification.id}_yes'},
-                {'text': 'No', 'callback_data': f'{notification.id}_no'}
-            ]
-        ]
-        payload = {
-            'chat_id': settings.CHAT_ID,
-            'text': message,
-            'reply_markup': {'inline_keyboard': inline_keyboard}
-        }
-        requests.post(
-            url=f'{settings.TG_API_URL}7534609843:AAGan8Q_blDT_c-nNdC34ky0DG0Eiq4Xzqg/sendMessage', json=payload
-        )
-    notifications.update(is_sent=True)
-
-
 class ProductFactoryViewSet(MultiSerializerViewSetMixin, ModelViewSet):
     queryset = ProductFactory.objects.get_available()
     serializer_action_classes = {
@@ -120,6 +94,7 @@ class ProductFactoryViewSet(MultiSerializerViewSetMixin, ModelViewSet):
         qs = qs.select_related('created_user', 'finished_user', 'deleted_user', 'category__industry', 'florist')
 
         if self.action in ['retrieve']:
+            qs = qs.select_related('sold_order__salesman')
             qs = qs.prefetch_related(
                 models.Prefetch(
                     'product_factory_item_set',
@@ -199,23 +174,9 @@ class ProductFactoryViewSet(MultiSerializerViewSetMixin, ModelViewSet):
 
     def get_summary(self, request):
         qs = self.filter_queryset(self.get_queryset())
-        qs = qs.annotate(
-            order_sale_price=Coalesce(
-                Subquery(
-                    OrderItemProductFactory.objects.filter(
-                        Q(product_factory_id=OuterRef('pk'))
-                        & ~Q(order__status=OrderStatus.CANCELLED)
-                        & Q(is_returned=False)
-                    )
-                    .values('product_factory_id')
-                    .annotate(amount_sum=Sum('price', default=0))
-                    .values('amount_sum')[:1]
-                ), 0, output_field=DecimalField()
-            )
-        )
         aggregated_data = qs.aggregate(
             total_sale_price_sum=Sum(
-                Case(When(status=ProductFactoryStatus.SOLD, then=F('order_sale_price')), default=F('price')),
+                Case(When(status=ProductFactoryStatus.SOLD, then=F('sold_price')), default=F('price')),
                 default=0
             ),
             total_self_price_sum=Sum('self_price', default=0),
@@ -352,7 +313,6 @@ class ProductFactoryViewSet(MultiSerializerViewSetMixin, ModelViewSet):
 
             instance.status = ProductFactoryStatus.PENDING
             instance.save()
-            # send_notifications()
         return Response(data={"status": instance.status}, status=200)
 
     def request_return_to_create(self, request, *args, **kwargs):
@@ -373,7 +333,6 @@ class ProductFactoryViewSet(MultiSerializerViewSetMixin, ModelViewSet):
 
             instance.status = ProductFactoryStatus.PENDING
             instance.save()
-            # send_notifications()
         return Response(data={"status": instance.status}, status=200)
 
     def return_to_create(self, request, *args, **kwargs):
@@ -406,6 +365,7 @@ class ProductFactoryItemViewSet(MultiSerializerViewSetMixin, ModelViewSet):
         'create': ProductFactoryItemCreateSerializer,
         'partial_update': ProductFactoryItemUpdateSerializer,
         'write_off_product': ProductFactoryItemWriteOffSerializer,
+        'compose': ProductFactoryItemComposeSerializer,
     }
 
     def get_product_factory_obj(self):
@@ -434,12 +394,22 @@ class ProductFactoryItemViewSet(MultiSerializerViewSetMixin, ModelViewSet):
             with transaction.atomic():
                 instance = create_factory_item(product_factory, **data)
                 serializer.instance = instance
-                update_product_factory_self_price(product_factory.pk)
-                update_product_factory_total_price(product_factory.pk)
         except NotEnoughProductInWarehouseError as e:
             return Response(data={'error': str(e)}, status=400)
         return Response(data=serializer.data, status=201)
 
+    def compose(self, request, *args, **kwargs):
+        product_factory = self.get_product_factory_obj()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if product_factory.status == ProductFactoryStatus.PENDING:
+            return Response({'error': 'Букет находится в ожидании разборки'}, status=400)
+        try:
+            items = compose_product_factory_items(product_factory, serializer.validated_data['items'])
+        except (NotEnoughProductInWarehouseError, WarehouseProduct.DoesNotExist) as e:
+            return Response(data={'error': str(e.args[0])}, status=400)
+        return Response(data=ProductFactoryItemDetailSerializer(items, many=True).data, status=201)
+
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         product_factory = self.get_product_factory_obj()
@@ -454,8 +424,6 @@ class ProductFactoryItemViewSet(MultiSerializerViewSetMixin, ModelViewSet):
         try:
             with transaction.atomic():
                 update_factory_item(instance, **validated_data)
-                update_product_factory_self_price(product_factory.pk)
-                update_product_factory_total_price(product_factory.pk)
         except (NotEnoughProductInWarehouseError, NotEnoughProductInFactoryItemError) as e:
             return Response(data={'error': str(e)}, status=400)
         return Response(serializer.data, status=200)
@@ -464,9 +432,8 @@ class ProductFactoryItemViewSet(MultiSerializerViewSetMixin, ModelViewSet):
         instance: ProductFactoryItem = self.get_object()
         if instance.factory.status == ProductFactoryStatus.PENDING:
             return Response({'error': 'Букет находится в ожидании разборки'}, status=400)
-        delete_product_factory_item(instance)
-        update_product_factory_self_price(instance.factory_id)
-        update_product_factory_total_price(instance.factory_id)
+        with transaction.atomic():
+            delete_product_factory_item(instance)
         return Response(status=204)
 
     def write_off_product(self, request, *args, **kwargs):
@@ -480,8 +447,6 @@ class ProductFactoryItemViewSet(MultiSerializerViewSetMixin, ModelViewSet):
         with transaction.atomic():
             try:
                 write_off_obj = write_off_product_from_factory_item(instance, write_off_count, request.user)
-                update_product_factory_self_price(instance.factory_id)
-                update_product_factory_total_price(instance.factory_id)
             except NotEnoughProductInFactoryItemError:
                 return Response({'error': 'Недостаточно товаров для списания'}, status=400)
 
@@ -537,18 +502,13 @@ class ProductFactoryItemReturnViewSet(MultiSerializerViewSetMixin, ModelViewSet)
             with transaction.atomic():
                 product_factory_item = self.get_product_factory_item()
                 count = data.get('count')
-                return_products_from_factory_item(product_factory_item, count)
-
-                total_self_price = product_factory_item.warehouse_product.self_price * count
-                total_price = product_factory_item.price * count
+                total_self_price, total_price = return_products_from_factory_item(product_factory_item, count)
                 serializer.save(
                     factory_item=product_factory_item,
                     total_self_price=total_self_price,
                     total_price=total_price,
                     created_user=self.request.user
                 )
-                update_product_factory_self_price(product_factory_item.factory_id)
-                update_product_factory_total_price(product_factory_item.factory_id)
         except NotEnoughProductInFactoryItemError:
             return Response(data={"error": "Недостаточно товаров для возврата"}, status=400)
 
@@ -561,9 +521,6 @@ class ProductFactoryItemReturnViewSet(MultiSerializerViewSetMixin, ModelViewSet)
                 factory_item = instance.factory_item
 
                 cancel_products_return_from_factory_item(instance, request.user)
-
-                update_product_factory_self_price(factory_item.factory_id)
-                update_product_factory_total_price(factory_item.factory_id)
                 return Response(status=204)
         except NotEnoughProductInWarehouseError as e:
             return Response(data={'error': str(e)}, status=400)
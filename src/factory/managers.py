@@ -3,25 +3,10 @@ from django.db.models.functions import Coalesce
 
 from src.base.managers import FlagsQuerySet
 from src.factory.enums import ProductFactoryStatus
-from src.order.enums import OrderStatus
-from src.order.models import OrderItemProductFactory
 from src.user.enums import UserType
 
 
 class ProductFactoryQuerySet(FlagsQuerySet):
-    def with_sold_price(self):
-        return self.annotate(
-            sold_price=Coalesce(
-                models.Subquery(
-                    OrderItemProductFactory.objects.filter(product_factory_id=models.OuterRef('pk'))
-                    .filter(
-                        ~models.Q(order__status=OrderStatus.CANCELLED),
-                        models.Q(is_returned=False)
-                    ).values('price')[:1]
-                ), models.Value(0), output_field=models.DecimalField()
-            )
-        )
-
     def by_user_industry(self, user):
         if user.type == UserType.ADMIN:
             return self
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.2 on 2026-10-19 06:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_product_factory_sale(apps, schema_editor):
+    ProductFactory = apps.get_model('factory', 'ProductFactory')
+    OrderItemProductFactory = apps.get_model('order', 'OrderItemProductFactory')
+    sold_items = OrderItemProductFactory.objects.filter(
+        product_factory_id=models.OuterRef('pk'),
+        is_returned=False,
+        order__is_deleted=False,
+    ).exclude(order__status='CANCELLED').order_by('-id')
+    ProductFactory.objects.filter(status='SOLD').update(
+        sold_order_id=models.Subquery(sold_items.values('order_id')[:1]),
+        sold_price=Coalesce(
+            models.Subquery(sold_items.values('price')[:1]), models.Value(0), output_field=models.DecimalField()
+        ),
+        sold_at=models.Subquery(sold_items.values('order__created_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0036_alter_factorytakeapartrequest_request_type'),
+        ('order', '0035_remove_clientdiscountlevel_client'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productfactory',
+            name='sold_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата продажи'),
+        ),
+        migrations.AddField(
+            model_name='productfactory',
+            name='sold_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sold_product_factory_set', to='order.order', verbose_name='Заказ продажи'),
+        ),
+        migrations.AddField(
+            model_name='productfactory',
+            name='sold_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Цена продажи в заказе'),
+        ),
+        migrations.RunPython(fill_product_factory_sale, migrations.RunPython.noop),
+    ]
@@ -124,6 +124,25 @@ class ProductFactory(FlagsModel):
         blank=True,
         verbose_name="Дата списания"
     )
+    sold_order = models.ForeignKey(
+        "order.Order",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="sold_product_factory_set",
+        verbose_name="Заказ продажи"
+    )
+    sold_price = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Цена продажи в заказе"
+    )
+    sold_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Дата продажи"
+    )
     deleted_user = models.ForeignKey(
         User,
         on_delete=models.PROTECT,
@@ -1,6 +1,7 @@
+from decimal import Decimal
+
 from django.db import models
 from django.contrib.auth import get_user_model
-from django.db.models import Q
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
@@ -96,6 +97,9 @@ class ProductFactorySerializer(DynamicFieldsModelSerializer):
             'is_deleted',
             'deleted_user',
             'written_off_at',
+            'sold_order',
+            'sold_price',
+            'sold_at',
             'is_product_factory',
         )
         read_only_fields = (
@@ -107,6 +111,9 @@ class ProductFactorySerializer(DynamicFieldsModelSerializer):
             'finished_at',
             'finished_user',
             'written_off_at',
+            'sold_order',
+            'sold_price',
+            'sold_at',
             'is_deleted',
             'deleted_user'
         )
@@ -201,6 +208,15 @@ class ProductFactoryItemWriteOffSerializer(ProductFactoryItemSerializer):
         read_only_fields = ProductFactoryItemSerializer.Meta.read_only_fields + ('warehouse_product', 'count')
 
 
+class ProductFactoryItemComposeLineSerializer(serializers.Serializer):
+    warehouse_product = serializers.IntegerField()
+    count = serializers.DecimalField(max_digits=19, decimal_places=2, min_value=Decimal('0.01'))
+
+
+class ProductFactoryItemComposeSerializer(serializers.Serializer):
+    items = ProductFactoryItemComposeLineSerializer(many=True, allow_empty=False)
+
+
 class ProductFactoryDetailSerializer(ProductFactorySerializer):
     category = ProductFactoryCategorySerializer(read_only=True)
     florist = UserSerializer(read_only=True)
@@ -216,24 +232,14 @@ class ProductFactoryDetailSerializer(ProductFactorySerializer):
         fields = ProductFactorySerializer.Meta.fields + ('items', 'sold_user', 'order')
 
     def get_sold_user(self, obj: ProductFactory):
-        from src.order.models import Order
-        order = Order.objects.get_available().filter(~Q(status="CANCELLED")).filter(
-            order_item_product_factory_set__product_factory=obj
-        ).distinct().first()
-        if order:
-            serializer = UserSerializer(instance=order.salesman)
+        if obj.sold_order_id:
+            serializer = UserSerializer(instance=obj.sold_order.salesman)
             return serializer.data
         return None
 
     def get_order(self, obj: ProductFactory):
-        from src.order.models import Order
-        from src.order.serializers import OrderListSerializer
-        order = Order.objects.get_available().filter(~Q(status="CANCELLED")).filter(
-            order_item_product_factory_set__product_factory=obj
-        ).distinct().first()
-        if order:
-            serializer = OrderListSerializer(instance=order, fields=('id',))
-            return serializer.data
+        if obj.sold_order_id:
+            return {'id': obj.sold_order_id}
         return None
 
 
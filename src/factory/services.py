@@ -1,9 +1,12 @@
 from decimal import Decimal
 
-from django.db import models
+from django.db import models, transaction
 from django.db.models.functions import Coalesce
 from django.utils import timezone
+from models_logging import settings as logging_settings
 
+from src.analytics.services import mark_dirty_days
+from src.core.audit import record_changes
 from src.core.models import Settings as AppSettings
 from src.factory.enums import ProductFactorySalesType, ProductFactoryStatus, FactoryTakeApartRequestType
 from src.factory.exceptions import NotEnoughProductInFactoryItemError
@@ -18,6 +21,9 @@ from src.warehouse.services import decrease_warehouse_product_count, increase_wa
     create_warehouse_product_write_off
 
 
+FACTORY_ITEM_TOTAL_FIELDS = ('count', 'total_self_price', 'total_price')
+
+
 # ================ ProductFactory ================ #
 def update_product_factory_self_price(product_factory_id):
     ProductFactory.objects.filter(pk=product_factory_id).update(
@@ -65,6 +71,33 @@ def update_product_factory_total_price(product_factory_id):
     )
 
 
+def shift_product_factory_totals(product_factory_id, self_price_delta, price_delta):
+    """
+    Shifts the bouquet totals with ``F()`` expressions. The update bypasses post_save,
+    so the audit change and the dirty analytics days are recorded here.
+    """
+    ProductFactory.objects.filter(pk=product_factory_id).update(
+        self_price=models.F('self_price') + self_price_delta,
+        price=models.F('price') + price_delta,
+    )
+    product_factory = ProductFactory.objects.select_related('category').get(pk=product_factory_id)
+    record_changes(product_factory, {
+        'self_price': {'old': product_factory.self_price - self_price_delta, 'new': product_factory.self_price},
+        'price': {'old': product_factory.price - price_delta, 'new': product_factory.price},
+    })
+    mark_dirty_days(
+        [timezone.localdate(date) for date in [product_factory.created_at, product_factory.finished_at] if date],
+        [product_factory.category.industry_id if product_factory.category else None]
+    )
+
+
+def get_factory_item_changed_data(product_factory_item, old_values=None):
+    return {
+        field: {'old': old_values[field] if old_values else None, 'new': getattr(product_factory_item, field)}
+        for field in FACTORY_ITEM_TOTAL_FIELDS
+    }
+
+
 def write_off_product_factory(product_factory):
     if product_factory.status == ProductFactoryStatus.SOLD:
         return False, "Нельзя списать проданный товар"
@@ -100,6 +133,33 @@ def return_to_create(product_factory):
     return True, ''
 
 
+def answer_take_apart_request(take_apart_request_id, is_accepted):
+    """
+    Applies the decision on a take-apart/write-off request: an accepted request
+    runs the requested action, a rejected one restores the bouquet status.
+    """
+    actions = {
+        FactoryTakeApartRequestType.TO_CREATE: return_to_create,
+        FactoryTakeApartRequestType.WRITE_OFF: write_off_product_factory,
+    }
+    with transaction.atomic():
+        take_apart_request = FactoryTakeApartRequest.objects.select_for_update().get(pk=take_apart_request_id)
+        product_factory = ProductFactory.objects.select_for_update().get(pk=take_apart_request.product_factory_id)
+
+        if product_factory.status == ProductFactoryStatus.PENDING and is_accepted:
+            is_succeed, message = actions[take_apart_request.request_type](product_factory)
+            if not is_succeed:
+                return False, message
+        else:
+            product_factory.status = take_apart_request.initial_status
+            product_factory.save()
+
+        take_apart_request.is_accepted = is_accepted
+        take_apart_request.is_answered = True
+        take_apart_request.save()
+    return True, ''
+
+
 # ================ ProductFactoryItem ================ #
 def create_factory_item(
         factory: ProductFactory,
@@ -130,41 +190,130 @@ def handle_product_factory_item_count_change(product_factory_item: ProductFactor
         remove_products_from_factory_item(product_factory_item, diff)
 
 
+def change_product_factory_item_count(product_factory_item: ProductFactoryItem, count_delta):
+    """
+    Shifts the item count and totals by ``count_delta`` with ``F()`` expressions
+    and applies the same totals delta to the bouquet. A decrease below the
+    current item count raises ``NotEnoughProductInFactoryItemError``.
+    """
+    self_price_delta = count_delta * product_factory_item.warehouse_product.self_price
+    price_delta = count_delta * product_factory_item.price
+    items = ProductFactoryItem.objects.filter(pk=product_factory_item.pk)
+    if count_delta < 0:
+        items = items.filter(count__gte=-count_delta)
+    is_updated = items.update(
+        count=models.F('count') + count_delta,
+        total_self_price=models.F('total_self_price') + self_price_delta,
+        total_price=models.F('total_price') + price_delta,
+    )
+    if not is_updated:
+        raise NotEnoughProductInFactoryItemError
+    old_values = {field: getattr(product_factory_item, field) for field in FACTORY_ITEM_TOTAL_FIELDS}
+    product_factory_item.count += count_delta
+    product_factory_item.total_self_price += self_price_delta
+    product_factory_item.total_price += price_delta
+    record_changes(product_factory_item, get_factory_item_changed_data(product_factory_item, old_values))
+    shift_product_factory_totals(product_factory_item.factory_id, self_price_delta, price_delta)
+
+
 def add_products_to_factory_item(
         product_factory_item: ProductFactoryItem,
         product_count
 ):
-    # product_add_count = product_count if product_count else product_factory_item.count
     warehouse_product = product_factory_item.warehouse_product
-    if warehouse_product.count < product_count:
+    is_decreased = WarehouseProduct.objects.filter(pk=warehouse_product.pk, count__gte=product_count).update(
+        count=models.F('count') - product_count
+    )
+    if not is_decreased:
         raise NotEnoughProductInWarehouseError
-
-    decrease_warehouse_product_count(warehouse_product, product_count)
-    product_factory_item.count += product_count
-    product_factory_item.total_self_price = product_factory_item.count * warehouse_product.self_price
-    product_factory_item.total_price = product_factory_item.count * product_factory_item.price
-    product_factory_item.save()
+    warehouse_product.count -= product_count
+    change_product_factory_item_count(product_factory_item, product_count)
 
 
 def remove_products_from_factory_item(
         product_factory_item: ProductFactoryItem,
         product_count
 ):
-    # product_remove_count = product_count if product_count else product_factory_item.count
+    change_product_factory_item_count(product_factory_item, -product_count)
     warehouse_product = product_factory_item.warehouse_product
-    if product_factory_item.count < product_count:
-        raise NotEnoughProductInFactoryItemError
-
-    increase_warehouse_product_count(warehouse_product, product_count)
-    product_factory_item.count -= product_count
-    product_factory_item.total_self_price = product_factory_item.count * warehouse_product.self_price
-    product_factory_item.total_price = product_factory_item.count * product_factory_item.price
-    product_factory_item.save()
+    WarehouseProduct.objects.filter(pk=warehouse_product.pk).update(count=models.F('count') + product_count)
+    warehouse_product.count += product_count
 
 
 def delete_product_factory_item(product_factory_item: ProductFactoryItem):
     increase_warehouse_product_count(product_factory_item.warehouse_product, product_factory_item.count)
     product_factory_item.delete()
+    shift_product_factory_totals(
+        product_factory_item.factory_id,
+        -product_factory_item.total_self_price,
+        -product_factory_item.total_price
+    )
+
+
+def compose_product_factory_items(product_factory: ProductFactory, items: list):
+    """
+    Adds several lots to a bouquet at once. ``items`` are dicts with
+    ``warehouse_product`` (id) and ``count``; a lot already in the bouquet
+    increases its item. The lots are decremented with one UPDATE, items are
+    bulk-created/updated and the bouquet totals are shifted once.
+    """
+    with transaction.atomic():
+        counts = {}
+        for item in items:
+            counts[item['warehouse_product']] = counts.get(item['warehouse_product'], Decimal(0)) + item['count']
+
+        lots = WarehouseProduct.objects.select_for_update(of=('self',)) \
+            .select_related('product').in_bulk(counts.keys())
+        missing = [str(lot_id) for lot_id in counts if lot_id not in lots]
+        if missing:
+            raise WarehouseProduct.DoesNotExist(f"Товары со склада не найдены: {', '.join(missing)}")
+        insufficient = [lots[lot_id].product.name for lot_id, count in counts.items() if lots[lot_id].count < count]
+        if insufficient:
+            raise NotEnoughProductInWarehouseError(f"Недостаточно товаров на складе: {', '.join(insufficient)}")
+
+        WarehouseProduct.objects.filter(pk__in=counts.keys()).update(count=models.F('count') - models.Case(
+            *(models.When(pk=lot_id, then=models.Value(count)) for lot_id, count in counts.items()),
+            output_field=models.DecimalField()
+        ))
+
+        existing_items = {
+            item.warehouse_product_id: item
+            for item in ProductFactoryItem.objects.select_for_update().filter(
+                factory=product_factory, warehouse_product_id__in=counts.keys()
+            )
+        }
+        new_items = []
+        old_values = {}
+        factory_items = []
+        self_price_delta = Decimal(0)
+        price_delta = Decimal(0)
+        for lot_id, count in counts.items():
+            lot = lots[lot_id]
+            lot.count -= count
+            factory_item = existing_items.get(lot_id)
+            if factory_item is None:
+                factory_item = ProductFactoryItem(factory=product_factory, warehouse_product=lot, price=lot.sale_price)
+                new_items.append(factory_item)
+            else:
+                factory_item.warehouse_product = lot
+                old_values[lot_id] = {field: getattr(factory_item, field) for field in FACTORY_ITEM_TOTAL_FIELDS}
+            item_self_price_delta = count * lot.self_price
+            item_price_delta = count * factory_item.price
+            factory_item.count += count
+            factory_item.total_self_price += item_self_price_delta
+            factory_item.total_price += item_price_delta
+            self_price_delta += item_self_price_delta
+            price_delta += item_price_delta
+            factory_items.append(factory_item)
+
+        ProductFactoryItem.objects.bulk_create(new_items)
+        ProductFactoryItem.objects.bulk_update(existing_items.values(), FACTORY_ITEM_TOTAL_FIELDS)
+        for factory_item in new_items:
+            record_changes(factory_item, get_factory_item_changed_data(factory_item), logging_settings.ADDED)
+        for lot_id, factory_item in existing_items.items():
+            record_changes(factory_item, get_factory_item_changed_data(factory_item, old_values[lot_id]))
+        shift_product_factory_totals(product_factory.pk, self_price_delta, price_delta)
+    return factory_items
 
 
 def delete_factory_returns(factory_id, user):
@@ -234,6 +383,10 @@ def return_products_from_factory_item(product_factory_item: ProductFactoryItem,
     if remaining_count < count:
         raise NotEnoughProductInFactoryItemError
     increase_warehouse_product_count(product_factory_item.warehouse_product, count)
+    total_self_price = product_factory_item.warehouse_product.self_price * count
+    total_price = product_factory_item.price * count
+    shift_product_factory_totals(product_factory_item.factory_id, -total_self_price, -total_price)
+    return total_self_price, total_price
 
 
 def cancel_products_return_from_factory_item(product_factory_item_return: ProductFactoryItemReturn, user):
@@ -246,6 +399,11 @@ def cancel_products_return_from_factory_item(product_factory_item_return: Produc
     product_factory_item_return.is_deleted = True
     product_factory_item_return.deleted_user = user
     product_factory_item_return.save()
+    shift_product_factory_totals(
+        product_factory_item_return.factory_item.factory_id,
+        product_factory_item_return.total_self_price,
+        product_factory_item_return.total_price
+    )
 
 
 # ========================= Florist ========================= #
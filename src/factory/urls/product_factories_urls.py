@@ -129,6 +129,14 @@ urlpatterns = [
             }
         )
     ),
+    path(
+        "product-factories/<int:product_factory_id>/items/compose/",
+        api_views.ProductFactoryItemViewSet.as_view(
+            {
+                "post": "compose"
+            }
+        )
+    ),
     path(
         "product-factories/<int:product_factory_id>/items/<int:pk>/",
         api_views.ProductFactoryItemViewSet.as_view(
@@ -78,6 +78,27 @@ def income_update_total_sale_price(income_id):
     )
 
 
+def incomes_update_totals(income_ids):
+    Income.objects.filter(pk__in=income_ids).update(
+        total=Coalesce(
+            models.Subquery(
+                IncomeItem.objects.filter(income_id=models.OuterRef('pk'))
+                .values('income_id')
+                .annotate(total_sum=models.Sum('total', default=0))
+                .values('total_sum')[:1]
+            ), models.Value(0), output_field=models.DecimalField()
+        ),
+        total_sale_price=Coalesce(
+            models.Subquery(
+                IncomeItem.objects.filter(income_id=models.OuterRef('pk'))
+                .values('income_id')
+                .annotate(total_sale_price_sum=models.Sum('total_sale_price', default=0))
+                .values('total_sale_price_sum')[:1]
+            ), models.Value(0), output_field=models.DecimalField()
+        )
+    )
+
+
 def income_item_product_to_warehouse(income_item):
     warehouse_product = WarehouseProduct.objects.get(product=income_item.product)
     warehouse_product.count += income_item.count
@@ -6,6 +6,7 @@ from django.db import models, transaction
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from src.analytics.services import mark_dirty_days
 from src.core.helpers import create_action_notification
 from src.core.models import Settings as AppSettings
 from src.factory.enums import ProductFactoryStatus
@@ -396,16 +397,26 @@ def add_product_factory_to_order(order: Order, product_factory: ProductFactory):
         product_factory=product_factory,
         price=product_factory.price
     )
-    product_factory.status = ProductFactoryStatus.SOLD
-    product_factory.save()
+    set_product_factory_sold(product_factory, order_item_product_factory)
     update_order_total(order.pk)
     update_order_debt(order.pk)
     return order_item_product_factory
 
 
+def set_product_factory_sold(product_factory: ProductFactory, order_item_product_factory: OrderItemProductFactory):
+    product_factory.status = ProductFactoryStatus.SOLD
+    product_factory.sold_order_id = order_item_product_factory.order_id
+    product_factory.sold_price = order_item_product_factory.price
+    product_factory.sold_at = timezone.now()
+    product_factory.save()
+
+
 def remove_product_factory_from_order_item(order_item_product_factory: OrderItemProductFactory):
     product = order_item_product_factory.product_factory
     product.status = ProductFactoryStatus.FINISHED
+    product.sold_order = None
+    product.sold_price = 0
+    product.sold_at = None
     product.save()
 
 
@@ -413,8 +424,7 @@ def add_product_factory_to_order_item(order_item_product_factory: OrderItemProdu
     product = order_item_product_factory.product_factory
     if not product.status == ProductFactoryStatus.FINISHED:
         raise NotEnoughProductInWarehouseError
-    product.status = ProductFactoryStatus.SOLD
-    product.save()
+    set_product_factory_sold(product, order_item_product_factory)
 
 
 def delete_order_item_product_factory(order_item_product_factory: OrderItemProductFactory):
@@ -430,6 +440,8 @@ def update_order_item_product_factory(order_item_product_factory: OrderItemProdu
     order_item_product_factory.discount = order_item_product_factory.product_factory.price - price
     order_item_product_factory.price = price
     order_item_product_factory.save()
+    if not order_item_product_factory.is_returned:
+        ProductFactory.objects.filter(pk=order_item_product_factory.product_factory_id).update(sold_price=price)
     update_order_total(order_id)
     update_order_debt(order_id)
     return order_item_product_factory
@@ -466,8 +478,15 @@ def cancel_item_product_factory_return(order_item_product_factory: OrderItemProd
 
 def reload_product_factories_from_order_to_warehouse(order_id):
     active_order_items = OrderItemProductFactory.objects.filter(order_id=order_id, is_returned=False)
-    ProductFactory.objects.filter(order_item_set__in=active_order_items).update(
-        status=ProductFactoryStatus.FINISHED
+    product_factories = ProductFactory.objects.filter(order_item_set__in=active_order_items)
+    mark_dirty_days(
+        [timezone.localdate(created_at) for created_at in product_factories.values_list('created_at', flat=True)]
+    )
+    product_factories.update(
+        status=ProductFactoryStatus.FINISHED,
+        sold_order=None,
+        sold_price=0,
+        sold_at=None,
     )
 
 
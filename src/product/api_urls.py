@@ -13,6 +13,14 @@ urlpatterns = [
             }
         )
     ),
+    path(
+        "products/catalog/",
+        api_views.ProductCatalogView.as_view()
+    ),
+    path(
+        "products/scan/",
+        api_views.ProductScanView.as_view()
+    ),
     path(
         "products/composites/",
         api_views.ProductCompositeListView.as_view()
@@ -25,6 +33,14 @@ urlpatterns = [
             }
         )
     ),
+    path(
+        "products/for-sale-search/",
+        api_views.ProductViewSet.as_view(
+            {
+                "get": "search_for_sale_products",
+            }
+        )
+    ),
     path(
         "products/<int:pk>/",
         api_views.ProductViewSet.as_view(
@@ -1,8 +1,9 @@
 from django.db import models, IntegrityError
 from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag, parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework import filters
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -12,14 +13,16 @@ from src.base.api_views import MultiSerializerViewSetMixin, DestroyFlagsViewSetM
 from src.income.enums import IncomeStatus
 from src.income.models import ProviderProduct, IncomeItem
 from src.product.enums import ProductUnitType
+from src.product.filter_backends import ProductSearchFilter
 from src.product.filters import ProductFilter
 from src.product.helpers import generate_product_code
 from src.product.models import Industry, Category, Product
 from src.product.serializers import IndustrySerializer, CategorySerializer, IndustryDetailSerializer, \
     CategoryDetailSerializer, ProductCreateSerializer, ProductListSerializer, \
     CategoryCreateSerializer, ProductCompositeListSerializer, AddDeleteProviderSerializer, ProductDetailSerializer, \
-    ProductIncomeHistorySerializer
-from src.product.services import delete_industry, delete_category
+    ProductIncomeHistorySerializer, ProductScanSerializer, ProductCatalogSerializer
+from src.product.services import delete_industry, delete_category, resolve_scanned_code, get_catalog_version, \
+    get_catalog_state, get_catalog_snapshot, get_catalog_changes
 from src.user.enums import UserType
 from src.warehouse.models import WarehouseProduct
 
@@ -88,7 +91,7 @@ class ProductViewSet(MultiSerializerViewSetMixin, DestroyFlagsViewSetMixin, Mode
         'get_product_income_history': ProductIncomeHistorySerializer,
     }
     filter_backends = [
-        filters.SearchFilter,
+        ProductSearchFilter,
         DjangoFilterBackend,
     ]
     filterset_class = ProductFilter
@@ -97,8 +100,13 @@ class ProductViewSet(MultiSerializerViewSetMixin, DestroyFlagsViewSetMixin, Mode
 
     def get_queryset(self):
         qs = super().get_queryset()
-        qs = qs.prefetch_related('warehouse_products', 'category__industry', 'income_items')
-        qs = qs.get_available().with_in_stock()
+        if self.action in ['list', 'get_for_sale_products', 'search_for_sale_products']:
+            qs = qs.select_related('category__industry').annotate(
+                in_stock=models.Sum('warehouse_products__count', default=0)
+            )
+        else:
+            qs = qs.prefetch_related('warehouse_products', 'category__industry', 'income_items')
+            qs = qs.get_available().with_in_stock()
         if self.action != "get_for_sale_products" and self.request.user.type not in [UserType.SALESMAN, UserType.CASHIER]:
             qs = qs.by_user_industry(self.request.user)
         qs = qs.order_by('id')
@@ -159,6 +167,21 @@ class ProductViewSet(MultiSerializerViewSetMixin, DestroyFlagsViewSetMixin, Mode
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('search', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def search_for_sale_products(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), 100)
+        except ValueError:
+            limit = 20
+        queryset = self.filter_queryset(self.get_queryset()).filter(category__is_for_sale=True)[:limit]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
     def add_provider(self, request, *args, **kwargs):
         product = self.get_object()
         serializer = self.get_serializer(data=request.data)
@@ -201,6 +224,59 @@ class ProductCompositeListView(ListAPIView):
         return qs
 
 
+class ProductScanView(APIView):
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('code', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+        ],
+        responses={200: ProductScanSerializer}
+    )
+    def get(self, request, *args, **kwargs):
+        code = request.query_params.get('code', '').strip()
+        if not code:
+            return Response(data={'error': 'code is required'}, status=400)
+        data = resolve_scanned_code(code)
+        if not data:
+            return Response(data={'error': 'Товар не найден'}, status=404)
+        return Response(ProductScanSerializer(data).data)
+
+
+class ProductCatalogView(APIView):
+    """
+    Catalog of for-sale products for POS tills. The ETag is the catalog state (its version
+    and the rows changed shortly before it); with ``since`` only the products changed after
+    that version are returned.
+    """
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('since', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: ProductCatalogSerializer}
+    )
+    def get(self, request, *args, **kwargs):
+        version = get_catalog_version()
+        state = get_catalog_state(version)
+        etag = quote_etag(f"catalog-{state}")
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=304, headers={'ETag': etag})
+
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response(data={'error': 'since must be an integer'}, status=400)
+            products, removed = get_catalog_changes(since)
+            data = dict(version=version, is_full=False, products=products, removed=removed)
+        else:
+            data = dict(version=version, is_full=True, products=get_catalog_snapshot(state), removed=[])
+
+        serializer = ProductCatalogSerializer(data, context={'request': request})
+        return Response(serializer.data, headers={'ETag': etag})
+
+
 class ProductOptionsView(APIView):
 
     def get(self, request, *args, **kwargs):
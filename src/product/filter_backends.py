@@ -0,0 +1,51 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import models
+from django.db.models.functions import Greatest, Upper
+from rest_framework import filters
+
+from src.product.helpers import get_transliteration_variants
+
+
+class TrigramMatch(models.Func):
+    """``a % b`` of pg_trgm, served by the trigram GIN index on the same expression."""
+    arg_joiner = ' %% '
+    template = '%(expressions)s'
+    output_field = models.BooleanField()
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    Ranked product search. A product matches by code prefix, by substring of the
+    name or by trigram similarity of the name; the term is also tried in
+    Cyrillic/Latin transliteration. Results are ordered by exact code match,
+    then names starting with the term, then similarity.
+    """
+    name_field = 'name'
+    code_field = 'code'
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+
+        term = ' '.join(search_terms)
+        variants = get_transliteration_variants(term)
+        name_expression = Upper(self.name_field)
+
+        condition = models.Q(**{f'{self.code_field}__startswith': term})
+        prefix_condition = models.Q()
+        for variant in variants:
+            condition |= models.Q(**{f'{self.name_field}__icontains': variant})
+            condition |= models.Q(TrigramMatch(name_expression, models.Value(variant.upper())))
+            prefix_condition |= models.Q(**{f'{self.name_field}__istartswith': variant})
+
+        similarities = [TrigramSimilarity(name_expression, models.Value(variant.upper())) for variant in variants]
+        similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        return queryset.filter(condition).annotate(
+            search_rank=models.Case(
+                models.When(models.Q(**{self.code_field: term}), then=models.Value(2.0)),
+                models.When(prefix_condition, then=models.Value(1.0)),
+                default=models.Value(0.0),
+                output_field=models.FloatField()
+            ) + similarity
+        ).order_by('-search_rank', 'pk')
@@ -1,5 +1,56 @@
 from barcode import EAN13
+from django.db import connection
 
 
 def generate_product_code(product):
     return EAN13(str(100_000_000_000 + product.id)).get_fullcode()
+
+
+def reserve_ids(model, count):
+    """Takes ``count`` ids from the model's primary key sequence, so objects can get codes before bulk insert."""
+    if count <= 0:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            [model._meta.db_table, model._meta.pk.column, count]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'zh', 'з': 'z', 'и': 'i',
+    'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't',
+    'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y', 'ь': '',
+    'э': 'e', 'ю': 'yu', 'я': 'ya', 'ў': "o'", 'қ': 'q', 'ғ': "g'", 'ҳ': 'h',
+}
+LATIN_TO_CYRILLIC = {
+    'sch': 'щ', 'sh': 'ш', 'ch': 'ч', 'zh': 'ж', 'ts': 'ц', 'kh': 'х', 'yo': 'ё', 'yu': 'ю', 'ya': 'я',
+    "o'": 'ў', "g'": 'ғ', 'a': 'а', 'b': 'б', 'c': 'ц', 'd': 'д', 'e': 'е', 'f': 'ф', 'g': 'г', 'h': 'х',
+    'i': 'и', 'j': 'ж', 'k': 'к', 'l': 'л', 'm': 'м', 'n': 'н', 'o': 'о', 'p': 'п', 'q': 'к', 'r': 'р',
+    's': 'с', 't': 'т', 'u': 'у', 'v': 'в', 'w': 'в', 'x': 'х', 'y': 'й', 'z': 'з',
+}
+
+
+def transliterate(text, mapping):
+    max_length = max(len(key) for key in mapping)
+    result = []
+    i = 0
+    while i < len(text):
+        for length in range(max_length, 0, -1):
+            chunk = text[i:i + length]
+            if chunk in mapping:
+                result.append(mapping[chunk])
+                i += length
+                break
+        else:
+            result.append(text[i])
+            i += 1
+    return ''.join(result)
+
+
+def get_transliteration_variants(text):
+    """Returns the lowercased text and its Cyrillic/Latin transliterations without duplicates."""
+    text = text.lower()
+    variants = [text, transliterate(text, CYRILLIC_TO_LATIN), transliterate(text, LATIN_TO_CYRILLIC)]
+    return list(dict.fromkeys(variant for variant in variants if variant))
@@ -0,0 +1,83 @@
+# Generated by Django 5.0.2 on 2026-10-19 06:42
+
+from django.db import migrations, models
+
+# Every change of a product row, of its category or of its warehouse stock stamps the
+# product with the next value of one sequence, so POS tills can fetch "changes since N".
+# Triggers are used because stock is mostly changed with QuerySet.update().
+CATALOG_VERSION_SQL = """
+CREATE SEQUENCE product_catalog_version_seq;
+
+CREATE FUNCTION product_set_catalog_version() RETURNS trigger AS $$
+BEGIN
+    NEW.catalog_version := nextval('product_catalog_version_seq');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_catalog_version
+    BEFORE INSERT OR UPDATE ON product_product
+    FOR EACH ROW EXECUTE FUNCTION product_set_catalog_version();
+
+CREATE FUNCTION product_touch_catalog_version_by_stock() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.count = OLD.count AND NEW.product_id = OLD.product_id THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE product_product SET catalog_version = 0 WHERE id = OLD.product_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND (TG_OP = 'INSERT' OR NEW.product_id <> OLD.product_id) THEN
+        UPDATE product_product SET catalog_version = 0 WHERE id = NEW.product_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER warehouse_product_catalog_version
+    AFTER INSERT OR DELETE OR UPDATE OF count, product_id ON warehouse_warehouseproduct
+    FOR EACH ROW EXECUTE FUNCTION product_touch_catalog_version_by_stock();
+
+CREATE FUNCTION product_touch_catalog_version_by_category() RETURNS trigger AS $$
+BEGIN
+    IF NEW.name = OLD.name AND NEW.is_for_sale = OLD.is_for_sale AND NEW.is_deleted = OLD.is_deleted THEN
+        RETURN NULL;
+    END IF;
+    UPDATE product_product SET catalog_version = 0 WHERE category_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER category_catalog_version
+    AFTER UPDATE OF name, is_for_sale, is_deleted ON product_category
+    FOR EACH ROW EXECUTE FUNCTION product_touch_catalog_version_by_category();
+
+UPDATE product_product SET catalog_version = 0;
+"""
+
+DROP_CATALOG_VERSION_SQL = """
+DROP TRIGGER category_catalog_version ON product_category;
+DROP FUNCTION product_touch_catalog_version_by_category();
+DROP TRIGGER warehouse_product_catalog_version ON warehouse_warehouseproduct;
+DROP FUNCTION product_touch_catalog_version_by_stock();
+DROP TRIGGER product_catalog_version ON product_product;
+DROP FUNCTION product_set_catalog_version();
+DROP SEQUENCE product_catalog_version_seq;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0016_product_name_trgm_index'),
+        ('warehouse', '0007_alter_warehouseproduct_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='catalog_version',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Версия в каталоге'),
+        ),
+        migrations.RunSQL(CATALOG_VERSION_SQL, DROP_CATALOG_VERSION_SQL),
+    ]
@@ -1,5 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.validators import MaxValueValidator
 from django.db import models
+from django.db.models.functions import Upper
 
 from src.base.models import FlagsModel
 from src.product.enums import ProductUnitType
@@ -103,6 +105,13 @@ class Product(FlagsModel):
         null=True,
         verbose_name='Фото'
     )
+    # Set by database triggers on every change of the product, its category or its stock
+    catalog_version = models.BigIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        verbose_name="Версия в каталоге"
+    )
 
     objects = ProductQuerySet.as_manager()
 
@@ -110,6 +119,9 @@ class Product(FlagsModel):
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
         ordering = ['id']
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='product_name_trgm_idx'),
+        ]
 
     def __str__(self):
         return self.name
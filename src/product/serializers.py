@@ -1,3 +1,4 @@
+from django.core.files.storage import default_storage
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
@@ -140,3 +141,38 @@ class AddDeleteProviderSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProviderProduct
         fields = ('id', 'provider')
+
+
+class ProductScanSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    code = serializers.CharField()
+    price = serializers.DecimalField(max_digits=19, decimal_places=2)
+    in_stock = serializers.DecimalField(max_digits=19, decimal_places=2)
+    is_available = serializers.BooleanField()
+    is_product_factory = serializers.BooleanField()
+    status = serializers.CharField(allow_null=True)
+
+
+class ProductCatalogItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    code = serializers.CharField(allow_null=True)
+    price = serializers.DecimalField(max_digits=19, decimal_places=2)
+    in_stock = serializers.DecimalField(max_digits=19, decimal_places=2)
+    category = serializers.IntegerField(source='category_id')
+    image = serializers.SerializerMethodField()
+
+    def get_image(self, obj):
+        if not obj['image']:
+            return None
+        url = default_storage.url(obj['image'])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class ProductCatalogSerializer(serializers.Serializer):
+    version = serializers.IntegerField()
+    is_full = serializers.BooleanField()
+    products = ProductCatalogItemSerializer(many=True)
+    removed = serializers.ListField(child=serializers.IntegerField())
@@ -1,5 +1,25 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import models
+
+from src.factory.enums import ProductFactoryStatus
+from src.factory.models import ProductFactory
 from src.product.models import Product, Category
 
+SCAN_CODES_VERSION_KEY = 'product:scan_codes:version'
+CATALOG_SNAPSHOT_CACHE_KEY = 'product:catalog:{state}'
+# Short, because a snapshot may still miss changes committed late within the overlap window
+CATALOG_SNAPSHOT_CACHE_TIMEOUT = 10
+CATALOG_FIELDS = ('id', 'name', 'code', 'price', 'category_id', 'image')
+# Versions are taken when a row changes but become visible on commit, so a delta
+# also re-sends this many versions before ``since`` to cover concurrent transactions
+CATALOG_CHANGES_OVERLAP = 100
+
+# code -> (is_product_factory, id) resolved by this process, valid for _scan_codes_version
+_scan_codes = {}
+_scan_codes_version = None
+
 
 def delete_industry(industry):
     industry.is_deleted = True
@@ -15,3 +35,145 @@ def delete_category(category):
     category.save()
     products = Product.objects.filter(category=category)
     products.update(is_deleted=True)
+
+
+# ================ Scan ================ #
+def get_scan_codes_version():
+    version = cache.get(SCAN_CODES_VERSION_KEY)
+    if version is None:
+        cache.add(SCAN_CODES_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(SCAN_CODES_VERSION_KEY)
+    return version
+
+
+def invalidate_scan_codes():
+    cache.set(SCAN_CODES_VERSION_KEY, uuid.uuid4().hex, None)
+    _scan_codes.clear()
+
+
+def get_scan_product(product_id, code):
+    return Product.objects.get_available().select_related('category').filter(pk=product_id, code=code).annotate(
+        in_stock=models.Sum('warehouse_products__count', default=0)
+    ).first()
+
+
+def get_scan_product_factory(product_factory_id, code):
+    return ProductFactory.objects.get_available().select_related('category') \
+        .filter(pk=product_factory_id, product_code=code).first()
+
+
+def find_scan_target(code):
+    product_id = Product.objects.get_available().filter(code=code).values_list('pk', flat=True).first()
+    if product_id:
+        return False, product_id
+    product_factory_id = ProductFactory.objects.get_available().filter(product_code=code) \
+        .values_list('pk', flat=True).first()
+    if product_factory_id:
+        return True, product_factory_id
+    return None
+
+
+def get_scan_data(obj, is_product_factory):
+    if is_product_factory:
+        is_available = obj.status == ProductFactoryStatus.FINISHED
+        return dict(
+            id=obj.pk,
+            name=obj.name,
+            code=obj.product_code,
+            price=obj.price,
+            in_stock=1 if is_available else 0,
+            is_available=is_available,
+            is_product_factory=True,
+            status=obj.status,
+        )
+    return dict(
+        id=obj.pk,
+        name=obj.name,
+        code=obj.code,
+        price=obj.price,
+        in_stock=obj.in_stock,
+        is_available=obj.in_stock > 0 and obj.category.is_for_sale,
+        is_product_factory=False,
+        status=None,
+    )
+
+
+def resolve_scanned_code(code):
+    """
+    Resolves a scanned barcode to a product or a bouquet. Only the code -> id
+    mapping is kept in the process, the row with its price and stock is
+    always read by primary key, and a stale mapping falls back to the lookup
+    by the (unique, indexed) code columns.
+    """
+    global _scan_codes_version
+    version = get_scan_codes_version()
+    if version != _scan_codes_version:
+        _scan_codes.clear()
+        _scan_codes_version = version
+
+    getters = {False: get_scan_product, True: get_scan_product_factory}
+    target = _scan_codes.get(code)
+    if target:
+        obj = getters[target[0]](target[1], code)
+        if obj:
+            return get_scan_data(obj, target[0])
+        _scan_codes.pop(code, None)
+
+    target = find_scan_target(code)
+    if not target:
+        return None
+    obj = getters[target[0]](target[1], code)
+    if not obj:
+        return None
+    _scan_codes[code] = target
+    return get_scan_data(obj, target[0])
+
+
+# ================ Catalog ================ #
+def get_catalog_version():
+    return Product.objects.aggregate(version=models.Max('catalog_version', default=0))['version']
+
+
+def get_catalog_state(version):
+    """
+    Tags the committed catalog at ``version``. A transaction that took a lower version
+    and committed after a higher one does not move the version, but it changes the
+    count or the versions of the rows within the overlap window.
+    """
+    recent = Product.objects.filter(catalog_version__gt=version - CATALOG_CHANGES_OVERLAP).aggregate(
+        count=models.Count('id'),
+        versions_sum=models.Sum('catalog_version', default=0)
+    )
+    return f"{version}-{recent['count']}-{recent['versions_sum']}"
+
+
+def get_catalog_rows(queryset):
+    return list(
+        queryset.annotate(in_stock=models.Sum('warehouse_products__count', default=0))
+        .order_by('id').values(*CATALOG_FIELDS, 'in_stock')
+    )
+
+
+def get_catalog_snapshot(state):
+    """
+    Returns all for-sale products. The list is cached briefly per catalog state, so
+    tills reloading an unchanged catalog together do not all reach the database.
+    """
+    return cache.get_or_set(
+        CATALOG_SNAPSHOT_CACHE_KEY.format(state=state),
+        lambda: get_catalog_rows(Product.objects.get_available().filter(category__is_for_sale=True)),
+        CATALOG_SNAPSHOT_CACHE_TIMEOUT
+    )
+
+
+def get_catalog_changes(since):
+    """
+    Returns products changed after version ``since``: the ones still for sale
+    and the ids of the ones that were deleted or taken out of sale.
+    """
+    changed = Product.objects.filter(catalog_version__gt=since - CATALOG_CHANGES_OVERLAP)
+    available = changed.filter(is_deleted=False, category__is_deleted=False, category__is_for_sale=True)
+    products = get_catalog_rows(available)
+    available_ids = {product['id'] for product in products}
+    removed = [product_id for product_id in changed.values_list('id', flat=True) if product_id not in available_ids]
+    return products, removed
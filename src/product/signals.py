@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from src.product.models import Product
+from src.product.services import invalidate_scan_codes
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_scan_codes(sender, **kwargs):
+    transaction.on_commit(invalidate_scan_codes)
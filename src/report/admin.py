@@ -1,3 +1,14 @@
 from django.contrib import admin
 
-# Register your models here.
+from src.report.models import DailySummary, DailyOutlaySummary
+
+
+class DailyOutlaySummaryInline(admin.TabularInline):
+    model = DailyOutlaySummary
+    extra = 0
+
+
+@admin.register(DailySummary)
+class DailySummaryAdmin(admin.ModelAdmin):
+    list_display = ['date', 'orders_count', 'sale_sum', 'self_price_sum', 'outlay_sum', 'updated_at']
+    inlines = [DailyOutlaySummaryInline]
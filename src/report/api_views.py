@@ -8,15 +8,19 @@ from django.db.models import QuerySet, Sum, F
 from django.db.models.functions import Coalesce
 from django.http import FileResponse
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import filters
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView, RetrieveAPIView, get_object_or_404
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ViewSet
 
+from src.analytics.enums import AnalyticsComparison
+from src.analytics.services import get_comparison_range, get_comparison_data, COMPARISON_DATE_FORMAT
 from src.base.api_views import CustomPagination
 from src.core.helpers import try_parsing_date
 from src.factory.enums import ProductFactoryStatus, ProductFactorySalesType
@@ -2297,13 +2301,48 @@ class OrderItemsReport(DateTimeRangeFilterMixin, IndustryFilterMixin, ExportDisa
 # =================== OverallReport =================== #
 class OverallReportView(DateTimeRangeFilterMixin, IndustryFilterMixin, APIView):
 
-    def get_order_items(self):
+    def get_compare_to(self):
+        compare_to = self.request.query_params.get('compare_to') or None
+        if compare_to and compare_to not in AnalyticsComparison.values:
+            raise ValidationError({'compare_to': f"Допустимые значения: {', '.join(AnalyticsComparison.values)}"})
+        return compare_to
+
+    @cached_property
+    def windows(self):
+        """The requested range and, with compare_to, the range it is compared to."""
         start_date, end_date = self.get_start_end_dates()
+        windows = {'current': (start_date, end_date)}
+        compare_to = self.get_compare_to()
+        if compare_to:
+            windows['previous'] = get_comparison_range(start_date, end_date, compare_to)
+        return windows
+
+    def get_window_filter(self, date_field, window):
+        start_date, end_date = self.windows[window]
+        return models.Q(**{f'{date_field}__gte': start_date}) & models.Q(**{f'{date_field}__lte': end_date})
+
+    def get_windows_filter(self, date_field):
+        windows_filter = models.Q()
+        for window in self.windows:
+            windows_filter |= self.get_window_filter(date_field, window)
+        return windows_filter
+
+    def aggregate_windows(self, queryset, date_field, **expressions):
+        """Sums every expression for every window in one query, the result is keyed by window."""
+        result = queryset.aggregate(**{
+            f'{name}__{window}': Sum(expression, filter=self.get_window_filter(date_field, window), default=0)
+            for window in self.windows for name, expression in expressions.items()
+        })
+        return {
+            window: {name: result[f'{name}__{window}'] for name in expressions}
+            for window in self.windows
+        }
+
+    def get_order_items(self):
         industries = self.request.query_params.getlist('industry')
         clients = self.request.query_params.getlist('client')
         order_items = OrderItem.objects.filter(
-            models.Q(order__created_at__gte=start_date)
-            & models.Q(order__created_at__lte=end_date)
+            self.get_windows_filter('order__created_at')
             & ~models.Q(order__status=OrderStatus.CANCELLED)
             & models.Q(order__is_deleted=False)
         )
@@ -2321,12 +2360,10 @@ class OverallReportView(DateTimeRangeFilterMixin, IndustryFilterMixin, APIView):
         return order_items
 
     def get_order_item_product_factories(self):
-        start_date, end_date = self.get_start_end_dates()
         industries = self.request.query_params.getlist('industry')
         clients = self.request.query_params.getlist('client')
         order_items = OrderItemProductFactory.objects.filter(
-            models.Q(order__created_at__gte=start_date)
-            & models.Q(order__created_at__lte=end_date)
+            self.get_windows_filter('order__created_at')
             & ~models.Q(order__status=OrderStatus.CANCELLED)
             & models.Q(order__is_deleted=False)
             & models.Q(is_returned=False)
@@ -2352,19 +2389,13 @@ class OverallReportView(DateTimeRangeFilterMixin, IndustryFilterMixin, APIView):
         return orders
 
     def get_worker_incomes(self):
-        start_date, end_date = self.get_start_end_dates()
-        return WorkerIncomes.objects.filter(
-            models.Q(created_at__gte=start_date)
-            & models.Q(created_at__lte=end_date)
-        )
+        return WorkerIncomes.objects.filter(self.get_windows_filter('created_at'))
 
     def get_product_write_offs(self):
-        start_date, end_date = self.get_start_end_dates()
         industries = self.request.query_params.getlist('industry')
 
         product_write_offs = WarehouseProductWriteOff.objects.get_available().filter(
-            models.Q(created_at__gte=start_date)
-            & models.Q(created_at__lte=end_date)
+            self.get_windows_filter('created_at')
             & models.Q(warehouse_product__product__is_deleted=False)
         )
         if industries and industries != []:
@@ -2373,12 +2404,10 @@ class OverallReportView(DateTimeRangeFilterMixin, IndustryFilterMixin, APIView):
         return product_write_offs
 
     def get_factory_write_offs(self):
-        start_date, end_date = self.get_start_end_dates()
         industries = self.request.query_params.getlist('industry')
 
         factory_write_offs = ProductFactory.objects.get_available().filter(
-            models.Q(created_at__gte=start_date)
-            & models.Q(created_at__lte=end_date)
+            self.get_windows_filter('created_at')
             & models.Q(status=ProductFactoryStatus.WRITTEN_OFF)
         )
         if industries and industries != []:
@@ -2386,10 +2415,8 @@ class OverallReportView(DateTimeRangeFilterMixin, IndustryFilterMixin, APIView):
         return factory_write_offs
 
     def get_payments(self):
-        start_date, end_date = self.get_start_end_dates()
         return Payment.objects.get_available().filter(
-            models.Q(created_at__gte=start_date)
-            & models.Q(created_at__lte=end_date)
+            self.get_windows_filter('created_at')
             & models.Q(payment_type=PaymentType.OUTCOME)
         )
 
@@ -2404,68 +2431,67 @@ class OverallReportView(DateTimeRangeFilterMixin, IndustryFilterMixin, APIView):
                               description="End date in DD.MM.YYYY format"),
             openapi.Parameter('industry', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING),
             openapi.Parameter('client', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('compare_to', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=AnalyticsComparison.values),
         ]
     )
     def get(self, request, *args, **kwargs):
         order_items = self.get_order_items()
         order_items_product_factories = self.get_order_item_product_factories()
         orders = self.get_orders(order_items, order_items_product_factories)
-        product_write_offs = self.get_product_write_offs()
-        factory_write_offs = self.get_factory_write_offs()
-        worker_incomes = self.get_worker_incomes()
-        payments = self.get_payments()
 
-        order_items_aggs = order_items.aggregate(
-            total_sale_sum=Sum(F('total') - F('returned_total_sum'), default=0),
-            total_self_price_sum=Sum('total_self_price', default=0),
+        order_items_aggs = self.aggregate_windows(
+            order_items, 'order__created_at',
+            total_sale_sum=F('total') - F('returned_total_sum'),
+            total_self_price_sum=F('total_self_price'),
         )
-        order_items_factories_aggs = order_items_product_factories.aggregate(
-            total_sale_sum=Sum(F('price') - F('returned_total_sum'), default=0),
-            total_self_price_sum=Sum('total_self_price', default=0),
-        )
-
-        order_aggs = orders.aggregate(total_debt=Sum(F('debt'), default=0))
-
-        product_write_offs_aggs = product_write_offs.aggregate(
-            total_self_price=Sum(F('count') * F('warehouse_product__self_price'), default=0)
+        order_items_factories_aggs = self.aggregate_windows(
+            order_items_product_factories, 'order__created_at',
+            total_sale_sum=F('price') - F('returned_total_sum'),
+            total_self_price_sum=F('total_self_price'),
         )
-        factory_write_offs_aggs = factory_write_offs.aggregate(
-            total_self_price=Sum('self_price', default=0)
+        order_aggs = self.aggregate_windows(orders, 'created_at', total_debt=F('debt'))
+        product_write_offs_aggs = self.aggregate_windows(
+            self.get_product_write_offs(), 'created_at',
+            total_self_price=F('count') * F('warehouse_product__self_price')
         )
-
-        worker_incomes_aggs = worker_incomes.aggregate(
-            total_sum=Sum(
-                models.Case(
-                    models.When(income_type=WorkerIncomeType.INCOME, then=F('total')),
-                    models.When(income_type=WorkerIncomeType.OUTCOME, then=-F('total')),
-                    default=0, output_field=models.DecimalField()
-                ),
-                default=0
+        worker_incomes_aggs = self.aggregate_windows(
+            self.get_worker_incomes(), 'created_at',
+            total_sum=models.Case(
+                models.When(income_type=WorkerIncomeType.INCOME, then=F('total')),
+                models.When(income_type=WorkerIncomeType.OUTCOME, then=-F('total')),
+                default=0, output_field=models.DecimalField()
             )
         )
-
-        payments_aggs = payments.aggregate(
-            total_sum=Sum('amount', default=0)
-        )
-
-        total_sale_sum = order_items_aggs['total_sale_sum'] + order_items_factories_aggs['total_sale_sum']
-        total_self_price_sum = order_items_aggs['total_self_price_sum'] \
-                               + order_items_factories_aggs['total_self_price_sum']
-        total_debt_sum = order_aggs['total_debt']
-        total_write_off_sum = product_write_offs_aggs['total_self_price'] + 0
-        worker_incomes_sum = worker_incomes_aggs['total_sum']
-        outlay_total_sum = payments_aggs['total_sum']
-        total_profit_sum = total_sale_sum - total_self_price_sum - outlay_total_sum
-
-        summary_data = {
-            "total_sale_sum": total_sale_sum,
-            "total_self_price_sum": total_self_price_sum,
-            "total_profit_sum": total_profit_sum,
-            "total_debt_sum": total_debt_sum,
-            "total_write_off_sum": total_write_off_sum,
-            "worker_incomes_sum": worker_incomes_sum,
-            "outlay_total_sum": outlay_total_sum,
-        }
-
-        serializer = OverallReportSerializer(instance=summary_data)
-        return Response(data=serializer.data)
+        payments_aggs = self.aggregate_windows(self.get_payments(), 'created_at', total_sum=F('amount'))
+
+        summaries = {}
+        for window in self.windows:
+            total_sale_sum = order_items_aggs[window]['total_sale_sum'] \
+                             + order_items_factories_aggs[window]['total_sale_sum']
+            total_self_price_sum = order_items_aggs[window]['total_self_price_sum'] \
+                                   + order_items_factories_aggs[window]['total_self_price_sum']
+            outlay_total_sum = payments_aggs[window]['total_sum']
+            summaries[window] = {
+                "total_sale_sum": total_sale_sum,
+                "total_self_price_sum": total_self_price_sum,
+                "total_profit_sum": total_sale_sum - total_self_price_sum - outlay_total_sum,
+                "total_debt_sum": order_aggs[window]['total_debt'],
+                "total_write_off_sum": product_write_offs_aggs[window]['total_self_price'],
+                "worker_incomes_sum": worker_incomes_aggs[window]['total_sum'],
+                "outlay_total_sum": outlay_total_sum,
+            }
+
+        data = OverallReportSerializer(instance=summaries['current']).data
+        if 'previous' in summaries:
+            start_date, end_date = self.windows['previous']
+            comparison = get_comparison_data(summaries['current'], summaries['previous'])
+            data['comparison'] = {
+                'compare_to': self.get_compare_to(),
+                'start_date': timezone.localtime(start_date).strftime(COMPARISON_DATE_FORMAT),
+                'end_date': timezone.localtime(end_date).strftime(COMPARISON_DATE_FORMAT),
+                'previous': OverallReportSerializer(instance=comparison['previous']).data,
+                'delta': OverallReportSerializer(instance=comparison['delta']).data,
+                'percentage': comparison['percentage'],
+            }
+        return Response(data=data)
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.2 on 2026-10-19 06:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('payment', '0022_paymentmethod_is_active'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Кол-во продаж')),
+                ('sale_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма продаж')),
+                ('self_price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма себестоимости')),
+                ('debt_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма долга')),
+                ('write_off_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма списаний товаров')),
+                ('outlay_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма расходов')),
+                ('factory_shop_sale_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма продаж букетов (магазин)')),
+                ('factory_celebration_sale_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма продаж букетов (табрик)')),
+                ('flowers_shop_sale_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма продаж цветов (магазин)')),
+                ('flowers_shop_self_price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Себестоимость продаж цветов (магазин)')),
+                ('flowers_celebration_sale_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма продаж цветов (табрик)')),
+                ('flowers_celebration_self_price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Себестоимость продаж цветов (табрик)')),
+                ('flowers_debt_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма долга (цветы)')),
+                ('flowers_write_off_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма списаний (цветы)')),
+                ('worker_income_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма начислений сотрудникам')),
+                ('salesmen_income_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма начислений продавцам')),
+                ('florist_income_sum', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма начислений флористам')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата расчета')),
+            ],
+            options={
+                'verbose_name': 'Сводка за день',
+                'verbose_name_plural': 'Сводки за день',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyOutlaySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=19, verbose_name='Сумма')),
+                ('outlay', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='payment.outlay', verbose_name='Причина расхода')),
+                ('summary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outlays', to='report.dailysummary', verbose_name='Сводка')),
+            ],
+            options={
+                'verbose_name': 'Расходы за день',
+                'verbose_name_plural': 'Расходы за день',
+                'unique_together': {('summary', 'outlay')},
+            },
+        ),
+    ]
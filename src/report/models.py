@@ -1,3 +1,149 @@
 from django.db import models
 
-# Create your models here.
+
+class DailySummary(models.Model):
+    date = models.DateField(
+        unique=True,
+        verbose_name="Дата"
+    )
+    orders_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Кол-во продаж"
+    )
+    sale_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма продаж"
+    )
+    self_price_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма себестоимости"
+    )
+    debt_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма долга"
+    )
+    write_off_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма списаний товаров"
+    )
+    outlay_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма расходов"
+    )
+    factory_shop_sale_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма продаж букетов (магазин)"
+    )
+    factory_celebration_sale_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма продаж букетов (табрик)"
+    )
+    flowers_shop_sale_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма продаж цветов (магазин)"
+    )
+    flowers_shop_self_price_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Себестоимость продаж цветов (магазин)"
+    )
+    flowers_celebration_sale_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма продаж цветов (табрик)"
+    )
+    flowers_celebration_self_price_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Себестоимость продаж цветов (табрик)"
+    )
+    flowers_debt_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма долга (цветы)"
+    )
+    flowers_write_off_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма списаний (цветы)"
+    )
+    worker_income_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма начислений сотрудникам"
+    )
+    salesmen_income_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма начислений продавцам"
+    )
+    florist_income_sum = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма начислений флористам"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата расчета"
+    )
+
+    class Meta:
+        verbose_name = "Сводка за день"
+        verbose_name_plural = "Сводки за день"
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}"
+
+
+class DailyOutlaySummary(models.Model):
+    summary = models.ForeignKey(
+        "report.DailySummary",
+        on_delete=models.CASCADE,
+        related_name="outlays",
+        verbose_name="Сводка"
+    )
+    outlay = models.ForeignKey(
+        "payment.Outlay",
+        on_delete=models.CASCADE,
+        related_name="daily_summaries",
+        verbose_name="Причина расхода"
+    )
+    amount = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма"
+    )
+
+    class Meta:
+        verbose_name = "Расходы за день"
+        verbose_name_plural = "Расходы за день"
+        unique_together = ['summary', 'outlay']
+
+    def __str__(self):
+        return f"{self.summary} - {self.outlay}"
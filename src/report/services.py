@@ -1,22 +1,28 @@
+import datetime
 from collections import defaultdict
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Case, When, Q, Exists, OuterRef
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from src.analytics.enums import WorkerKPIRole
+from src.analytics.models import DailyWorkerKPI
+from src.analytics.services import split_by_whole_days, ensure_daily_facts, get_worker_kpi_value, get_outlay_totals, \
+    lock_days, DAILY_SUMMARY_LOCK
 from src.factory.enums import ProductFactoryStatus
 from src.factory.models import ProductFactoryItemReturn, ProductFactoryItem, ProductFactory
 from src.income.enums import IncomeStatus
 from src.income.models import IncomeItem, Income
 from src.order.enums import OrderStatus
-from src.order.models import OrderItemProductReturn, OrderItem, Order, OrderItemProductFactory
+from src.order.models import OrderItemProductReturn, OrderItem, Order, OrderItemProductFactory, Client
 from src.payment.enums import PaymentType
 from src.payment.models import Payment
 from src.product.models import Product
-from src.user.enums import WorkerIncomeType, UserType
+from src.report.models import DailySummary, DailyOutlaySummary
+from src.user.enums import WorkerIncomeType, UserType, WorkerIncomeReason
 from src.user.models import WorkerIncomes
 from src.warehouse.models import WarehouseProductWriteOff
 
@@ -365,7 +371,7 @@ def get_orders_total_sum(start_date, end_date):
 
 def get_orders_count(start_date, end_date):
     orders_subquery = (
-        Order.objects.filter(
+        Order.objects.get_available().filter(
             salesman_id=OuterRef('pk'),
             status=OrderStatus.COMPLETED,
             created_at__gte=start_date,
@@ -469,12 +475,9 @@ def get_salesman_list(request, industry, start_date, end_date):
     salesman_list = salesman_list.select_related('industry')
     if industry and industry not in [[], ['']]:
         salesman_list = salesman_list.filter(industry__in=industry)
-    salesman_list = salesman_list.annotate(
-        orders_count=get_orders_count(start_date, end_date),
-        order_total_sum=get_orders_total_sum(start_date, end_date),
-        income_sum=get_income_sum(start_date, end_date),
-        payment_sum=get_payment_sum(start_date, end_date),
-    )
+    salesman_list = salesman_list.annotate(**get_worker_kpi_annotations(
+        start_date, end_date, ['orders_count', 'order_total_sum', 'income_sum', 'payment_sum']
+    ))
     return salesman_list
 
 
@@ -510,7 +513,7 @@ def get_other_worker_list(request, start_date, end_date):
     )
     workers = workers.annotate(
         # income_sum=get_income_sum(start_date, end_date),
-        payment_sum=get_payment_sum(start_date, end_date),
+        **get_worker_kpi_annotations(start_date, end_date, ['payment_sum'])
     )
     return workers
 
@@ -550,14 +553,10 @@ def get_florist_list(request, start_date, end_date, industry):
     )
     if industry:
         florist = florist.filter(industry__in=industry)
-    return florist.annotate(
-        sold_product_count=get_factory_products_count(start_date, end_date, [ProductFactoryStatus.SOLD]),
-        finished_product_count=get_factory_products_count(
-            start_date, end_date, [ProductFactoryStatus.FINISHED, ProductFactoryStatus.PENDING]),
-        written_off_product_count=get_factory_products_count(start_date, end_date, [ProductFactoryStatus.WRITTEN_OFF]),
-        income_sum=get_income_sum(start_date, end_date),
-        payment_sum=get_payment_sum(start_date, end_date),
-    )
+    return florist.annotate(**get_worker_kpi_annotations(
+        start_date, end_date,
+        ['sold_product_count', 'finished_product_count', 'written_off_product_count', 'income_sum', 'payment_sum']
+    ))
 
 
 def get_florist_product_factories(florist, status, start_date, end_date):
@@ -592,18 +591,52 @@ def get_worker_list(start_date, end_date, industry):
 
     if industry and industry not in [[], ['']]:
         workers_list = workers_list.filter(industry__in=industry)
-    workers_list = workers_list.annotate(
-        orders_count=get_orders_count(start_date, end_date),
-        order_total_sum=get_orders_total_sum(start_date, end_date),
-        sold_product_count=get_factory_products_count(start_date, end_date, [ProductFactoryStatus.SOLD]),
-        finished_product_count=get_factory_products_count(start_date, end_date, [ProductFactoryStatus.FINISHED,
-                                                                                 ProductFactoryStatus.PENDING]),
-        written_off_product_count=get_factory_products_count(start_date, end_date, [ProductFactoryStatus.WRITTEN_OFF]),
-        income_sum=get_income_sum(start_date, end_date),
-        payment_sum=get_payment_sum(start_date, end_date),
-    )
-
-    return workers_list
+    return workers_list.annotate(**get_worker_kpi_annotations(start_date, end_date))
+
+
+WORKER_REPORT_KPI_FIELDS = {
+    'orders_count': (WorkerKPIRole.SALESMAN, 'orders_count'),
+    'order_total_sum': (WorkerKPIRole.SALESMAN, 'sales_sum'),
+    'sold_product_count': (WorkerKPIRole.EMPLOYEE, 'bouquets_sold'),
+    'finished_product_count': (WorkerKPIRole.EMPLOYEE, 'bouquets_finished'),
+    'written_off_product_count': (WorkerKPIRole.EMPLOYEE, 'written_off'),
+    'income_sum': (WorkerKPIRole.EMPLOYEE, 'incomes'),
+    'payment_sum': (WorkerKPIRole.EMPLOYEE, 'payments'),
+}
+
+
+def get_worker_report_partial_values(start_date, end_date):
+    return {
+        'orders_count': get_orders_count(start_date, end_date),
+        'order_total_sum': get_orders_total_sum(start_date, end_date),
+        'sold_product_count': get_factory_products_count(start_date, end_date, [ProductFactoryStatus.SOLD]),
+        'finished_product_count': get_factory_products_count(
+            start_date, end_date, [ProductFactoryStatus.FINISHED, ProductFactoryStatus.PENDING]
+        ),
+        'written_off_product_count': get_factory_products_count(
+            start_date, end_date, [ProductFactoryStatus.WRITTEN_OFF]
+        ),
+        'income_sum': get_income_sum(start_date, end_date),
+        'payment_sum': get_payment_sum(start_date, end_date),
+    }
+
+
+def get_worker_kpi_annotations(start_date, end_date, field_names=WORKER_REPORT_KPI_FIELDS):
+    """Whole days of the range are summed from DailyWorkerKPI, the partial days at its edges from the source rows."""
+    days, edges = split_by_whole_days(start_date, end_date)
+    if not days:
+        partial_values = get_worker_report_partial_values(start_date, end_date)
+        return {field_name: partial_values[field_name] for field_name in field_names}
+    ensure_daily_facts(*days)
+    kpis = DailyWorkerKPI.objects.filter(day__range=days)
+    annotations = {
+        field_name: get_worker_kpi_value(kpis, *WORKER_REPORT_KPI_FIELDS[field_name]) for field_name in field_names
+    }
+    for edge_start, edge_end in edges:
+        partial_values = get_worker_report_partial_values(edge_start, edge_end)
+        for field_name in field_names:
+            annotations[field_name] = annotations[field_name] + partial_values[field_name]
+    return annotations
 
 
 # =================== WriteOffsReport =================== #
@@ -750,7 +783,6 @@ def get_factories_report_product_factories(request, start_date, end_date):
     return (
         ProductFactory.objects.get_available()
         .select_related('florist', 'category__industry')
-        .with_sold_price()
         .filter(created_at__gte=start_date, created_at__lte=end_date)
     )
 
@@ -826,3 +858,265 @@ def order_items_report_factories(start_date, end_date):
     )
 
 # =================== OverallReport =================== #
+
+
+# =================== DailySummary =================== #
+FLOWERS_INDUSTRY_ID = 6
+FLOWERS_OUTLAY_ID = 6
+
+DAILY_SUMMARY_SUM_FIELDS = [
+    'orders_count',
+    'sale_sum',
+    'self_price_sum',
+    'debt_sum',
+    'write_off_sum',
+    'outlay_sum',
+    'factory_shop_sale_sum',
+    'factory_celebration_sale_sum',
+    'flowers_shop_sale_sum',
+    'flowers_shop_self_price_sum',
+    'flowers_celebration_sale_sum',
+    'flowers_celebration_self_price_sum',
+    'flowers_debt_sum',
+    'flowers_write_off_sum',
+    'worker_income_sum',
+    'salesmen_income_sum',
+    'florist_income_sum',
+]
+
+
+def get_day_range(date):
+    start_date = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+    end_date = timezone.make_aware(datetime.datetime.combine(date, datetime.time.max))
+    return start_date, end_date
+
+
+def get_flowers_outlay_totals(date):
+    """Spent flowers outlays of the day: the outlays of the flowers industry and the flowers outlay."""
+    return [
+        outlay for outlay in get_outlay_totals(*get_day_range(date))['outlays']
+        if outlay['outcome'] and (outlay['industry_id'] == FLOWERS_INDUSTRY_ID or outlay['id'] == FLOWERS_OUTLAY_ID)
+    ]
+
+
+def calculate_daily_summary_data(date):
+    start_date, end_date = get_day_range(date)
+    celebration_clients = Client.objects.filter(full_name__icontains='*')
+    is_celebration = Q(order__client__in=celebration_clients)
+    order_filter = (
+        Q(order__created_at__gte=start_date)
+        & Q(order__created_at__lte=end_date)
+        & ~Q(order__status=OrderStatus.CANCELLED)
+        & Q(order__is_deleted=False)
+    )
+
+    order_items = OrderItem.objects.filter(order_filter).with_total_self_price().with_returned_total_sum()
+    order_items_product_factories = (
+        OrderItemProductFactory.objects.filter(order_filter & Q(is_returned=False))
+        .with_total_self_price()
+        .with_returned_total_sum()
+    )
+
+    is_flowers_item = Q(product__category__industry_id=FLOWERS_INDUSTRY_ID)
+    order_items_aggs = order_items.aggregate(
+        sale_sum=models.Sum(models.F('total') - models.F('returned_total_sum'), default=0),
+        self_price_sum=models.Sum('total_self_price', default=0),
+        flowers_shop_sale_sum=models.Sum(
+            models.F('total') - models.F('returned_total_sum'), default=0,
+            filter=is_flowers_item & ~is_celebration
+        ),
+        flowers_shop_self_price_sum=models.Sum(
+            'total_self_price', default=0, filter=is_flowers_item & ~is_celebration
+        ),
+        flowers_celebration_sale_sum=models.Sum(
+            models.F('total') - models.F('returned_total_sum'), default=0,
+            filter=is_flowers_item & is_celebration
+        ),
+        flowers_celebration_self_price_sum=models.Sum(
+            'total_self_price', default=0, filter=is_flowers_item & is_celebration
+        ),
+    )
+
+    is_flowers_factory = Q(product_factory__category__industry_id=FLOWERS_INDUSTRY_ID)
+    factories_aggs = order_items_product_factories.aggregate(
+        sale_sum=models.Sum(models.F('price') - models.F('returned_total_sum'), default=0),
+        self_price_sum=models.Sum('total_self_price', default=0),
+        flowers_shop_sale_sum=models.Sum(
+            models.F('price') - models.F('returned_total_sum'), default=0,
+            filter=is_flowers_factory & ~is_celebration
+        ),
+        flowers_shop_self_price_sum=models.Sum(
+            'total_self_price', default=0, filter=is_flowers_factory & ~is_celebration
+        ),
+        flowers_celebration_sale_sum=models.Sum(
+            models.F('price') - models.F('returned_total_sum'), default=0,
+            filter=is_flowers_factory & is_celebration
+        ),
+        flowers_celebration_self_price_sum=models.Sum(
+            'total_self_price', default=0, filter=is_flowers_factory & is_celebration
+        ),
+    )
+
+    orders = Order.objects.filter(
+        Q(order_items__in=order_items)
+        | Q(order_item_product_factory_set__in=order_items_product_factories)
+    ).distinct()
+    orders_aggs = Order.objects.filter(pk__in=orders.values('pk')).aggregate(
+        orders_count=models.Count('pk'),
+        debt_sum=models.Sum('debt', default=0),
+    )
+
+    flowers_orders = Order.objects.filter(
+        Q(pk__in=order_items.filter(is_flowers_item).values('order_id'))
+        | Q(pk__in=order_items_product_factories.filter(is_flowers_factory).values('order_id')),
+        debt__gt=0
+    ).annotate(
+        flowers_sum=Coalesce(
+            models.Subquery(
+                OrderItem.objects.filter(Q(order_id=OuterRef('pk')) & is_flowers_item)
+                .with_returned_total_sum()
+                .values('order_id')
+                .annotate(amount_sum=models.Sum(models.F('total') - models.F('returned_total_sum'), default=0))
+                .values('amount_sum')[:1]
+            ), 0, output_field=models.DecimalField()
+        ) + Coalesce(
+            models.Subquery(
+                OrderItemProductFactory.objects.filter(Q(order_id=OuterRef('pk')) & is_flowers_factory)
+                .filter(is_returned=False)
+                .values('order_id')
+                .annotate(amount_sum=models.Sum('price', default=0))
+                .values('amount_sum')[:1]
+            ), 0, output_field=models.DecimalField()
+        )
+    ).values_list('debt', 'flowers_sum')
+    flowers_debt_sum = sum((max(min(debt, flowers_sum), 0) for debt, flowers_sum in flowers_orders), Decimal(0))
+
+    write_off_aggs = WarehouseProductWriteOff.objects.get_available().filter(
+        created_at__gte=start_date,
+        created_at__lte=end_date,
+    ).aggregate(
+        write_off_sum=models.Sum(
+            models.F('count') * models.F('warehouse_product__self_price'), default=0,
+            filter=Q(warehouse_product__product__is_deleted=False)
+        ),
+        flowers_write_off_sum=models.Sum(
+            models.F('count') * models.F('warehouse_product__self_price'), default=0,
+            filter=Q(warehouse_product__product__category__industry_id=FLOWERS_INDUSTRY_ID)
+        ),
+    )
+    factories_write_off_sum = ProductFactory.objects.get_available().filter(
+        status=ProductFactoryStatus.WRITTEN_OFF,
+        written_off_at__range=[start_date, end_date]
+    ).aggregate(self_price_sum=models.Sum('self_price', default=0))['self_price_sum']
+
+    signed_income = Case(
+        When(income_type=WorkerIncomeType.OUTCOME, then=-models.F('total')),
+        default=models.F('total')
+    )
+    worker_incomes_aggs = WorkerIncomes.objects.filter(
+        created_at__gte=start_date,
+        created_at__lte=end_date,
+    ).aggregate(
+        worker_income_sum=models.Sum(signed_income, default=0),
+        salesmen_income_sum=models.Sum(
+            signed_income, default=0, filter=Q(reason=WorkerIncomeReason.PRODUCT_SALE)
+        ),
+        florist_income_sum=models.Sum(
+            signed_income, default=0,
+            filter=Q(reason__in=[WorkerIncomeReason.PRODUCT_FACTORY_SALE, WorkerIncomeReason.PRODUCT_FACTORY_CREATE])
+        ),
+    )
+
+    outlays = (
+        Payment.objects.get_available().filter(
+            created_at__gte=start_date,
+            created_at__lte=end_date,
+            payment_type=PaymentType.OUTCOME,
+            outlay__isnull=False,
+        )
+        .values('outlay_id')
+        .annotate(amount=models.Sum('amount', default=0))
+        .values_list('outlay_id', 'amount')
+    )
+    outlay_sum = Payment.objects.get_available().filter(
+        created_at__gte=start_date,
+        created_at__lte=end_date,
+        payment_type=PaymentType.OUTCOME,
+    ).aggregate(amount_sum=models.Sum('amount', default=0))['amount_sum']
+
+    return {
+        'orders_count': orders_aggs['orders_count'],
+        'sale_sum': order_items_aggs['sale_sum'] + factories_aggs['sale_sum'],
+        'self_price_sum': order_items_aggs['self_price_sum'] + factories_aggs['self_price_sum'],
+        'debt_sum': orders_aggs['debt_sum'],
+        'write_off_sum': write_off_aggs['write_off_sum'],
+        'outlay_sum': outlay_sum,
+        'factory_shop_sale_sum': factories_aggs['flowers_shop_sale_sum'],
+        'factory_celebration_sale_sum': factories_aggs['flowers_celebration_sale_sum'],
+        'flowers_shop_sale_sum':
+            order_items_aggs['flowers_shop_sale_sum'] + factories_aggs['flowers_shop_sale_sum'],
+        'flowers_shop_self_price_sum':
+            order_items_aggs['flowers_shop_self_price_sum'] + factories_aggs['flowers_shop_self_price_sum'],
+        'flowers_celebration_sale_sum':
+            order_items_aggs['flowers_celebration_sale_sum'] + factories_aggs['flowers_celebration_sale_sum'],
+        'flowers_celebration_self_price_sum':
+            order_items_aggs['flowers_celebration_self_price_sum']
+            + factories_aggs['flowers_celebration_self_price_sum'],
+        'flowers_debt_sum': flowers_debt_sum,
+        'flowers_write_off_sum': write_off_aggs['flowers_write_off_sum'] + factories_write_off_sum,
+        **worker_incomes_aggs,
+    }, dict(outlays)
+
+
+@transaction.atomic
+def build_daily_summary(date):
+    lock_days(DAILY_SUMMARY_LOCK, date, date)
+    data, outlays = calculate_daily_summary_data(date)
+    summary, _ = DailySummary.objects.update_or_create(date=date, defaults=data)
+    summary.outlays.all().delete()
+    DailyOutlaySummary.objects.bulk_create([
+        DailyOutlaySummary(summary=summary, outlay_id=outlay_id, amount=amount)
+        for outlay_id, amount in outlays.items()
+    ])
+    return summary
+
+
+def is_summary_outdated(date, updated_at):
+    """A summary built before its day ended misses the rest of the day once the day is closed."""
+    _, end_date = get_day_range(date)
+    return updated_at <= end_date < timezone.now()
+
+
+def get_daily_summary(date, refresh=False):
+    if not refresh:
+        summary = DailySummary.objects.filter(date=date).first()
+        if summary and not is_summary_outdated(summary.date, summary.updated_at):
+            return summary
+    return build_daily_summary(date)
+
+
+def ensure_daily_summaries(start_date, end_date):
+    """Builds the missing and outdated days of the range and returns its summaries."""
+    built_dates = dict(
+        DailySummary.objects.filter(date__range=[start_date, end_date]).values_list('date', 'updated_at')
+    )
+    date = start_date
+    while date <= end_date:
+        if date not in built_dates or is_summary_outdated(date, built_dates[date]):
+            build_daily_summary(date)
+        date += datetime.timedelta(days=1)
+    return DailySummary.objects.filter(date__range=[start_date, end_date])
+
+
+def get_month_to_date_summary(date):
+    """Sums the stored days from the first day of the month up to ``date``."""
+    return ensure_daily_summaries(date.replace(day=1), date).aggregate(**{
+        field: models.Sum(field, default=0) for field in DAILY_SUMMARY_SUM_FIELDS
+    })
+
+
+def get_daily_outlays(summary, outlays=None):
+    qs = summary.outlays.select_related('outlay').order_by('outlay_id')
+    if outlays is not None:
+        qs = qs.filter(outlay__in=outlays)
+    return qs
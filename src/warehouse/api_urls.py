@@ -28,6 +28,14 @@ urlpatterns = [
             }
         )
     ),
+    path(
+        "warehouse/inventarization/",
+        api_views.WarehouseProductViewSet.as_view(
+            {
+                "post": "inventarization",
+            }
+        )
+    ),
     path(
         "warehouse/composites/",
         api_views.WarehouseProductCompositeListView.as_view()
@@ -49,6 +57,14 @@ urlpatterns = [
             }
         )
     ),
+    path(
+        "warehouse/write-offs/batch/",
+        api_views.WarehouseProductWriteOffViewSet.as_view(
+            {
+                "post": "batch_create"
+            }
+        )
+    ),
     path(
         "warehouse/write-offs/<int:pk>/",
         api_views.WarehouseProductWriteOffViewSet.as_view(
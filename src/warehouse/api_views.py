@@ -26,9 +26,16 @@ from src.warehouse.models import WarehouseProduct, WarehouseProductWriteOff
 from src.warehouse.serializers import (
     WarehouseProductSerializer,
     WarehouseProductWriteOffSerializer,
-    WarehouseProductWriteOffCreateSerializer, WarehouseProductSummarySerializer
+    WarehouseProductWriteOffCreateSerializer, WarehouseProductSummarySerializer,
+    InventarizationSerializer, InventarizationReportSerializer, WarehouseProductWriteOffBatchCreateSerializer
+)
+from src.warehouse.services import (
+    create_warehouse_product_write_off,
+    create_warehouse_product_write_offs,
+    delete_warehouse_product_write_off,
+    get_actual_counts_by_codes,
+    reconcile_inventory
 )
-from src.warehouse.services import create_warehouse_product_write_off, delete_warehouse_product_write_off
 
 User = get_user_model()
 
@@ -37,7 +44,8 @@ class WarehouseProductViewSet(MultiSerializerViewSetMixin, PermissionPolicyMixin
     queryset = WarehouseProduct.objects.all()
     serializer_class = WarehouseProductSerializer
     serializer_action_classes = {
-        'get_summary': WarehouseProductSummarySerializer
+        'get_summary': WarehouseProductSummarySerializer,
+        'inventarization': InventarizationSerializer,
     }
     filter_backends = [
         filters.SearchFilter,
@@ -67,6 +75,23 @@ class WarehouseProductViewSet(MultiSerializerViewSetMixin, PermissionPolicyMixin
             WarehouseProductSummarySerializer(instance={'total_self_price_sum': total_self_price_sum}).data
         )
 
+    def inventarization(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        actual_counts, unknown_codes = get_actual_counts_by_codes(
+            (item['code'], item['count']) for item in data['items']
+        )
+        if unknown_codes:
+            return Response(data={'error': f"Товары не найдены: {', '.join(unknown_codes)}"}, status=400)
+        report = reconcile_inventory(
+            actual_counts,
+            provider_id=data['provider'].pk,
+            user=request.user,
+            comment=data['comment']
+        )
+        return Response(InventarizationReportSerializer(instance=report).data, status=200)
+
     def export_excel(self, request, *args, **kwargs):
         self.request.user = User.objects.get(pk=kwargs['user_id'])
         qs = self.get_queryset().order_by('product', '-count')
@@ -116,6 +141,7 @@ class WarehouseProductWriteOffViewSet(MultiSerializerViewSetMixin, ModelViewSet)
         'list': WarehouseProductWriteOffSerializer,
         'create': WarehouseProductWriteOffCreateSerializer,
         'retrieve': WarehouseProductWriteOffSerializer,
+        'batch_create': WarehouseProductWriteOffBatchCreateSerializer,
     }
 
     filter_backends = [
@@ -166,6 +192,20 @@ class WarehouseProductWriteOffViewSet(MultiSerializerViewSetMixin, ModelViewSet)
             )
         return Response(serializer.data, status=201, headers=headers)
 
+    def batch_create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            write_offs, _ = create_warehouse_product_write_offs(
+                items=data['items'],
+                user=request.user,
+                comment=data.get('comment', None)
+            )
+        except (NotEnoughProductInWarehouseError, WarehouseProduct.DoesNotExist) as e:
+            return Response(data={'error': str(e.args[0])}, status=400)
+        return Response(WarehouseProductWriteOffSerializer(write_offs, many=True).data, status=201)
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         delete_warehouse_product_write_off(instance.pk, user=request.user)
@@ -0,0 +1,50 @@
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from src.warehouse.services import get_actual_counts_by_codes, reconcile_inventory
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Reconciles warehouse stock with a count sheet (product code and counted quantity per row)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="Path to the .xlsx count sheet")
+        parser.add_argument('--provider', type=int, required=True, help="Provider id for the surplus income")
+        parser.add_argument('--user', required=True, help="Username recorded as the author")
+        parser.add_argument('--code-column', type=int, default=2, help="Position of the product code column")
+        parser.add_argument('--count-column', type=int, default=5, help="Position of the counted quantity column")
+        parser.add_argument('--comment', default="Инвентаризация")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['user']} не найден")
+
+        sheet = pd.read_excel(options['file'], dtype=object)
+        sheet = sheet.iloc[:, [options['code_column'], options['count_column']]].dropna()
+        actual_counts, unknown_codes = get_actual_counts_by_codes(
+            sheet.itertuples(index=False, name=None)
+        )
+        if unknown_codes:
+            raise CommandError(f"Товары не найдены: {', '.join(unknown_codes)}")
+
+        report = reconcile_inventory(
+            actual_counts,
+            provider_id=options['provider'],
+            user=user,
+            comment=options['comment']
+        )
+        for row in report['products']:
+            if row['difference']:
+                self.stdout.write(
+                    f"{row['code']} {row['product_name']}: учет {row['in_stock']}, факт {row['actual_count']}, "
+                    f"списано {row['written_off']}, излишек {row['surplus']}"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"Товаров: {len(report['products'])}, списаний: {report['write_offs_count']}, "
+            f"приход излишков: {report['income'] or '-'}"
+        ))
@@ -1,6 +1,9 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 
 from src.base.serializers import DynamicFieldsModelSerializer
+from src.income.models import Provider
 from src.product.serializers import ProductSerializer
 from src.user.serializers import UserSerializer
 from src.warehouse.models import WarehouseProduct, WarehouseProductWriteOff
@@ -63,3 +66,43 @@ class WarehouseProductWriteOffCreateSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         return WarehouseProductWriteOffSerializer(instance=instance).data
+
+
+class WarehouseProductWriteOffBatchItemSerializer(serializers.Serializer):
+    warehouse_product = serializers.IntegerField()
+    count = serializers.DecimalField(max_digits=19, decimal_places=2, min_value=Decimal('0.01'))
+    comment = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+
+
+class WarehouseProductWriteOffBatchCreateSerializer(serializers.Serializer):
+    comment = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    items = WarehouseProductWriteOffBatchItemSerializer(many=True, allow_empty=False)
+
+
+class InventarizationItemSerializer(serializers.Serializer):
+    code = serializers.CharField()
+    count = serializers.DecimalField(max_digits=19, decimal_places=2, min_value=0)
+
+
+class InventarizationSerializer(serializers.Serializer):
+    provider = serializers.PrimaryKeyRelatedField(queryset=Provider.objects.get_available())
+    comment = serializers.CharField(required=False, default="Инвентаризация")
+    items = InventarizationItemSerializer(many=True, allow_empty=False)
+
+
+class InventarizationProductReportSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    product_name = serializers.CharField()
+    code = serializers.CharField()
+    in_stock = serializers.DecimalField(max_digits=19, decimal_places=2)
+    actual_count = serializers.DecimalField(max_digits=19, decimal_places=2)
+    difference = serializers.DecimalField(max_digits=19, decimal_places=2)
+    written_off = serializers.DecimalField(max_digits=19, decimal_places=2)
+    surplus = serializers.DecimalField(max_digits=19, decimal_places=2)
+    not_written_off = serializers.DecimalField(max_digits=19, decimal_places=2)
+
+
+class InventarizationReportSerializer(serializers.Serializer):
+    income = serializers.IntegerField(allow_null=True)
+    write_offs_count = serializers.IntegerField()
+    products = InventarizationProductReportSerializer(many=True)
@@ -1,12 +1,18 @@
+import uuid
 from decimal import Decimal
 from typing import Optional
 
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
+from src.analytics.services import mark_dirty_days
+from src.core.enums import ActionPermissionRequestType
+from src.core.models import ActionPermissionRequest, Settings
 from src.factory.models import ProductFactoryItem, ProductFactory
-from src.income.models import IncomeItem
+from src.income.models import Income, IncomeItem
 from src.order.models import OrderItem, OrderItemProductOutcome
+from src.product.models import Product
 from src.warehouse.exceptions import NotEnoughProductInWarehouseError
 from src.warehouse.models import WarehouseProduct, WarehouseProductWriteOff
 
@@ -134,6 +140,61 @@ def create_warehouse_product_write_off(
     return obj
 
 
+def create_warehouse_product_write_offs(items: list, user: User, comment: Optional[str] = None):
+    """
+    Writes off several lots at once. ``items`` are dicts with ``warehouse_product``
+    (id), ``count`` and an optional ``comment``. Lines are checked against the
+    locked lots, the counts are decremented with one UPDATE and write-offs
+    outside the permitted industries get permission requests sharing one
+    ``group_id``, so they are approved with a single Telegram message.
+    """
+    with transaction.atomic():
+        counts = {}
+        for item in items:
+            counts[item['warehouse_product']] = counts.get(item['warehouse_product'], Decimal(0)) + item['count']
+
+        lots = WarehouseProduct.objects.select_for_update(of=('self',)) \
+            .select_related('product__category').in_bulk(counts.keys())
+        missing = [str(lot_id) for lot_id in counts if lot_id not in lots]
+        if missing:
+            raise WarehouseProduct.DoesNotExist(f"Товары со склада не найдены: {', '.join(missing)}")
+        insufficient = [lots[lot_id].product.name for lot_id, count in counts.items() if lots[lot_id].count < count]
+        if insufficient:
+            raise NotEnoughProductInWarehouseError(f"Недостаточно товаров на складе: {', '.join(insufficient)}")
+
+        WarehouseProduct.objects.filter(pk__in=counts.keys()).update(count=models.F('count') - models.Case(
+            *(models.When(pk=lot_id, then=models.Value(count)) for lot_id, count in counts.items()),
+            output_field=models.DecimalField()
+        ))
+        for lot_id, count in counts.items():
+            lots[lot_id].count -= count
+
+        write_offs = WarehouseProductWriteOff.objects.bulk_create([
+            WarehouseProductWriteOff(
+                warehouse_product=lots[item['warehouse_product']],
+                count=item['count'],
+                comment=item.get('comment') or comment,
+                created_user=user
+            )
+            for item in items
+        ])
+        mark_dirty_days([timezone.localdate()], {lot.product.category.industry_id for lot in lots.values()})
+
+        granted_industries = Settings.load().write_off_permission_granted_industries
+        group_id = uuid.uuid4()
+        permission_requests = ActionPermissionRequest.objects.bulk_create([
+            ActionPermissionRequest(
+                created_user=user,
+                wh_product_write_off=write_off,
+                request_type=ActionPermissionRequestType.PRODUCT_WRITE_OFF,
+                group_id=group_id,
+            )
+            for write_off in write_offs
+            if write_off.warehouse_product.product.category.industry_id not in granted_industries
+        ])
+    return write_offs, permission_requests
+
+
 def delete_warehouse_product_write_off(warehouse_product_write_off_id: int, user: User):
     warehouse_product_write_off = WarehouseProductWriteOff.objects \
         .select_related('warehouse_product') \
@@ -150,3 +211,118 @@ def set_warehouse_product_write_off_deleted(warehouse_product_write_off: Warehou
     warehouse_product_write_off.is_deleted = True
     warehouse_product_write_off.deleted_user = user
     warehouse_product_write_off.save()
+
+
+# ==================== Inventarization ==================== #
+def get_actual_counts_by_codes(counted_items):
+    """Sums ``(code, count)`` pairs per product. Returns the counts and the codes not found."""
+    counted_items = [(str(code).strip(), count) for code, count in counted_items]
+    products = dict(
+        Product.objects.filter(code__in={code for code, _ in counted_items}).values_list('code', 'pk')
+    )
+    actual_counts = {}
+    unknown_codes = []
+    for code, count in counted_items:
+        if code not in products:
+            unknown_codes.append(code)
+            continue
+        actual_counts[products[code]] = actual_counts.get(products[code], Decimal(0)) + Decimal(count)
+    return actual_counts, unknown_codes
+
+
+def reconcile_inventory(actual_counts: dict, provider_id: int, user: User, comment: str = "Инвентаризация"):
+    """
+    Brings warehouse stock in line with counted quantities (``{product_id: count}``).
+    Shortages are written off from the oldest lots first, surpluses are added as
+    items of one new income at the price of the latest lot. Returns a report
+    row per product.
+    """
+    with transaction.atomic():
+        products = Product.objects.in_bulk(actual_counts.keys())
+        lots = {}
+        for lot in WarehouseProduct.objects.select_for_update().filter(
+                product_id__in=actual_counts.keys()
+        ).order_by('created_at', 'pk'):
+            lots.setdefault(lot.product_id, []).append(lot)
+
+        changed_lots = []
+        write_offs = []
+        income_items = []
+        report = []
+        for product_id, actual_count in actual_counts.items():
+            product = products[product_id]
+            product_lots = lots.get(product_id, [])
+            in_stock = sum((lot.count for lot in product_lots), Decimal(0))
+            count_diff = in_stock - actual_count
+            written_off = Decimal(0)
+            surplus = Decimal(0)
+
+            if count_diff > 0:
+                for lot in product_lots:
+                    if written_off == count_diff:
+                        break
+                    if lot.count <= 0:
+                        continue
+                    write_off_count = min(lot.count, count_diff - written_off)
+                    lot.count -= write_off_count
+                    written_off += write_off_count
+                    changed_lots.append(lot)
+                    write_offs.append(WarehouseProductWriteOff(
+                        warehouse_product=lot,
+                        count=write_off_count,
+                        comment=comment,
+                        created_user=user
+                    ))
+            elif count_diff < 0:
+                surplus = -count_diff
+                last_lot = product_lots[-1] if product_lots else None
+                self_price = last_lot.self_price if last_lot else Decimal(0)
+                sale_price = last_lot.sale_price if last_lot else product.price
+                income_items.append(IncomeItem(
+                    product=product,
+                    count=surplus,
+                    price=self_price,
+                    sale_price=sale_price,
+                    total=self_price * surplus,
+                    total_sale_price=sale_price * surplus
+                ))
+
+            report.append({
+                'product': product.pk,
+                'product_name': product.name,
+                'code': product.code,
+                'in_stock': in_stock,
+                'actual_count': actual_count,
+                'difference': actual_count - in_stock,
+                'written_off': written_off,
+                'surplus': surplus,
+                'not_written_off': max(count_diff, 0) - written_off,
+            })
+
+        WarehouseProduct.objects.bulk_update(changed_lots, ['count'])
+        WarehouseProductWriteOff.objects.bulk_create(write_offs)
+        if write_offs:
+            mark_dirty_days(
+                [timezone.localdate()],
+                Product.objects.filter(pk__in={lot.product_id for lot in changed_lots})
+                .values_list('category__industry_id', flat=True)
+            )
+
+        income = None
+        if income_items:
+            income = Income.objects.create(
+                provider_id=provider_id,
+                created_user=user,
+                comment=comment,
+                total=sum(item.total for item in income_items),
+                total_sale_price=sum(item.total_sale_price for item in income_items),
+            )
+            for item in income_items:
+                item.income = income
+            IncomeItem.objects.bulk_create(income_items)
+
+    return {
+        'income': income.pk if income else None,
+        'write_offs_count': len(write_offs),
+        'products': report,
+    }